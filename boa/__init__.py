@@ -9,12 +9,14 @@ except ImportError:
     __version__ = "0.0.0"
 
 from boa.ax_instantiation_utils import *  # noqa
+from boa.batch_queue import *  # noqa
 from boa.config import *  # noqa
 from boa.controller import *  # noqa
 from boa.instantiation_base import *  # noqa
 from boa.metrics.metric_funcs import *  # noqa
 from boa.metrics.metrics import *  # noqa
 from boa.metrics.modular_metric import *  # noqa
+from boa.metrics.streaming_funcs import *  # noqa
 from boa.metrics.synthetic_funcs import *  # noqa
 from boa.plotting import (  # noqa
     app_view,
@@ -24,6 +26,7 @@ from boa.plotting import (  # noqa
     plot_slice,
     scheduler_to_df,
 )
+from boa.readonly_scheduler import ReadOnlyScheduler  # noqa
 from boa.registry import _add_common_encodes_and_decodes
 from boa.runner import *  # noqa
 from boa.scheduler import *  # noqa
@@ -170,7 +170,10 @@ def run(config_path, scheduler_path, num_trials, experiment_dir=None):
             )
         )
 
-    scheduler.save_data(metrics_to_end=True, ax_kwargs=dict(always_include_field_columns=True))
+    # the next call reads the trials back from the optimization csv, so it has to be written now
+    scheduler.save_data(
+        wait=True, write_csv=True, metrics_to_end=True, ax_kwargs=dict(always_include_field_columns=True)
+    )
     return scheduler
 
 
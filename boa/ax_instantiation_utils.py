@@ -18,7 +18,7 @@ from ax.modelbridge.torch import TorchModelBridge
 from ax.models.torch.botorch_moo import MultiObjectiveBotorchModel
 from ax.service.utils.instantiation import TParameterRepresentation
 
-from boa.config import BOAConfig
+from boa.config import BOAConfig, StorageBackend
 from boa.instantiation_base import BoaInstantiationBase
 from boa.logger import get_logger
 from boa.scheduler import Scheduler
@@ -64,22 +64,17 @@ def get_scheduler(
     generation_strategy = get_generation_strategy(config=config, experiment=experiment, **kwargs)
 
     _check_moo_has_right_aqf_mode_bridge_cls(experiment, generation_strategy)
-    # db_settings = DBSettings(
-    #     url="sqlite:///foo.db",
-    #     decoder=Decoder(config=SQAConfig()),
-    #     encoder=Encoder(config=SQAConfig()),
-    # )
+    # the scheduler is saved by boa (see `storage` in BOAScriptOptions), not by Ax's DBSettings
 
-    # init_engine_and_session_factory(url=db_settings.url)
-    # engine = get_engine()
-    # create_all_tables(engine)
-
-    return Scheduler(
+    scheduler = Scheduler(
         experiment=experiment,
         generation_strategy=generation_strategy,
         options=config.scheduler,
-        # db_settings=db_settings,
     )
+    if config.script_options.storage in (StorageBackend.JSON_GZ, StorageBackend.JSON_ZST):
+        # the snapshot is compressed by its extension, see boa.storage.write_snapshot
+        scheduler.scheduler_filepath = f"scheduler.{config.script_options.storage.value}"
+    return scheduler
 
 
 def get_experiment(config: BOAConfig, runner: Runner, wrapper: BaseWrapper = None, **kwargs):
@@ -0,0 +1,200 @@
+"""
+###################################
+Batch Queues
+###################################
+
+Batch queues that :class:`.ArrayJobRunner` submits trials to as array jobs,
+one job (task of the array) per trial, instead of deploying each trial separately.
+
+Plug in your own queue (an HPC scheduler such as SLURM or PBS) by subclassing
+:class:`BatchQueue` and setting ``batch_queue`` in :class:`.BOAScriptOptions`
+to the path of the file and the name of the class (``path/to/queue.py:MyQueue``)
+or its import path (``my_package.queues.MyQueue``). ``batch_queue_options``
+is passed to the class as keyword arguments.
+
+:class:`LocalBatchQueue` (``batch_queue: local``) is a stand-in queue that runs the
+submitted jobs on this machine, a fixed number at a time, so array job set ups can be
+tried out (and tested) without a cluster.
+
+"""
+
+from __future__ import annotations
+
+import collections
+import importlib
+import itertools
+import pathlib
+import threading
+from abc import ABC, abstractmethod
+from enum import Enum
+from functools import partial
+from typing import Iterable, Optional
+
+from boa.definitions import PathLike
+from boa.logger import get_logger
+from boa.utils import _load_attr_from_module, _load_module_from_path
+from boa.wrappers.subprocess_engine import get_subprocess_engine
+
+logger = get_logger()
+
+
+class JobState(str, Enum):
+    """State of a job in a :class:`BatchQueue`"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+    @property
+    def is_finished(self) -> bool:
+        return self in (JobState.COMPLETED, JobState.FAILED)
+
+
+class BatchQueue(ABC):
+    """Queue that runs array jobs
+
+    Subclass this to submit trials to a batch queue of your own.
+    """
+
+    @abstractmethod
+    def submit_array(self, commands: list[list[str]], cwd: Optional[PathLike] = None) -> list[str]:
+        """Submit one array job with a task for each command.
+
+        Parameters
+        ----------
+        commands
+            Command of each task of the array, split into a list (see :func:`.split_shell_command`)
+        cwd
+            Directory to run the commands in
+
+        Returns
+        -------
+        list[str]
+            Job ID of each task, in the same order as ``commands``
+        """
+
+    @abstractmethod
+    def poll(self, job_ids: Iterable[str]) -> dict[str, JobState]:
+        """Get the states of many jobs with a single query of the queue.
+
+        Jobs that the queue doesn't know about (anymore) can be left out, they are
+        treated as finished and their trials are checked with the wrapper
+        (see :meth:`.ArrayJobRunner.poll_trial_status`).
+
+        Parameters
+        ----------
+        job_ids
+            Job IDs returned by :meth:`submit_array`
+
+        Returns
+        -------
+        dict[str, JobState]
+            State of each job the queue knows about
+        """
+
+    def close(self):
+        """Release whatever the queue holds on to. Called when the queue is no longer used"""
+
+
+class LocalBatchQueue(BatchQueue):
+    """Stand-in batch queue that runs submitted jobs as local processes, ``n_slots`` at a time.
+
+    Jobs are started in the order they were submitted, whenever a slot is free,
+    and their state is only kept in memory. Job IDs are ``<array id>_<task index>``.
+
+    Parameters
+    ----------
+    n_slots
+        Number of jobs that can run at once
+
+    Examples
+    --------
+    >>> import sys, time
+    >>> queue = LocalBatchQueue(n_slots=2)
+    >>> job_ids = queue.submit_array([[sys.executable, "-c", "pass"], [sys.executable, "-c", "exit(3)"]])
+    >>> job_ids
+    ['0_0', '0_1']
+    >>> while not all(state.is_finished for state in queue.poll(job_ids).values()):
+    ...     time.sleep(0.05)
+    >>> queue.poll(job_ids) == {"0_0": JobState.COMPLETED, "0_1": JobState.FAILED}
+    True
+    """
+
+    def __init__(self, n_slots: int = 1):
+        self.n_slots = max(n_slots, 1)
+        self._array_ids = itertools.count()
+        self._pending: collections.deque = collections.deque()  # (job id, command, cwd)
+        self._states: dict[str, JobState] = {}
+        self._n_running = 0
+        self._lock = threading.Lock()
+
+    def submit_array(self, commands: list[list[str]], cwd: Optional[PathLike] = None) -> list[str]:
+        with self._lock:
+            array_id = next(self._array_ids)
+            job_ids = [f"{array_id}_{task}" for task in range(len(commands))]
+            for job_id, command in zip(job_ids, commands):
+                self._states[job_id] = JobState.PENDING
+                self._pending.append((job_id, command, cwd))
+        logger.info(f"Submitted array job {array_id} with {len(commands)} task(s)")
+        self._dispatch()
+        return job_ids
+
+    def poll(self, job_ids: Iterable[str]) -> dict[str, JobState]:
+        with self._lock:
+            return {job_id: self._states[job_id] for job_id in job_ids if job_id in self._states}
+
+    def _dispatch(self):
+        """start pending jobs while there are free slots"""
+        to_start = []
+        with self._lock:
+            while self._pending and self._n_running < self.n_slots:
+                job_id, command, cwd = self._pending.popleft()
+                self._states[job_id] = JobState.RUNNING
+                self._n_running += 1
+                to_start.append((job_id, command, cwd))
+        for job_id, command, cwd in to_start:
+            try:
+                get_subprocess_engine().start(command, on_exit=partial(self._on_exit, job_id), cwd=cwd)
+            except OSError as e:
+                logger.warning(f"Could not start job {job_id}. Reason: {e!r}")
+                self._on_exit(job_id, 1)
+
+    def _on_exit(self, job_id: str, exit_code: int):
+        with self._lock:
+            self._n_running -= 1
+            self._states[job_id] = JobState.COMPLETED if exit_code == 0 else JobState.FAILED
+        self._dispatch()
+
+
+def load_batch_queue(batch_queue: str, base_path: PathLike = None, **options) -> BatchQueue:
+    """Create the batch queue set by ``batch_queue`` in :class:`.BOAScriptOptions`.
+
+    Parameters
+    ----------
+    batch_queue
+        ``local`` for a :class:`LocalBatchQueue`, ``path/to/file.py:ClassName``
+        (relative paths are relative to ``base_path``), or the import path of a
+        :class:`BatchQueue` subclass (``package.module.ClassName``)
+    base_path
+        Directory relative paths are resolved against
+    **options
+        Keyword arguments to create the queue with
+
+    Returns
+    -------
+    BatchQueue
+    """
+    if batch_queue.lower() == "local":
+        return LocalBatchQueue(**options)
+    if ":" in batch_queue:
+        path, _, name = batch_queue.rpartition(":")
+        path = pathlib.Path(path)
+        if not path.is_absolute() and base_path:
+            path = pathlib.Path(base_path) / path
+        module = _load_module_from_path(path)
+    else:
+        module_name, _, name = batch_queue.rpartition(".")
+        module = importlib.import_module(module_name)
+    QueueCls = _load_attr_from_module(module, name)
+    return QueueCls(**options)
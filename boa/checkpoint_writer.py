@@ -0,0 +1,218 @@
+"""
+###################################
+Checkpoint Writer
+###################################
+
+Background thread that the scheduler checkpoints are written out from
+(see :meth:`.Scheduler.save_data`), so the optimization loop never waits on disk.
+
+What to write is captured when the write is submitted, as a function that produces
+the bytes from a snapshot of the state taken at that point, and is then encoded and
+written to disk on the writer thread. Writes submitted while the writer is busy are
+coalesced: a file that is replaced again before it was written is only written once,
+and consecutive appends to the same file are written together.
+Files are replaced atomically (see :func:`.write_file_atomic`).
+
+Use :meth:`CheckpointWriter.flush` to wait for everything submitted to be written.
+A write that failed in the background is raised by the next write submitted, or by the next flush.
+Pending writes are also flushed when the interpreter exits.
+
+"""
+
+from __future__ import annotations
+
+import atexit
+import pathlib
+import threading
+import weakref
+from typing import Callable, NamedTuple, Optional
+
+from boa.definitions import PathLike
+from boa.logger import get_logger
+from boa.wrappers.wrapper_utils import write_file_atomic
+
+logger = get_logger()
+
+_writers: weakref.WeakSet = weakref.WeakSet()
+
+
+class _WriteOp(NamedTuple):
+    kind: str  # "replace", "append" or "call"
+    path: Optional[pathlib.Path]
+    fn: Callable
+    on_done: Optional[Callable]
+
+
+class CheckpointWriter:
+    """Write files in order from a background thread, coalescing writes that pile up.
+
+    The thread is started with the first write, and callbacks (``on_done``) are run on it.
+    Errors are logged and don't stop later writes, and the first of them is raised
+    (as a :class:`RuntimeError`) by the next write submitted, or by :meth:`flush`.
+
+    Examples
+    --------
+    >>> import json, tempfile, pathlib
+    >>> path = pathlib.Path(tempfile.mkdtemp()) / "state.json"
+    >>> writer = CheckpointWriter()
+    >>> for i in range(3):
+    ...     state = {"i": i}  # only the last of these has to be written if the writer is busy
+    ...     writer.replace(path, lambda state=state: json.dumps(state).encode())
+    >>> writer.flush()
+    >>> path.read_text()
+    '{"i": 2}'
+    """
+
+    def __init__(self):
+        self._ops: list[_WriteOp] = []
+        self._busy = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
+        _writers.add(self)
+
+    @property
+    def pending(self) -> bool:
+        """Whether anything submitted hasn't been written yet"""
+        with self._cond:
+            return bool(self._ops) or self._busy
+
+    def replace(self, path: PathLike, produce: Callable[[], bytes], on_done: Optional[Callable[[int], None]] = None):
+        """Atomically replace the contents of ``path`` with the bytes ``produce`` returns.
+
+        Replacements of ``path`` that weren't written yet are dropped, as this one replaces them,
+        and their ``on_done`` callbacks are called (first) once this one is written.
+        Appends to ``path`` submitted before this are still written first, in order.
+
+        Parameters
+        ----------
+        path
+            File to write
+        produce
+            Returns the new contents of the file, called on the writer thread
+        on_done
+            Called with the number of bytes written, once they are
+        """
+        path = pathlib.Path(path)
+        with self._cond:
+            self._raise_error()  # before dropping anything, the write isn't submitted if this raises
+            superseded = [op for op in self._ops if op.kind == "replace" and op.path == path]
+            self._ops = [op for op in self._ops if op not in superseded]
+            callbacks = [op.on_done for op in superseded if op.on_done is not None]
+            if callbacks:
+                on_done = _chain_callbacks([*callbacks, on_done] if on_done is not None else callbacks)
+            self._submit(_WriteOp("replace", path, produce, on_done))
+
+    def append(self, path: PathLike, produce: Callable[[], bytes], on_done: Optional[Callable[[int], None]] = None):
+        """Append the bytes ``produce`` returns to ``path``, see :meth:`replace`"""
+        with self._cond:
+            self._submit(_WriteOp("append", pathlib.Path(path), produce, on_done))
+
+    def call(self, fn: Callable[[], None]):
+        """Call ``fn`` on the writer thread, in order with the writes, for writes of other kinds
+        (such as to a database)"""
+        with self._cond:
+            self._submit(_WriteOp("call", None, fn, None))
+
+    def flush(self):
+        """Wait for everything submitted so far to be written, and raise the error
+        of a write that failed in the background (see :meth:`raise_error`)"""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._ops and not self._busy)
+            self._raise_error()
+
+    def raise_error(self):
+        """Raise the error of a write that failed in the background since the error was last raised, if any.
+
+        Raises
+        ------
+        RuntimeError
+            From the error of the write that failed, what was submitted before it may not have been written
+        """
+        with self._cond:
+            self._raise_error()
+
+    def _raise_error(self):
+        # called holding self._cond
+        error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError(f"Failed to write checkpoint in the background! Reason: {error!r}") from error
+
+    def _submit(self, op: _WriteOp):
+        # called holding self._cond
+        self._raise_error()
+        self._ops.append(op)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="BoaCheckpointWriter", daemon=True)
+            self._thread.start()
+        self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._ops)
+                ops, self._ops = self._ops, []
+                self._busy = True
+            try:
+                for group in _group_appends(ops):
+                    try:
+                        _write(group)
+                    except Exception as e:
+                        logger.exception(f"Failed to write checkpoint in the background! Reason: {e!r}")
+                        with self._cond:
+                            self._error = self._error or e
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def __getstate__(self):
+        # nothing to carry over, pending writes stay with the writer they were submitted to
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+def _chain_callbacks(callbacks: list[Callable[[int], None]]) -> Callable[[int], None]:
+    def on_done(size: int):
+        for callback in callbacks:
+            callback(size)
+
+    return on_done
+
+
+def _group_appends(ops: list[_WriteOp]) -> list[list[_WriteOp]]:
+    """split ``ops`` into the groups they are written in, consecutive appends to the same file together"""
+    groups = []
+    for op in ops:
+        if groups and op.kind == "append" and groups[-1][0].kind == "append" and groups[-1][0].path == op.path:
+            groups[-1].append(op)
+        else:
+            groups.append([op])
+    return groups
+
+
+def _write(group: list[_WriteOp]):
+    first = group[0]
+    if first.kind == "call":
+        first.fn()
+        return
+    contents = [op.fn() for op in group]
+    if first.kind == "replace":
+        write_file_atomic(first.path, contents[0])
+    else:
+        with open(first.path, "ab") as file:
+            file.write(b"".join(contents))
+    for op, content in zip(group, contents):
+        if op.on_done is not None:
+            op.on_done(len(content))
+
+
+@atexit.register
+def _flush_writers():
+    for writer in list(_writers):
+        try:
+            writer.flush()
+        except RuntimeError:
+            pass  # already logged when the write failed
@@ -26,7 +26,7 @@ from boa.wrappers.wrapper_utils import cd_and_cd_back, load_jsonlike
     "--scheduler-path",
     type=click.Path(),
     default="",
-    help="Path to scheduler json file.",
+    help="Path to scheduler json file (or scheduler sqlite database).",
 )
 @click.option(
     "-wp",
@@ -91,7 +91,7 @@ def run(config_path, scheduler_path, rel_to_config, wrapper_path=None, wrapper_n
     config_path
         Path to configuration YAML file.
     scheduler_path
-        Path to scheduler json file.
+        Path to scheduler json file (or scheduler sqlite database).
     wrapper_path
         Path to where file where your wrapper is located. Used when loaded from scheduler json file,
          and the path to your wrapper has changed (such as when loading on a different computer then
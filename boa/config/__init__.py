@@ -39,6 +39,8 @@ __all__ = [  # noqa: F405
     "BOAScriptOptions",
     "BOAMetric",
     "MetricType",
+    "RunBackend",
+    "StorageBackend",
     # "SchedulerOptions",
     # "GenerationStep",
 ]
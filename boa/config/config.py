@@ -24,6 +24,7 @@ from boa.config.converters import (
     _metric_converter,
     _parameter_normalization,
     _scheduler_converter,
+    _server_mode_converter,
 )
 from boa.definitions import PathLike
 from boa.utils import StrEnum, deprecation
@@ -38,6 +39,8 @@ __all__ = [
     "BOAScriptOptions",
     "BOAMetric",
     "MetricType",
+    "RunBackend",
+    "StorageBackend",
     # "SchedulerOptions",
     # "GenerationStep",
 ]
@@ -112,6 +115,19 @@ class MetricType(StrEnum):
     INSTANTIATED = "instantiated"
 
 
+class RunBackend(StrEnum):
+    THREAD = "thread"
+    PROCESS = "process"
+    INLINE = "inline"
+
+
+class StorageBackend(StrEnum):
+    JSON = "json"
+    JSON_GZ = "json.gz"
+    JSON_ZST = "json.zst"
+    SQLITE = "sqlite"
+
+
 @define(kw_only=True)
 class BOAMetric(_Utils):
     metric: Optional[str | ModularMetric] = field(
@@ -204,6 +220,16 @@ class BOAMetric(_Utils):
             your metric"""
         },
     )
+    vectorized: bool = field(
+        default=False,
+        metadata={
+            "doc": """Whether the metric function can be called once for many trials.
+            When the data of many trials is fetched at once, each argument your wrapper returns for the metric
+            is stacked across the trials (with the trials along the first axis) and the metric function
+            is called once, returning one value per trial, instead of once per trial.
+            See :meth:`.ModularMetric.fetch_trials_data`."""
+        },
+    )
 
     def __init__(self, *args, lower_is_better: Optional[bool] = None, **kwargs):
         if lower_is_better is not None:
@@ -389,10 +415,245 @@ class BOAScriptOptions(_Utils):
         default=None,
         metadata={"doc": "Shell command to set your trial status. See `run_model` for more details. "},
     )
+    set_trial_statuses: Optional[str] = field(
+        default=None,
+        metadata={
+            "doc": """Shell command to set the trial status of all running trials at once.
+            Ran once per status poll instead of once per trial like `set_trial_status`
+            (only one of the two can be specified).
+            It is passed the experiment directory as a command line argument instead of a
+            trial directory. That directory has a `running_trials.json` file listing the trial
+            index and trial directory of each trial being polled. Write out either a
+            `trial_statuses.json` file to the experiment directory mapping trial index to
+            trial status, or a `trial_status.json` file to each trial directory. """
+        },
+    )
     fetch_trial_data: Optional[str] = field(
         default=None,
         metadata={"doc": "Shell command to fetch your trial data. See `run_model` for more details. "},
     )
+    fetch_trial_data_timeout: Optional[float] = field(
+        default=20,
+        metadata={
+            "doc": """Seconds to wait, after a trial reports it completed, for `fetch_trial_data`
+            to finish and for the trial's output file to be written out before marking the trial
+            as failed. Other trials keep being polled and fetched while a trial waits, and the
+            wait is checked again on every poll. Set to null to wait indefinitely."""
+        },
+    )
+    server_mode: bool | list[str] = field(
+        default=False,
+        converter=_server_mode_converter,
+        metadata={
+            "doc": """Run script commands as long lived worker processes that are sent each trial
+            over their stdin, instead of starting each command again for every trial, which saves
+            the start up time of your scripts (loading an interpreter, imports, etc.).
+            Set to true for all script commands, or to a list of the names of the script commands
+            to run this way (for example `[run_model, fetch_trial_data]`).
+            Your scripts have to speak BOA's line delimited JSON protocol, see
+            :mod:`boa.wrappers.script_server` for the protocol and reference clients.
+            Commands in server mode are started once, so they can only use the config level
+            jinja2 template variables, not the trial parameters or `trial_dir`."""
+        },
+    )
+    server_workers: int = field(
+        default=1,
+        metadata={
+            "doc": """Number of worker processes started for each script command in `server_mode`.
+            Each trial is sent to the worker with the fewest trials it hasn't finished yet,
+            so set this to how many trials you want to be able to run at once."""
+        },
+    )
+    watch_trial_files: bool = field(
+        default=False,
+        metadata={
+            "doc": """Watch the trial directories for trial status and output files being written
+            and poll the trials as soon as they are, instead of waiting for the next scheduled
+            poll. Uses inotify on Linux and falls back to regular polling on other platforms."""
+        },
+    )
+    run_backend: Optional[RunBackend | str] = field(
+        default=RunBackend.THREAD,
+        converter=converters.optional(RunBackend.from_str_or_enum),
+        metadata={
+            "doc": """How BOA deploys a batch of trials (calling `write_configs` and `run_model`).
+            `thread` runs each trial in a thread pool, which is best when `run_model` starts
+            external processes or jobs (as the language agnostic interface does).
+            `process` runs each trial in a pool of worker processes, which is best when
+            a python wrapper does CPU heavy work directly in `run_model`, since it is not
+            limited by the GIL. The wrapper is copied to each worker once, when the pool starts,
+            and what the wrapper stores for a trial in the attributes listed in
+            :attr:`.BaseWrapper.trial_result_attributes` is sent back
+            (see :meth:`.BaseWrapper.export_trial_results`). The trials sent to the workers don't have
+            their experiment (see :attr:`.BaseWrapper.supports_process_backend`). Not supported by
+            :class:`.ScriptWrapper`, whose scripts already run in their own processes.
+            `inline` runs each trial one after another in the main thread.
+            Defaults to `thread`."""
+        },
+    )
+    max_workers: Optional[int] = field(
+        default=None,
+        metadata={
+            "doc": """Maximum number of threads or processes used to deploy trials with `run_backend`.
+            Defaults to the python default for the chosen pool if not specified."""
+        },
+    )
+    fetch_workers: Optional[int] = field(
+        default=None,
+        metadata={
+            "doc": """Number of threads fetching metric data, and evaluating the metrics on it, at once,
+            across the trials that completed and the metrics (see :meth:`.ModularMetric.fetch_trials_data`).
+            Wrapper methods called this way (`fetch_trial_data`) must not change the working directory,
+            and metric functions must be thread safe. The data of each trial is still fetched from
+            the wrapper once for all metrics. Defaults to fetching one trial at a time."""
+        },
+    )
+    metric_cache_max_mb: Optional[float] = field(
+        default=None,
+        metadata={
+            "doc": """Megabytes of fetched trial data (what `fetch_trial_data` returns, such as arrays of
+            model output) to keep in memory. Once over it, the least recently used trials are evicted
+            and fetched again if they are needed (see :mod:`boa.metric_cache`). Defaults to no limit."""
+        },
+    )
+    metric_cache_max_age: Optional[float] = field(
+        default=None,
+        metadata={
+            "doc": """Seconds to keep fetched trial data cached for. Defaults to keeping it for the
+            whole optimization."""
+        },
+    )
+    persist_metric_cache: bool = field(
+        default=False,
+        metadata={
+            "doc": """Also write the data each metric computes for a trial to the `metric_cache` directory
+            of the experiment directory, so a resumed optimization (and data evicted from memory)
+            reads it back instead of fetching it again."""
+        },
+    )
+    trial_resources: Optional[dict] = field(
+        default=None,
+        metadata={
+            "doc": """CPU cores (`cpus`) and memory in MB (`memory`) each trial needs while it runs,
+            for example `{cpus: 2, memory: 4000}`. Values can also be jinja2 expressions of the
+            trial's parameters (and `n_arms`, the number of arms of the trial), to compute them
+            from the parameters, for example `cpus: "4 if n_layers > 10 else 1"`.
+            When set, trials are only started once `resource_pool` has room for them (other
+            trials wait in the runner until earlier trials finish), and each trial's script commands
+            are pinned to the CPU cores assigned to it (see :mod:`boa.resources`).
+            Defaults to no resource accounting, starting every trial right away."""
+        },
+    )
+    resource_pool: dict = field(
+        factory=dict,
+        metadata={
+            "doc": """CPU cores (`cpus`) and memory in MB (`memory`) available to trials
+            with `trial_resources`. Defaults to all CPU cores BOA can run on and unlimited memory."""
+        },
+    )
+    batch_queue: Optional[str] = field(
+        default=None,
+        metadata={
+            "doc": """Submit trials as array jobs to a batch queue instead of running `run_model`
+            for each trial. Deployed trials are grouped into array jobs (one job per trial,
+            running its rendered `run_model` command), and every status poll queries the queue once
+            for all jobs, only checking the trials whose jobs finished (see :class:`.ArrayJobRunner`).
+            Either `local` to run the jobs on this machine (with `n_slots` of them at a time, see
+            `batch_queue_options`), or your own :class:`.BatchQueue` subclass as
+            `path/to/queue.py:ClassName` or `package.module.ClassName`.
+            Set `run_trials_in_batches: true` in the scheduler options so trials are
+            deployed (and submitted) together. See :mod:`boa.batch_queue` for more details."""
+        },
+    )
+    batch_queue_options: dict = field(
+        factory=dict,
+        metadata={
+            "doc": """Keyword arguments to create the `batch_queue` with,
+            for example `{n_slots: 4}` for the `local` queue."""
+        },
+    )
+    array_size: Optional[int] = field(
+        default=None,
+        metadata={
+            "doc": """Most trials to submit in a single array job with `batch_queue`.
+            Defaults to submitting all trials deployed together in one array job."""
+        },
+    )
+    storage: Optional[StorageBackend | str] = field(
+        default=StorageBackend.JSON,
+        converter=converters.optional(StorageBackend.from_str_or_enum),
+        metadata={
+            "doc": """Where BOA saves the state of the optimization as it goes.
+            `json` saves it to `scheduler.json` in the experiment directory, with the trials that
+            changed since the last save appended to a journal file next to it
+            (see :class:`.SchedulerJournal`).
+            `json.gz` and `json.zst` do the same, but compress `scheduler.json.gz` (or `.zst`,
+            which needs the `zstandard` package) with gzip (or zstd).
+            `sqlite` saves it to a `scheduler.sqlite` database in the experiment directory, only
+            writing the trials and data that are new or changed on each save, which can be read
+            while the optimization runs, with queries by trial status or metric
+            (see :class:`.SQLiteSchedulerStore`).
+            Either file can be passed to `boa --scheduler-path` to resume the optimization.
+            Defaults to `json`."""
+        },
+    )
+    checkpoint_every_n_trials: Optional[int] = field(
+        default=None,
+        metadata={
+            "doc": """Only checkpoint the optimization (save it to `storage`) once this many trials have
+            finished since the last checkpoint, instead of every time a trial finishes, so saving isn't
+            what limits how fast cheap trials can run. See `checkpoint_every_seconds` for what a crash
+            can lose. The optimization is always checkpointed when it finishes or stops with an error,
+            and with `checkpoint_on_step_change`, when it moves on to a new model.
+            Defaults to checkpointing every time trials finish, unless `checkpoint_every_seconds` is set."""
+        },
+    )
+    checkpoint_every_seconds: Optional[float] = field(
+        default=None,
+        metadata={
+            "doc": """Only checkpoint the optimization once this many seconds have passed since the last
+            checkpoint (or once `checkpoint_every_n_trials` trials have finished, whichever comes first).
+            Every checkpoint is consistent on disk, so if BOA is killed the optimization can be resumed
+            from the last checkpoint that was written, only losing what happened after it: the results of
+            trials that finished since (which are recovered as running trials and checked again on resume,
+            see `recovery_workers`), and the trials started since (whose trial directories are left behind).
+            Defaults to checkpointing every time trials finish, unless `checkpoint_every_n_trials` is set."""
+        },
+    )
+    checkpoint_on_step_change: bool = field(
+        default=True,
+        metadata={
+            "doc": """Checkpoint the optimization whenever it moves on to the next generation step
+            (for example from Sobol to a Bayesian model), even if neither `checkpoint_every_n_trials`
+            nor `checkpoint_every_seconds` says a checkpoint is due yet."""
+        },
+    )
+    recovery_workers: Optional[int] = field(
+        default=None,
+        metadata={
+            "doc": """Number of trials whose status is checked at once when an optimization is resumed
+            (see :func:`.recover_running_trials`), since the trials that were running when it stopped
+            have to be checked before any new trial is started.
+            Defaults to the python default for a thread pool if not specified."""
+        },
+    )
+    recovery_timeout: Optional[float] = field(
+        default=None,
+        metadata={
+            "doc": """Seconds to wait for the status checks of the trials that were running when an
+            optimization is resumed. Trials whose checks haven't started by then are left running
+            and are checked by the scheduler's regular polling instead, so new trials can start
+            (checks that already started are waited for). Defaults to waiting for all checks."""
+        },
+    )
+    resume_running_trials: bool = field(
+        default=False,
+        metadata={
+            "doc": """Keep polling trials that are still running when an optimization is resumed,
+            instead of marking them failed. Use this when trials run outside of BOA (such as batch
+            queue jobs) and outlive a restart of the optimization."""
+        },
+    )
     base_path: Optional[PathLike] = field(
         default=".",
     )
@@ -403,6 +664,9 @@ class BOAScriptOptions(_Utils):
                 raise TypeError("Must specify either run_cmd or run_model, not both")
             config["run_model"] = config.pop("run_cmd")
 
+        if config.get("set_trial_status") and config.get("set_trial_statuses"):
+            raise TypeError("Must specify either set_trial_status or set_trial_statuses, not both")
+
         rel_to_config = config.get("rel_to_config", None)
         rel_to_launch = config.get("rel_to_launch", None)
         if rel_to_config and rel_to_launch:
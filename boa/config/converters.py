@@ -13,7 +13,7 @@ from ax.modelbridge.generation_node import GenerationStep
 from ax.modelbridge.registry import Models
 from ax.models.torch.botorch_modular.surrogate import Surrogate
 from ax.service.utils.instantiation import TParameterRepresentation
-from ax.service.utils.scheduler_options import SchedulerOptions
+from ax.service.utils.scheduler_options import SchedulerOptions, TrialType
 
 from boa.utils import check_min_package_version
 
@@ -37,6 +37,14 @@ def _convert_noton_type(converter, type_, default_if_none=None) -> Any:
     return type_converter
 
 
+def _server_mode_converter(server_mode: bool | str | list[str]) -> bool | list[str]:
+    if isinstance(server_mode, str):
+        return [server_mode]
+    if isinstance(server_mode, (list, tuple)):
+        return list(server_mode)
+    return bool(server_mode)
+
+
 def _metric_converter(ls: list[BOAMetric | dict]) -> list[BOAMetric]:
     from .config import BOAMetric
 
@@ -133,6 +141,10 @@ def _scheduler_converter(scheduler_options: dict) -> SchedulerOptions:
             d=scheduler_options["global_stopping_strategy"], module=global_stopping_strats
         )
 
+    if isinstance(scheduler_options.get("trial_type"), str):
+        # trial_type: batch_trial (or BATCH_TRIAL) to generate multi-arm BatchTrials
+        scheduler_options["trial_type"] = TrialType[scheduler_options["trial_type"].upper()]
+
     return SchedulerOptions(**scheduler_options)
 
 
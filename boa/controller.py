@@ -21,7 +21,7 @@ from boa.ax_instantiation_utils import get_experiment, get_scheduler
 from boa.config import BOAConfig
 from boa.definitions import PathLike
 from boa.logger import get_logger
-from boa.runner import WrappedJobRunner
+from boa.runner import ArrayJobRunner, WrappedJobRunner
 from boa.scheduler import Scheduler
 from boa.utils import yaml_dump
 from boa.wrappers.base_wrapper import BaseWrapper
@@ -134,9 +134,8 @@ class Controller:
         get_exp_kw = get_exp_kw or {}
         get_scheduler_kw = get_scheduler_kw or {}
 
-        self.experiment = get_experiment(
-            self.config, WrappedJobRunner(wrapper=self.wrapper), self.wrapper, **get_exp_kw
-        )
+        runner_cls = ArrayJobRunner if self.config.script_options.batch_queue else WrappedJobRunner
+        self.experiment = get_experiment(self.config, runner_cls(wrapper=self.wrapper), self.wrapper, **get_exp_kw)
         self.scheduler = get_scheduler(self.experiment, config=self.config, **get_scheduler_kw)
         return self.scheduler, self.wrapper
 
@@ -183,20 +182,26 @@ class Controller:
                 scheduler.run_all_trials()
         except BaseException as e:
             final_msg = f"Error Completing because of {repr(e)}"
+            # always checkpoint when stopping, whatever the checkpoint policy skipped
+            scheduler.save_data(wait=True)
             raise
         finally:
-            self.logger.info(
-                f"\n{HEADER_BAR}"
-                f"\n{final_msg}"
-                f"""\n{LOG_INFO.format(
-                    exp_dir=self.wrapper.experiment_dir,
-                    start_time=start_tm,
-                    scheduler_path=Path(wrapper.experiment_dir) / scheduler.scheduler_filepath,
-                    opt_csv_path=Path(wrapper.experiment_dir) / scheduler.opt_csv)}"""
-                f"\nEnd Time: {get_dt_now_as_str()}"
-                f"\nTotal Run Time: {time.time() - start}"
-                "\n"
-                f"\n{exp_to_df(scheduler.experiment)}"
-                f"\n{HEADER_BAR}"
-            )
+            try:
+                # raises if the last checkpoints failed to be written
+                scheduler.flush_data()
+            finally:
+                self.logger.info(
+                    f"\n{HEADER_BAR}"
+                    f"\n{final_msg}"
+                    f"""\n{LOG_INFO.format(
+                        exp_dir=self.wrapper.experiment_dir,
+                        start_time=start_tm,
+                        scheduler_path=Path(wrapper.experiment_dir) / scheduler.scheduler_filepath,
+                        opt_csv_path=Path(wrapper.experiment_dir) / scheduler.opt_csv)}"""
+                    f"\nEnd Time: {get_dt_now_as_str()}"
+                    f"\nTotal Run Time: {time.time() - start}"
+                    "\n"
+                    f"\n{exp_to_df(scheduler.experiment)}"
+                    f"\n{HEADER_BAR}"
+                )
         return scheduler
@@ -0,0 +1,233 @@
+"""
+###################################
+JSON Codec
+###################################
+
+JSON encoding and decoding for the files BOA writes and reads: scheduler snapshots,
+journals and databases (see :mod:`boa.storage`), trial data files
+(see :func:`.save_trial_data`), json configs (see :func:`.load_json`) and the results store.
+
+The process wide codec (see :func:`get_json_codec`) is :class:`OrjsonCodec` if
+`orjson <https://github.com/ijl/orjson>`_ is installed (it is a dependency of BOA),
+and :class:`JSONCodec` (the standard library) otherwise.
+The standard library fallback is several times slower: it is pure Python for the NumPy values,
+converting arrays to lists of Python objects with ``tolist`` before encoding them,
+so large arrays cost a lot of time and memory.
+Set the ``BOA_JSON_CODEC`` environment variable (``json`` or ``orjson``) or call
+:func:`set_json_codec` to pick one, or to plug in your own subclass of :class:`JSONCodec`.
+
+Both codecs encode NumPy arrays and scalars, and write JSON that decodes to the same objects,
+so files written with one can be read with the other.
+NaN and infinity, which orjson can't write, are written as ``NaN`` and ``Infinity``
+like the standard library does.
+
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from typing import Any, Optional
+
+import numpy as np
+
+__all__ = [
+    "JSONCodec",
+    "OrjsonCodec",
+    "get_json_codec",
+    "set_json_codec",
+]
+
+#: Environment variable that picks the codec by name (see :data:`JSON_CODECS`)
+JSON_CODEC_ENV_VAR = "BOA_JSON_CODEC"
+
+
+class JSONCodec:
+    """Standard library JSON codec, and the interface of the codecs.
+
+    Much slower than :class:`OrjsonCodec`, NumPy arrays are converted to lists (with ``tolist``)
+    to be encoded, so it is only the fallback for when orjson isn't installed.
+
+    Examples
+    --------
+    >>> codec = JSONCodec()
+    >>> codec.dumps({"x": np.arange(3), "y": np.float32(0.5), "z": float("nan")})
+    b'{"x":[0,1,2],"y":0.5,"z":NaN}'
+    >>> codec.loads(b'{"z": NaN}')
+    {'z': nan}
+    """
+
+    name = "json"
+
+    def dumps(self, obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+        """Encode ``obj`` to UTF-8 JSON, compact unless ``indent``
+
+        Parameters
+        ----------
+        obj
+            Object to encode, of JSON types, NumPy arrays or NumPy scalars
+        indent
+            Indent nested objects and arrays, for files meant to be read by people
+        sort_keys
+            Sort the keys of the objects, so equal objects encode the same
+        """
+        if indent:
+            return json.dumps(obj, indent=4, sort_keys=sort_keys, default=_numpy_default).encode()
+        return json.dumps(obj, separators=(",", ":"), sort_keys=sort_keys, default=_numpy_default).encode()
+
+    def loads(self, data: bytes | str) -> Any:
+        """Decode JSON ``data``"""
+        return json.loads(data)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}()"
+
+
+class OrjsonCodec(JSONCodec):
+    """JSON codec of the `orjson <https://github.com/ijl/orjson>`_ package.
+
+    NaN and infinite floats (and the arrays with them), and anything else orjson can't encode,
+    are encoded by the standard library instead, as is JSON with ``NaN`` or ``Infinity``
+    in it when decoding. Indented JSON is indented by 2 spaces instead of 4.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self._orjson = orjson
+        self._options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(self, obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+        options = self._options
+        if indent:
+            options |= self._orjson.OPT_INDENT_2
+        if sort_keys:
+            options |= self._orjson.OPT_SORT_KEYS
+        try:
+            data = self._orjson.dumps(obj, default=_numpy_default, option=options)
+        except (self._orjson.JSONEncodeError, TypeError):
+            # such as integers too large for 64 bits, or keys of mixed types with sort_keys
+            return super().dumps(obj, indent=indent, sort_keys=sort_keys)
+        # orjson writes NaN and infinity as null, so only JSON with null in it can have lost them
+        if b"null" in data and _has_non_finite(obj):
+            if not hasattr(self._orjson, "Fragment"):  # orjson < 3.9
+                return super().dumps(obj, indent=indent, sort_keys=sort_keys)
+            # only what has them is encoded by the standard library
+            return self._orjson.dumps(
+                _non_finite_as_fragments(obj, self._orjson.Fragment), default=_numpy_default, option=options
+            )
+        return data
+
+    def loads(self, data: bytes | str) -> Any:
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            return super().loads(data)  # NaN or Infinity, which only the standard library reads
+
+
+#: Codecs that can be picked by name
+JSON_CODECS = {JSONCodec.name: JSONCodec, OrjsonCodec.name: OrjsonCodec}
+
+_LEAF_TYPES = (str, int, bool, type(None))
+
+_codec: Optional[JSONCodec] = None
+_codec_lock = threading.Lock()
+
+
+def get_json_codec() -> JSONCodec:
+    """Return the process wide :class:`JSONCodec`, picking it the first time
+    (see the module documentation)"""
+    global _codec
+    with _codec_lock:
+        if _codec is None:
+            _codec = _default_codec()
+        return _codec
+
+
+def set_json_codec(codec: str | JSONCodec | None):
+    """Set the process wide codec, by name (see :data:`JSON_CODECS`) or as an instance.
+    ``None`` picks the default codec again the next time one is needed."""
+    global _codec
+    if isinstance(codec, str):
+        codec = JSON_CODECS[codec]()
+    with _codec_lock:
+        _codec = codec
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Encode ``obj`` to JSON with the process wide codec, see :meth:`JSONCodec.dumps`"""
+    return get_json_codec().dumps(obj, indent=indent, sort_keys=sort_keys)
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode JSON ``data`` with the process wide codec"""
+    return get_json_codec().loads(data)
+
+
+def _default_codec() -> JSONCodec:
+    name = os.environ.get(JSON_CODEC_ENV_VAR)
+    if name:
+        if name not in JSON_CODECS:
+            raise ValueError(f"Unknown {JSON_CODEC_ENV_VAR} {name!r}, must be one of {list(JSON_CODECS)}")
+        return JSON_CODECS[name]()
+    try:
+        return OrjsonCodec()
+    except ImportError:
+        return JSONCodec()
+
+
+def _numpy_default(obj):
+    """encode the NumPy values json (and orjson, for the dtypes it doesn't support) can't,
+    as Python lists and scalars (which is what makes :class:`JSONCodec` slow for large arrays)"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _has_non_finite(obj) -> bool:
+    """whether there is a NaN or infinite float anywhere in ``obj``"""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        # exact types first, they are nearly everything and much faster to check than isinstance
+        kind = type(value)
+        if kind is dict:
+            stack.extend(value.values())
+        elif kind is list:
+            stack.extend(value)
+        elif kind is float:
+            if not math.isfinite(value):
+                return True
+        elif kind in _LEAF_TYPES:
+            continue
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif isinstance(value, (float, np.floating)):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, np.ndarray) and value.dtype.kind in "fc":
+            if not np.isfinite(value).all():
+                return True
+    return False
+
+
+def _non_finite_as_fragments(obj, fragment: type):
+    """copy of ``obj`` with its NaN and infinite floats, and the arrays with them,
+    encoded by the standard library into orjson ``fragment`` objects"""
+    if isinstance(obj, dict):
+        return {key: _non_finite_as_fragments(value, fragment) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_non_finite_as_fragments(value, fragment) for value in obj]
+    if isinstance(obj, (float, np.floating)):
+        return obj if math.isfinite(obj) else fragment(json.dumps(float(obj)))
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == "f" and not np.isfinite(obj).all():
+        return fragment(json.dumps(obj.tolist()))
+    return obj
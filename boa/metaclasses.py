@@ -8,6 +8,10 @@ Meta class modify class behaviors. For example, the :class:`.WrapperRegister` en
 to make sure that if users do any directory changes inside a wrapper function,
 the original directory is returned to afterwards.
 
+The methods that run in many threads at once (``job_command``, ``set_trial_status``,
+``set_trial_statuses`` and ``fetch_trial_data``) aren't wrapped, since the working directory is shared
+by the whole process. They shouldn't change directory, but use paths of the trial or experiment directory.
+
 """
 import sys
 from abc import ABCMeta
@@ -42,9 +46,12 @@ class WrapperRegister(ABCMeta):
         cls.mk_experiment_dir = write_exception_to_log(cd_and_cd_back_dec()(cls.mk_experiment_dir))
         cls.write_configs = write_exception_to_log(cd_and_cd_back_dec()(cls.write_configs))
         cls.run_model = write_exception_to_log(cd_and_cd_back_dec()(cls.run_model))
-        cls.set_trial_status = write_exception_to_log(cd_and_cd_back_dec()(cls.set_trial_status))
-        cls.fetch_trial_data = write_exception_to_log(cd_and_cd_back_dec()(cls.fetch_trial_data))
-        cls._fetch_trial_data = write_exception_to_log(cd_and_cd_back_dec()(cls._fetch_trial_data))
+        # run concurrently (polled and fetched in thread pools), so they don't change directory
+        cls.job_command = write_exception_to_log(cls.job_command)
+        cls.set_trial_status = write_exception_to_log(cls.set_trial_status)
+        cls.set_trial_statuses = write_exception_to_log(cls.set_trial_statuses)
+        cls.fetch_trial_data = write_exception_to_log(cls.fetch_trial_data)
+        cls._fetch_trial_data = write_exception_to_log(cls._fetch_trial_data)
         try:
             _path = Path(sys.modules[cls.__module__].__file__)
         except AttributeError:  # running in a jupyter notebook `__file__` doesn't work
@@ -0,0 +1,271 @@
+"""
+###################################
+Metric Cache
+###################################
+
+Bounded cache of the results of fetching trial data, used for what the wrapper returns
+for each trial (:attr:`.BaseWrapper.metric_cache`, often large arrays of model output)
+and for the data each metric computes from it (:attr:`.ModularMetric.trial_data_cache`).
+
+The cache evicts the least recently used trials once the payloads it holds take up more than
+``metric_cache_max_mb`` megabytes, and drops trials cached more than ``metric_cache_max_age``
+seconds ago (see :class:`.BOAScriptOptions`).
+With ``persist_metric_cache``, the data each metric computed is also written to
+``metric_cache/<metric name>/<trial index>.json`` in the experiment directory (so it is keyed by
+experiment and trial), and a resumed optimization reads it back instead of fetching it again.
+Entries evicted from memory are read back from disk too, with their NumPy arrays restored.
+
+Use :meth:`MetricCache.invalidate` (or :meth:`.BaseWrapper.invalidate_metric_cache` and
+:meth:`.ModularMetric.invalidate_cache`) to drop trials whose data changed.
+
+"""
+
+from __future__ import annotations
+
+import collections
+import pathlib
+import threading
+import time
+from typing import Any, Hashable, Iterator, MutableMapping, Optional
+
+import numpy as np
+
+from boa import json_codec
+from boa.definitions import PathLike
+from boa.logger import get_logger
+from boa.wrappers.wrapper_utils import write_file_atomic
+
+logger = get_logger()
+
+#: Directory in the experiment directory that metric data is persisted to
+METRIC_CACHE_DIR = "metric_cache"
+# key of the objects NumPy arrays are persisted as
+_ARRAY_TAG = "__ndarray__"
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "time")
+
+    def __init__(self, value, nbytes: int, time_: float):
+        self.value = value
+        self.nbytes = nbytes
+        self.time = time_
+
+
+class MetricCache(MutableMapping):
+    """Least recently used cache of trial data, by trial index.
+
+    Parameters
+    ----------
+    max_bytes
+        Evict the least recently used entries once the cached payloads take up more
+        than this many bytes (see :func:`payload_nbytes`). Unbounded if None.
+    max_age
+        Drop entries cached more than this many seconds ago. Kept forever if None.
+    path
+        Directory to also write each entry to, as ``<key>.json``, and to read entries
+        missing from memory from. Only in memory if None.
+
+    Examples
+    --------
+    >>> cache = MetricCache(max_bytes=2000)
+    >>> cache[0] = {"y_pred": np.zeros(100)}  # 800 bytes
+    >>> cache[1] = {"y_pred": np.zeros(100)}
+    >>> _ = cache[0]  # now the most recently used
+    >>> cache[2] = {"y_pred": np.zeros(100)}
+    >>> sorted(cache)
+    [0, 2]
+    """
+
+    def __init__(
+        self, max_bytes: Optional[int] = None, max_age: Optional[float] = None, path: Optional[PathLike] = None
+    ):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.path = pathlib.Path(path) if path is not None else None
+        self._entries: collections.OrderedDict[Hashable, _Entry] = collections.OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock")
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the payloads cached in memory"""
+        return self._nbytes
+
+    def __getitem__(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry):
+                self._drop(key)
+                if self.path is not None:
+                    self._file(key).unlink(missing_ok=True)
+                entry = None
+            if entry is None:
+                value = self._read(key)
+                if value is None:
+                    raise KeyError(key)
+                entry = self._add(key, value, time.time())
+            self._entries.move_to_end(key)
+            return entry.value
+
+    def __setitem__(self, key: Hashable, value):
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._add(key, value, time.time())
+            if self.path is not None:
+                self.path.mkdir(parents=True, exist_ok=True)
+                write_file_atomic(self._file(key), json_codec.dumps(_tag_arrays(value)))
+
+    def __delitem__(self, key: Hashable):
+        with self._lock:
+            found = key in self._entries
+            if found:
+                self._drop(key)
+            if self.path is not None and self._file(key).exists():
+                self._file(key).unlink()
+                found = True
+            if not found:
+                raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        """Whether ``key`` is cached, in memory or on disk, without making it the most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                return True
+            if self.path is None:
+                return False
+            try:
+                mtime = self._file(key).stat().st_mtime
+            except OSError:
+                return False
+            return self.max_age is None or time.time() - mtime <= self.max_age
+
+    def __iter__(self) -> Iterator[Hashable]:
+        """The keys of the entries in memory, least recently used first"""
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        """The number of entries in memory"""
+        return len(self._entries)
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop the entry of ``key``, or every entry if None, from memory and disk"""
+        with self._lock:
+            if key is not None:
+                self.pop(key, None)
+                return
+            self._entries.clear()
+            self._nbytes = 0
+            if self.path is not None and self.path.exists():
+                for file in self.path.glob("*.json"):
+                    file.unlink()
+
+    def _add(self, key: Hashable, value, time_: float) -> _Entry:
+        entry = self._entries[key] = _Entry(value, payload_nbytes(value), time_)
+        self._nbytes += entry.nbytes
+        self._evict()
+        return entry
+
+    def _drop(self, key: Hashable):
+        self._nbytes -= self._entries.pop(key).nbytes
+
+    def _evict(self):
+        if self.max_age is not None:
+            for key in [key for key, entry in self._entries.items() if self._expired(entry)]:
+                self._drop(key)
+        if self.max_bytes is not None:
+            # always keep the entry just added, even if it is too big on its own
+            while self._nbytes > self.max_bytes and len(self._entries) > 1:
+                key = next(iter(self._entries))
+                self._drop(key)
+                logger.debug(f"Evicted the cached data of trial {key} to stay under {self.max_bytes} bytes.")
+
+    def _expired(self, entry: _Entry) -> bool:
+        return self.max_age is not None and time.time() - entry.time > self.max_age
+
+    def _file(self, key: Hashable) -> pathlib.Path:
+        return self.path / f"{key}.json"
+
+    def _read(self, key: Hashable) -> Any:
+        if self.path is None:
+            return None
+        file = self._file(key)
+        try:
+            if self.max_age is not None and time.time() - file.stat().st_mtime > self.max_age:
+                return None
+            return _restore_arrays(json_codec.loads(file.read_bytes()))
+        except (OSError, ValueError, TypeError):
+            return None
+
+
+def _tag_arrays(obj):
+    """replace the NumPy arrays in ``obj`` with objects that record their dtype, see :func:`_restore_arrays`"""
+    if isinstance(obj, np.ndarray):
+        return {_ARRAY_TAG: obj, "dtype": obj.dtype.str}
+    if isinstance(obj, dict):
+        return {key: _tag_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_tag_arrays(value) for value in obj]
+    return obj
+
+
+def _restore_arrays(obj):
+    if isinstance(obj, dict):
+        if _ARRAY_TAG in obj:
+            return np.asarray(obj[_ARRAY_TAG], dtype=obj["dtype"])
+        return {key: _restore_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_restore_arrays(value) for value in obj]
+    return obj
+
+
+def payload_nbytes(obj) -> int:
+    """Approximate size in memory of a payload of NumPy arrays and JSON types
+
+    Examples
+    --------
+    >>> payload_nbytes({"y_true": np.zeros(1000), "y_pred": [0.0] * 1000})
+    16000
+    """
+    nbytes = 0
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            if value and all(type(item) in (float, int) for item in value):
+                nbytes += 8 * len(value)
+            else:
+                stack.extend(value)
+        elif isinstance(value, np.memmap):
+            continue  # read from disk as needed, not held in memory
+        elif isinstance(value, np.ndarray):
+            nbytes += value.nbytes
+        elif isinstance(value, (str, bytes)):
+            nbytes += len(value)
+        else:
+            nbytes += 8
+    return nbytes
+
+
+def metric_cache_options(script_options) -> dict:
+    """The :class:`MetricCache` arguments set by the ``metric_cache_*`` options of
+    :class:`.BOAScriptOptions` (if any)"""
+    max_mb = getattr(script_options, "metric_cache_max_mb", None)
+    return {
+        "max_bytes": None if max_mb is None else int(max_mb * 1e6),
+        "max_age": getattr(script_options, "metric_cache_max_age", None),
+    }
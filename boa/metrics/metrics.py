@@ -11,6 +11,11 @@ Metrics that are already defined in BOA:
 - :class:`.RSquared`
 - :class:`.Mean`
 - :class:`.NormalizedRootMeanSquaredError`
+- :class:`.StreamingMeanSquaredError`
+- :class:`.StreamingRootMeanSquaredError`
+- :class:`.StreamingRSquared`
+- :class:`.StreamingMean`
+- :class:`.StreamingNormalizedRootMeanSquaredError`
 
 Any of these Metrics can be used directly in your configuration file.
 
@@ -83,6 +88,24 @@ something like this
         value = get_value_somehow()
         return value
 
+Streaming Metrics
+*****************
+
+If your model output is too large to hold in memory alongside the optimizer, use the
+``Streaming`` versions of the metrics (see :mod:`.streaming_funcs`). They read their inputs
+a chunk at a time, from memory-mapped arrays (such as ``.npy`` files written by your model,
+see :mod:`Wrappers <boa.wrappers>`) or from any iterable of chunks your wrapper returns.
+Pass their options with ``metric_func_kwargs``:
+
+..  code-block:: YAML
+
+    objective:
+        metrics:
+            - metric: StreamingNRMSE
+              metric_func_kwargs:
+                  chunk_size: 1000000  # rows read at a time
+                  iqr_method: approximate  # or exact (the default)
+
 """
 from __future__ import annotations
 
@@ -97,6 +120,12 @@ from boa.metrics.metric_funcs import (
 )
 from boa.metrics.metric_funcs import setup_sklearn_metric
 from boa.metrics.modular_metric import ModularMetric
+from boa.metrics.streaming_funcs import (
+    streaming_mean,
+    streaming_mean_squared_error,
+    streaming_normalized_root_mean_squared_error,
+    streaming_r2_score,
+)
 from boa.metrics.synthetic_funcs import setup_synthetic_metric
 
 
@@ -289,6 +318,114 @@ class NormalizedRootMeanSquaredError(ModularMetric):
 NRMSE = NormalizedRootMeanSquaredError
 normalized_root_mean_squared_error = NormalizedRootMeanSquaredError
 
+
+class StreamingMeanSquaredError(ModularMetric):
+    """
+    Mean squared error regression loss, reading y_true and y_pred a chunk at a time.
+
+    See Also
+    ========
+    :func:`.streaming_mean_squared_error`
+        for the function parameters to guide your json attribute-value pairs needed.
+    :class:`.ModularMetric`
+        For information on all parameters various metrics in general can be supplied
+    """
+
+    _metric_to_eval = streaming_mean_squared_error
+
+    def __init__(self, lower_is_better=True, *args, **kwargs):
+        super().__init__(lower_is_better=lower_is_better, *args, **kwargs)
+
+
+StreamingMSE = StreamingMeanSquaredError
+
+
+class StreamingRootMeanSquaredError(ModularMetric):
+    """
+    Root mean squared error regression loss, reading y_true and y_pred a chunk at a time.
+
+    See Also
+    ========
+    :func:`.streaming_mean_squared_error`
+        with squared=False for the function parameters to guide your json attribute-value pairs needed.
+    :class:`.ModularMetric`
+        For information on all parameters various metrics in general can be supplied
+    """
+
+    _metric_to_eval = streaming_mean_squared_error
+
+    def __init__(self, lower_is_better=True, metric_func_kwargs=None, *args, **kwargs):
+        metric_func_kwargs = {**(metric_func_kwargs or {}), "squared": False}
+        super().__init__(lower_is_better=lower_is_better, metric_func_kwargs=metric_func_kwargs, *args, **kwargs)
+
+
+StreamingRMSE = StreamingRootMeanSquaredError
+
+
+class StreamingRSquared(ModularMetric):
+    """
+    :math:`R^2` (coefficient of determination) regression score function,
+    reading y_true and y_pred a chunk at a time.
+
+    See Also
+    ========
+    :func:`.streaming_r2_score`
+        for the function parameters to guide your json attribute-value pairs needed.
+    :class:`.ModularMetric`
+        For information on all parameters various metrics in general can be supplied
+    """
+
+    _metric_to_eval = streaming_r2_score
+
+    def __init__(self, lower_is_better=True, *args, **kwargs):
+        super().__init__(lower_is_better=lower_is_better, *args, **kwargs)
+
+
+StreamingR2 = StreamingRSquared
+
+
+class StreamingMean(ModularMetric):
+    """
+    Arithmetic mean of all the values of your metric, read a chunk at a time.
+    Defaults to minimization, if you want to maximize,
+    specify lower_is_better: False or minimize: False in your configuration
+
+    See Also
+    ========
+    :func:`.streaming_mean`
+        for the function parameters to guide your json attribute-value pairs needed.
+    :class:`.ModularMetric`
+        For information on all parameters various metrics in general can be supplied
+    """
+
+    _metric_to_eval = streaming_mean
+
+    def __init__(self, lower_is_better=True, *args, **kwargs):
+        super().__init__(lower_is_better=lower_is_better, *args, **kwargs)
+
+
+class StreamingNormalizedRootMeanSquaredError(ModularMetric):
+    """
+    Normalized root mean squared error, reading y_true and y_pred a chunk at a time.
+    Normalization defaults to the exact IQR (inner quartile range) of y_pred,
+    set ``iqr_method: approximate`` to find it in fewer reads.
+
+    See Also
+    ========
+    :func:`.streaming_normalized_root_mean_squared_error`
+        for the function parameters to guide your json attribute-value pairs needed.
+    :class:`.ModularMetric`
+        For information on all parameters various metrics in general can be supplied
+    """
+
+    _metric_to_eval = streaming_normalized_root_mean_squared_error
+
+    def __init__(self, lower_is_better=True, *args, **kwargs):
+        super().__init__(lower_is_better=lower_is_better, *args, **kwargs)
+
+
+StreamingNRMSE = StreamingNormalizedRootMeanSquaredError
+
 success = []
 
 
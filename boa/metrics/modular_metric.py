@@ -8,18 +8,25 @@ Modular Metric
 from __future__ import annotations
 
 import logging
+import pathlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from functools import partial
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Iterable, Optional
 
+import numpy as np
 import pandas as pd
-from ax import Data, Metric, Trial
-from ax.core.metric import MetricFetchE
+from ax import Data, Experiment, Metric
+from ax.core.base_trial import BaseTrial
+from ax.core.batch_trial import BatchTrial
+from ax.core.metric import MetricFetchE, MetricFetchResult
 from ax.core.types import TParameterization
 from ax.metrics.noisy_function import NoisyFunctionMetric
 from ax.utils.common.result import Err, Ok
 from ax.utils.measurement.synthetic_functions import FromBotorch
 
 from boa.metaclasses import MetricRegister
+from boa.metric_cache import METRIC_CACHE_DIR, MetricCache, metric_cache_options
 from boa.utils import (
     extract_init_args,
     get_dictionary_from_callable,
@@ -69,6 +76,56 @@ def _get_name(obj):
     return _get_name(obj)
 
 
+def _has_nans(wrapper_kwargs) -> bool:
+    if isinstance(wrapper_kwargs, dict):
+        nan_checks = list(wrapper_kwargs.values())
+    elif isinstance(wrapper_kwargs, list):
+        nan_checks = wrapper_kwargs
+    else:
+        nan_checks = [wrapper_kwargs]
+    return any(
+        (isinstance(elem, str) and ("nan" == elem.lower() or "na" == elem.lower()))
+        or (isinstance(elem, float) and pd.isna(elem))
+        or (elem is None)
+        for elem in nan_checks
+    )
+
+
+@contextmanager
+def _fetch_executor(workers: int):
+    """yield a function that submits a call to a pool of ``workers`` threads,
+    or that makes the call right away if there is only one worker"""
+    if workers <= 1:
+        yield _call_now
+        return
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="BoaFetch") as executor:
+        yield executor.submit
+
+
+def _call_now(func: Callable, *args, **kwargs) -> Future:
+    future = Future()
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _stack(values: list):
+    """stack the values of many arms into one array, or leave them as a list if they can't be"""
+    try:
+        stacked = np.asarray(values)
+    except ValueError:  # ragged
+        return values
+    return values if stacked.dtype == object else stacked
+
+
+def _fetches_in_batches(metric: Metric) -> bool:
+    """whether ``metric`` can be fetched for many trials at once, a :class:`ModularMetric` that
+    doesn't override ``fetch_trial_data`` (which the batches would skip)"""
+    return isinstance(metric, ModularMetric) and type(metric).fetch_trial_data is ModularMetric.fetch_trial_data
+
+
 class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
     """
     A wrappable metric defined by a generic deterministic function with the
@@ -111,6 +168,11 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
     check_for_nans
         If True, check for NaNs in the results of the metric and fail the trial if found.
         If nans are not dealt with in some way, they can cause the optimization to fail.
+    vectorized
+        If True, ``metric_to_eval`` supports being called once for many trials, when the data
+        of many trials is fetched at once (see :meth:`fetch_trials_data`). Each argument
+        from the wrapper is then stacked across the trials, with the trials along the first axis,
+        and ``metric_to_eval`` must return one value per trial.
     kwargs
     """
 
@@ -127,6 +189,7 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
         properties: Optional[dict[str]] = None,
         weight: Optional[float] = None,
         check_for_nans: Optional[bool] = True,
+        vectorized: bool = False,
         **kwargs,
     ):
         """"""  # remove init docstring from parent class to stop it showing in sphinx
@@ -156,8 +219,9 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
             **get_dictionary_from_callable(NoisyFunctionMetric.__init__, kwargs),
         )
         self.properties = properties or {}
-        self._trial_data_cache = {}
+        self._trial_data_cache = None
         self.check_for_nans = check_for_nans
+        self.vectorized = vectorized
 
     @classmethod
     def is_available_while_running(cls) -> bool:
@@ -167,12 +231,173 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
     def weight(self):
         return self._weight
 
-    def fetch_trial_data(self, trial: Trial, **kwargs):
-        if trial.index in self._trial_data_cache:
-            return Ok(Data(df=pd.DataFrame(self._trial_data_cache[trial.index])))
+    @property
+    def fetch_workers(self) -> int:
+        """Number of threads fetching the data of trials, and evaluating the metric on it, at once,
+        set by ``fetch_workers`` in :class:`.BOAScriptOptions` (1, one trial at a time, if not set)"""
+        return getattr(getattr(self.wrapper, "script_options", None), "fetch_workers", None) or 1
+
+    @property
+    def trial_data_cache(self) -> MetricCache:
+        """The data of each trial fetched for this metric, by trial index, bounded by the
+        ``metric_cache_*`` options of :class:`.BOAScriptOptions` and written to the experiment
+        directory with ``persist_metric_cache`` (see :mod:`boa.metric_cache`)"""
+        if self._trial_data_cache is None:
+            script_options = getattr(self.wrapper, "script_options", None)
+            experiment_dir = getattr(self.wrapper, "experiment_dir", None)
+            path = None
+            if getattr(script_options, "persist_metric_cache", False) and experiment_dir:
+                path = pathlib.Path(experiment_dir) / METRIC_CACHE_DIR / self.name
+            self._trial_data_cache = MetricCache(path=path, **metric_cache_options(script_options))
+        return self._trial_data_cache
+
+    def invalidate_cache(self, trial_index: Optional[int] = None):
+        """Forget the data fetched for a trial (or for every trial if None), so it is fetched
+        again the next time it is needed. What the wrapper returned for the trial stays cached,
+        see :meth:`.BaseWrapper.invalidate_metric_cache`."""
+        self.trial_data_cache.invalidate(trial_index)
+
+    def fetch_trial_data(self, trial: BaseTrial, **kwargs):
+        return self.fetch_trials_data([trial], **kwargs)[trial.index]
+
+    def fetch_trials_data(self, trials: Iterable[BaseTrial], **kwargs) -> dict[int, MetricFetchResult]:
+        """Fetch the data of many trials at once.
+
+        The wrapper is still asked for the data of each trial, and the metric function is still
+        called for each arm, by up to :attr:`fetch_workers` threads at once (so the metric function
+        has to be thread safe if there are more than one), but one :class:`~pandas.DataFrame`
+        is built for the batch. If the metric is ``vectorized``, the metric function is called
+        only once, see :meth:`_evaluate_vectorized`.
+
+        Parameters
+        ----------
+        trials
+            The trials to fetch the data of
+        kwargs
+            Passed to the wrapper and the metric function
+
+        Returns
+        -------
+        dict[int, MetricFetchResult]
+            The data (or the error fetching it) of each trial, by trial index
+        """
+        with _fetch_executor(self.fetch_workers) as submit:
+            return self._finish_fetches(self._start_fetches(trials, submit, **kwargs), submit, **kwargs)
+
+    @classmethod
+    def fetch_experiment_data_multi(
+        cls,
+        experiment: Experiment,
+        metrics: list[Metric],
+        trials: Optional[list[BaseTrial]] = None,
+        **kwargs,
+    ) -> dict[int, dict[str, MetricFetchResult]]:
+        """Fetch the data of many trials for many metrics, evaluating each metric
+        for all the trials at once (see :meth:`fetch_trials_data`). The wrapper is asked for
+        the data of every trial and metric, and each metric is evaluated, by up to :attr:`fetch_workers`
+        threads at once. Metrics that override :meth:`fetch_trial_data` (and metrics that aren't
+        :class:`ModularMetric`) are fetched one trial at a time with it instead."""
+        trials = trials if trials is not None else experiment.trials.values()
+        trials = [trial for trial in trials if trial.status.expecting_data]
+        results = {trial.index: {} for trial in trials}
+        modular_metrics = [metric for metric in metrics if _fetches_in_batches(metric)]
+        workers = max((metric.fetch_workers for metric in modular_metrics), default=1)
+        with _fetch_executor(workers) as submit:
+            fetches = [(metric, metric._start_fetches(trials, submit, **kwargs)) for metric in modular_metrics]
+            for metric, metric_fetches in fetches:
+                for trial_index, result in metric._finish_fetches(metric_fetches, submit, **kwargs).items():
+                    results[trial_index][metric.name] = result
+        for metric in metrics:
+            if not _fetches_in_batches(metric):
+                for trial in trials:
+                    results[trial.index][metric.name] = metric.fetch_trial_data(trial, **kwargs)
+        return results
+
+    def bulk_fetch_experiment_data(
+        self,
+        experiment: Experiment,
+        metrics: list[Metric],
+        trials: Optional[list[BaseTrial]] = None,
+        **kwargs,
+    ) -> dict[int, dict[str, MetricFetchResult]]:
+        # the name newer versions of Ax fetch the data of a group of metrics with
+        return self.fetch_experiment_data_multi(experiment=experiment, metrics=metrics, trials=trials, **kwargs)
+
+    def _start_fetches(
+        self, trials: Iterable[BaseTrial], submit: Callable[..., Future], **kwargs
+    ) -> list[tuple[BaseTrial, Future]]:
+        """start fetching what is needed to evaluate the metric for each trial (see :meth:`_fetch_trial_inputs`)"""
+        self.trial_data_cache  # created up front, the fetches share it
+        return [(trial, submit(self._fetch_trial_inputs, trial, **kwargs)) for trial in trials]
+
+    def _finish_fetches(
+        self, fetches: list[tuple[BaseTrial, Future]], submit: Callable[..., Future] = _call_now, **kwargs
+    ) -> dict[int, MetricFetchResult]:
+        """wait for the fetches of :meth:`_start_fetches` and evaluate the metric for the trials they fetched
+        (with ``submit``, see :meth:`_evaluate_batch`)"""
+        results = {}
+        batch = []  # (trial, arm name, wrapper kwargs) of each arm to evaluate
+        for trial, future in fetches:
+            fetched = future.result()
+            if isinstance(fetched, dict):
+                batch.extend((trial, arm_name, arm_kwargs) for arm_name, arm_kwargs in fetched.items())
+            else:
+                results[trial.index] = fetched
+        if batch:
+            results.update(self._evaluate_batch(batch, submit=submit, **kwargs))
+        return results
+
+    def _fetch_trial_inputs(self, trial: BaseTrial, **kwargs) -> MetricFetchResult | dict[str, dict]:
+        """the data of the trial if it doesn't need evaluating (it is cached, the wrapper failed it,
+        or it comes from a :class:`Metric`), otherwise what the wrapper returned for each arm"""
+        cached = self.trial_data_cache.get(trial.index)
+        if cached is not None:
+            return Ok(Data(df=pd.DataFrame(cached)))
+        wrapper_kwargs_by_arm = self._fetch_wrapper_kwargs(trial, **kwargs)
+        if isinstance(wrapper_kwargs_by_arm, Err) or not isinstance(self.metric_to_eval, Metric):
+            return wrapper_kwargs_by_arm
+        if isinstance(trial, BatchTrial):
+            # the metric fetches the whole trial at once, so it is fetched with what the wrapper returned
+            # for each arm in turn, keeping only the rows of that arm
+            arm_dfs = []
+            for arm_name, arm_kwargs in wrapper_kwargs_by_arm.items():
+                arm_data = self._fetch_metric_to_eval(trial, {**kwargs, **arm_kwargs})
+                if isinstance(arm_data, Err):
+                    return arm_data
+                arm_df = arm_data.unwrap().df
+                arm_dfs.append(arm_df[arm_df["arm_name"] == arm_name])
+            trial_data = Ok(Data(df=pd.concat(arm_dfs, ignore_index=True)))
+        else:
+            trial_data = self._fetch_metric_to_eval(trial, {**kwargs, **wrapper_kwargs_by_arm[trial.arm.name]})
+            if isinstance(trial_data, Err):
+                return trial_data
+        trial_df = trial_data.unwrap().df
+        sems = {arm_name: arm_kw["sem"] for arm_name, arm_kw in wrapper_kwargs_by_arm.items() if "sem" in arm_kw}
+        if sems:
+            trial_df["sem"] = trial_df["arm_name"].map(sems).fillna(trial_df["sem"])
+            trial_data = Ok(Data(df=trial_df))
+        self.trial_data_cache[trial.index] = trial_df.to_dict(orient="list")  # the format ax uses to put them in
+        return trial_data
+
+    def _fetch_metric_to_eval(self, trial: BaseTrial, kwargs: dict) -> MetricFetchResult:
+        """fetch the trial from :attr:`metric_to_eval` when it is a :class:`Metric`,
+        passing it those of ``kwargs`` its ``fetch_trial_data`` accepts"""
+        return self.metric_to_eval.fetch_trial_data(
+            trial=trial,
+            **get_dictionary_from_callable(self.metric_to_eval.fetch_trial_data, kwargs),
+        )
+
+    def _fetch_wrapper_kwargs(self, trial: BaseTrial, **kwargs) -> dict[str, dict] | Err:
+        """the kwargs the wrapper returns for each arm of the trial, by arm name"""
+        is_batch = isinstance(trial, BatchTrial)
+        if is_batch:
+            # for batch trials, the wrapper returns the kwargs of each arm keyed by arm name
+            parameters = {arm_name: arm.parameters for arm_name, arm in trial.arms_by_name.items()}
+        else:
+            parameters = trial.arm.parameters
         wrapper_kwargs = (
             self.wrapper._fetch_trial_data(
-                parameters=trial.arm.parameters,
+                parameters=parameters,
                 param_names=self.param_names,
                 trial=trial,
                 metric_name=self.name,
@@ -181,50 +406,121 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
             if self.wrapper
             else {}
         )
-        if self.check_for_nans:
-            if isinstance(wrapper_kwargs, dict):
-                nan_checks = list(wrapper_kwargs.values())
-            elif isinstance(wrapper_kwargs, list):
-                nan_checks = wrapper_kwargs
-            else:
-                nan_checks = [wrapper_kwargs]
-            for elem in nan_checks:
-                if (
-                    (isinstance(elem, str) and ("nan" == elem.lower() or "na" == elem.lower()))
-                    or (isinstance(elem, float) and pd.isna(elem))
-                    or (elem is None)
-                ):
-                    m = f"NaNs in Results for Trial {trial.index}, failing trial"
-                    return Err(MetricFetchE(message=m, exception=ValueError(m)))
-
-        wrapper_kwargs = wrapper_kwargs if wrapper_kwargs is not None else {}
-        if wrapper_kwargs is not None and not isinstance(wrapper_kwargs, dict):
-            wrapper_kwargs = {"wrapper_args": wrapper_kwargs}
-        safe_kwargs = {"trial": trial, **kwargs, **wrapper_kwargs}
-        trial = safe_kwargs.pop("trial")
-        # We add our extra kwargs to the arm parameters so they can be passed to evaluate
-        for arm in trial.arms_by_name.values():
-            arm._parameters["kwargs"] = safe_kwargs
-        try:
-            if isinstance(self.metric_to_eval, Metric):
-                trial_data = self.metric_to_eval.fetch_trial_data(
-                    trial=trial,
-                    **get_dictionary_from_callable(self.metric_to_eval.fetch_trial_data, safe_kwargs),
+        if not is_batch:
+            wrapper_kwargs_by_arm = {trial.arm.name: wrapper_kwargs}
+        else:
+            wrapper_kwargs_by_arm = {arm_name: (wrapper_kwargs or {}).get(arm_name) for arm_name in trial.arms_by_name}
+
+        safe_kwargs_by_arm = {}
+        for arm_name, wrapper_kwargs in wrapper_kwargs_by_arm.items():
+            if self.check_for_nans and _has_nans(wrapper_kwargs):
+                m = f"NaNs in Results for Trial {trial.index}, failing trial"
+                return Err(MetricFetchE(message=m, exception=ValueError(m)))
+
+            wrapper_kwargs = wrapper_kwargs if wrapper_kwargs is not None else {}
+            if not isinstance(wrapper_kwargs, dict):
+                wrapper_kwargs = {"wrapper_args": wrapper_kwargs}
+            safe_kwargs = dict(wrapper_kwargs)
+            safe_kwargs.pop("trial", None)
+            safe_kwargs_by_arm[arm_name] = safe_kwargs
+        return safe_kwargs_by_arm
+
+    def _evaluate_batch(
+        self,
+        batch: list[tuple[BaseTrial, str, dict]],
+        noisy: bool = True,
+        submit: Callable[..., Future] = _call_now,
+        **kwargs,
+    ) -> dict[int, MetricFetchResult]:
+        """evaluate the metric for each (trial, arm name, wrapper kwargs) of the batch, each arm
+        submitted with ``submit`` unless the metric is vectorized, and split the one data frame
+        of the batch into the data of each trial"""
+        errors = {}
+        means = {}  # by position in the batch
+        if self.vectorized:
+            try:
+                means = dict(enumerate(self._evaluate_vectorized([row[2] for row in batch], **kwargs)))
+            except Exception as e:
+                errors = {trial.index: e for trial, _, _ in batch}
+        else:
+            evaluations = [
+                submit(
+                    self._evaluate,
+                    {**trial.arms_by_name[arm_name].parameters, "kwargs": {**kwargs, **wrapper_kwargs}},
                 )
+                for trial, arm_name, wrapper_kwargs in batch
+            ]
+            for i, ((trial, _, _), evaluation) in enumerate(zip(batch, evaluations)):
+                if evaluation.exception() is not None:
+                    errors.setdefault(trial.index, evaluation.exception())
+                else:
+                    means[i] = evaluation.result()
+        positions = [i for i, (trial, _, _) in enumerate(batch) if trial.index not in errors]
+        rows = [batch[i] for i in positions]
+
+        results = {
+            trial_index: Err(MetricFetchE(message=f"Failed to fetch {self.name}", exception=e))
+            for trial_index, e in errors.items()
+        }
+        if not rows:
+            return results
+        noise_sd = self.noise_sd if noisy else 0.0
+        means = np.asarray([means[i] for i in positions], dtype=float)
+        if noise_sd:
+            means = means + noise_sd * np.random.randn(len(means))
+        # indicate unknown noise level in data
+        default_sem = float("nan") if noise_sd is None else noise_sd
+        sems = [
+            wrapper_kwargs["sem"] if wrapper_kwargs.get("sem") is not None else default_sem
+            for _, _, wrapper_kwargs in rows
+        ]
+        # the same columns as NoisyFunctionMetric.fetch_trial_data
+        df = pd.DataFrame(
+            {
+                "arm_name": [arm_name for _, arm_name, _ in rows],
+                "metric_name": self.name,
+                "mean": means,
+                "sem": sems,
+                "trial_index": [trial.index for trial, _, _ in rows],
+                "n": [10000 / len(trial.arms_by_name) for trial, _, _ in rows],
+                "frac_nonnull": means,
+            }
+        )
+        for trial_index, trial_df in df.groupby("trial_index", sort=False):
+            trial_df = trial_df.reset_index(drop=True)
+            self.trial_data_cache[trial_index] = trial_df.to_dict(orient="list")  # the format ax uses to put them in
+            results[trial_index] = Ok(Data(df=trial_df))
+        return results
+
+    def _evaluate_vectorized(self, wrapper_kwargs_by_arm: list[dict], **kwargs) -> np.ndarray:
+        """Evaluate the metric function once for many arms.
+
+        Each keyword argument (and positional argument) the wrapper returned is stacked across
+        the arms, into an array with the arms along the first axis if the values of the arms
+        can be, and into a list otherwise. The metric function must return one value per arm.
+        """
+        keys = [key for key in wrapper_kwargs_by_arm[0] if key != "sem"]
+        if any(set(wrapper_kwargs) - {"sem"} != set(keys) for wrapper_kwargs in wrapper_kwargs_by_arm):
+            raise ValueError(
+                f"The wrapper must return the same keys for every trial to evaluate metric {self.name} vectorized"
+            )
+        stacked = {key: _stack([wrapper_kwargs[key] for wrapper_kwargs in wrapper_kwargs_by_arm]) for key in keys}
+        args = []
+        if "wrapper_args" in stacked:
+            wrapper_args = [wrapper_kwargs["wrapper_args"] for wrapper_kwargs in wrapper_kwargs_by_arm]
+            stacked.pop("wrapper_args")
+            if all(isinstance(arm_args, (list, tuple)) for arm_args in wrapper_args):
+                args = [_stack(list(arg)) for arg in zip(*wrapper_args)]
             else:
-                trial_data = super().fetch_trial_data(trial=trial, **safe_kwargs)
-            if "sem" in safe_kwargs and not isinstance(trial_data, Err):
-                trial_df = trial_data.unwrap().df
-                trial_df["sem"] = safe_kwargs["sem"]
-                trial_data = Ok(Data(df=trial_df))
-            if not isinstance(trial_data, Err):
-                self._trial_data_cache[trial.index] = trial_data.unwrap().df.to_dict(
-                    orient="list"
-                )  # the format ax uses to put them in
-        finally:
-            # We remove the extra parameters from the arms for json serialization
-            [arm._parameters.pop("kwargs") for arm in trial.arms_by_name.values()]
-        return trial_data
+                args = [_stack(wrapper_args)]
+        kwargs = {**kwargs, **stacked}
+        means = np.asarray(self.f(*args, **get_dictionary_from_callable(self.metric_to_eval, kwargs)))
+        if means.shape != (len(wrapper_kwargs_by_arm),):
+            raise ValueError(
+                f"Vectorized metric {self.name} returned values of shape {means.shape}"
+                f" for {len(wrapper_kwargs_by_arm)} arms, it must return one value per arm"
+            )
+        return means
 
     def _evaluate(self, params: TParameterization, **kwargs) -> float:
         kwargs.update(params.pop("kwargs"))
@@ -267,7 +563,7 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
         parents_b4_metric = parents[:index_of_metric]
 
         return serialize_init_args(
-            class_=obj, parents=parents_b4_metric, match_private=True, exclude_fields=["wrapper"]
+            class_=obj, parents=parents_b4_metric, match_private=True, exclude_fields=["wrapper", "trial_data_cache"]
         )
 
     @classmethod
@@ -289,5 +585,9 @@ class ModularMetric(NoisyFunctionMetric, metaclass=MetricRegister):
         parents_b4_metric = parents[:index_of_metric]
 
         return extract_init_args(
-            args=args, class_=cls, parents=parents_b4_metric, match_private=True, exclude_fields=["wrapper"]
+            args=args,
+            class_=cls,
+            parents=parents_b4_metric,
+            match_private=True,
+            exclude_fields=["wrapper", "trial_data_cache"],
         )
@@ -0,0 +1,426 @@
+"""
+##########################
+Streaming Metric Functions
+##########################
+
+Versions of the functions in :mod:`.metric_funcs` that read their inputs a chunk at a time,
+for model output too large to hold in memory at once (alongside the optimizer).
+
+Each function takes its arrays as either
+
+- an array, including a :class:`numpy.memmap` (such as the ``.npy`` outputs read by
+  :class:`.ScriptWrapper`), which is read ``chunk_size`` rows at a time, or
+- an iterable of chunks (a list of arrays, or a generator that reads them from disk),
+  chunked along the first axis.
+
+Only one chunk of each array (converted to float64) is in memory at a time.
+The results match their :mod:`sklearn.metrics`, :mod:`scipy.stats` and :mod:`numpy` counterparts
+(up to floating point rounding), including for 2D arrays of shape (n_samples, n_outputs).
+
+Most of them read their inputs once, so they also work with one-shot generators,
+except for the IQR normalization of :func:`streaming_normalized_root_mean_squared_error`
+(see :func:`streaming_iqr`), which reads ``y_pred`` again and so needs an array or a list of chunks.
+
+"""
+from __future__ import annotations
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+#: Default number of rows read at a time
+DEFAULT_CHUNK_SIZE = 1_000_000
+#: Default number of histogram bins used to find quantiles
+DEFAULT_QUANTILE_BINS = 4096
+
+
+def iter_chunks(x, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """Iterate over ``x`` a chunk at a time, as float64 arrays
+
+    Arrays (and flat lists of numbers) are split into chunks of ``chunk_size`` rows
+    along their first axis, anything else is taken to already be an iterable of chunks.
+
+    Examples
+    --------
+    >>> [chunk.tolist() for chunk in iter_chunks(np.arange(5), chunk_size=2)]
+    [[0.0, 1.0], [2.0, 3.0], [4.0]]
+    >>> [chunk.tolist() for chunk in iter_chunks(iter([[1, 2], [3]]))]
+    [[1.0, 2.0], [3.0]]
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be a positive integer, not {chunk_size}.")
+    if _is_array(x):
+        x = np.asarray(x) if not isinstance(x, np.ndarray) else x
+        if x.ndim == 0:
+            x = x.reshape(1)
+        for start in range(0, len(x), chunk_size):
+            # for memory-mapped arrays, only this slice is read from disk
+            yield np.asarray(x[start : start + chunk_size], dtype=np.float64)
+        return
+    for chunk in x:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        yield chunk.reshape(1) if chunk.ndim == 0 else chunk
+
+
+def streaming_mean(a, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """Arithmetic mean of all the values of ``a`` (like :func:`numpy.mean`)
+
+    Examples
+    --------
+    >>> streaming_mean([np.array([1, 2]), np.array([3, 4, 5])])
+    3.0
+    """
+    total = 0.0
+    count = 0
+    for chunk in iter_chunks(a, chunk_size):
+        total += chunk.sum()
+        count += chunk.size
+    if not count:
+        raise ValueError("Can not take the mean of an empty array.")
+    return float(total / count)
+
+
+def streaming_mean_squared_error(y_true, y_pred, squared: bool = True, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """Mean squared error (like :func:`sklearn.metrics.mean_squared_error`)
+
+    Parameters
+    ----------
+    y_true : array_like or iterable of array_like
+        With shape (n_samples,) or (n_samples, n_outputs)
+        Ground truth (correct) target values.
+    y_pred : array_like or iterable of array_like
+        With shape (n_samples,) or (n_samples, n_outputs)
+        Estimated target values, chunked the same way as ``y_true``.
+    squared : bool
+        If False, return the root mean squared error. (default True)
+    chunk_size : int
+        Number of rows to read at a time from arrays.
+
+    Returns
+    -------
+    float
+        The error, averaged uniformly over outputs.
+
+    Examples
+    --------
+    >>> streaming_mean_squared_error([3, -0.5, 2, 7], [2.5, 0.0, 2, 8], chunk_size=3)
+    0.375
+    """
+    sse = 0.0
+    count = 0
+    for true, pred in _iter_pairs(y_true, y_pred, chunk_size):
+        sse = sse + np.square(true - pred).sum(axis=0)
+        count += len(true)
+    if not count:
+        raise ValueError("Can not compute the error of empty arrays.")
+    output_errors = sse / count
+    if not squared:
+        output_errors = np.sqrt(output_errors)
+    return float(np.mean(output_errors))
+
+
+def streaming_r2_score(y_true, y_pred, chunk_size: int = DEFAULT_CHUNK_SIZE) -> float:
+    """:math:`R^2` (coefficient of determination) regression score (like :func:`sklearn.metrics.r2_score`)
+
+    Parameters
+    ----------
+    y_true : array_like or iterable of array_like
+        With shape (n_samples,) or (n_samples, n_outputs)
+        Ground truth (correct) target values.
+    y_pred : array_like or iterable of array_like
+        With shape (n_samples,) or (n_samples, n_outputs)
+        Estimated target values, chunked the same way as ``y_true``.
+    chunk_size : int
+        Number of rows to read at a time from arrays.
+
+    Returns
+    -------
+    float
+        The score, averaged uniformly over outputs.
+
+    Examples
+    --------
+    >>> round(streaming_r2_score([3, -0.5, 2, 7], [2.5, 0.0, 2, 8], chunk_size=3), 4)
+    0.9486
+    """
+    ss_res = 0.0
+    true_stats = _RunningStats()
+    for true, pred in _iter_pairs(y_true, y_pred, chunk_size):
+        ss_res = ss_res + np.square(true - pred).sum(axis=0)
+        true_stats.update(true)
+    if not true_stats.count:
+        raise ValueError("Can not compute the score of empty arrays.")
+    ss_tot = np.broadcast_to(true_stats.m2, np.shape(ss_res))
+    ss_res = np.asarray(ss_res)
+    scores = np.ones(ss_res.shape)
+    nonzero = ss_tot != 0
+    scores[nonzero] = 1 - ss_res[nonzero] / ss_tot[nonzero]
+    # like sklearn, a constant y_true scores 1 if predicted perfectly and 0 otherwise
+    scores[~nonzero & (ss_res != 0)] = 0.0
+    return float(np.mean(scores))
+
+
+def streaming_normalized_root_mean_squared_error(
+    y_true,
+    y_pred,
+    normalizer: str = "iqr",
+    iqr_method: str = "exact",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    bins: int = DEFAULT_QUANTILE_BINS,
+) -> float:
+    """Normalized root mean squared error (like :func:`.normalized_root_mean_squared_error`)
+
+    Parameters
+    ----------
+    y_true : array_like or iterable of array_like
+        With shape (n_samples,) or (n_samples, n_outputs)
+        Ground truth (correct) target values.
+    y_pred : array_like or iterable of array_like
+        With shape (n_samples,) or (n_samples, n_outputs)
+        Estimated target values, chunked the same way as ``y_true``.
+    normalizer : str
+        How to normalize the RMSE, options include iqr, std, mean, and range.
+        std is the standard deviation of each output, so it gives one error per output.
+        (default iqr)
+    iqr_method : str
+        How to find the IQR of ``y_pred``, exact or approximate (see :func:`streaming_iqr`).
+        (default exact)
+    chunk_size : int
+        Number of rows to read at a time from arrays.
+    bins : int
+        Number of histogram bins used to find the IQR (see :func:`streaming_iqr`).
+
+    Returns
+    -------
+    float or numpy.ndarray[float]
+        A normalized version of RMSE
+
+    Examples
+    --------
+    >>> round(streaming_normalized_root_mean_squared_error([3, -0.5, 2, 7], [2.5, 0.0, 2, 8], chunk_size=3), 4)
+    0.2578
+    """
+    if normalizer not in ("iqr", "std", "mean", "range"):
+        raise ValueError("normalizer must be 'iqr', 'std', 'mean', or 'range'.")
+    if normalizer == "iqr":
+        _check_iqr_method(iqr_method)
+        _check_reiterable(y_pred, "y_pred")
+
+    sse = 0.0
+    count = 0
+    pred_stats = _RunningStats()
+    column_stats = _RunningStats()
+    for true, pred in _iter_pairs(y_true, y_pred, chunk_size):
+        sse = sse + np.square(true - pred).sum(axis=0)
+        count += len(true)
+        pred_stats.update(pred.reshape(-1))
+        if normalizer == "std":
+            column_stats.update(pred)
+    if not count:
+        raise ValueError("Can not compute the error of empty arrays.")
+    rmse = float(np.mean(np.sqrt(sse / count)))
+
+    if normalizer == "iqr":
+        norm = _iqr(y_pred, iqr_method, chunk_size, bins, pred_stats)
+    elif normalizer == "std":
+        # per output, like scipy.stats.tstd
+        norm = np.sqrt(column_stats.m2 / (column_stats.count - 1))
+    elif normalizer == "mean":
+        norm = pred_stats.mean
+    else:
+        norm = pred_stats.max - pred_stats.min
+    nrmse = rmse / norm
+    return float(nrmse) if np.ndim(nrmse) == 0 else nrmse
+
+
+def streaming_iqr(
+    x, method: str = "exact", chunk_size: int = DEFAULT_CHUNK_SIZE, bins: int = DEFAULT_QUANTILE_BINS
+) -> float:
+    """Interquartile range of all the values of ``x`` (like :func:`scipy.stats.iqr`)
+
+    Reads ``x`` several times, so it needs to be an array or a list of chunks,
+    not a one-shot iterator.
+
+    Parameters
+    ----------
+    x : array_like or iterable of array_like
+        The values.
+    method : str
+        ``exact`` narrows down each quartile with a histogram of ``bins`` bins per read
+        until few enough values are left to sort, holding at most about ``chunk_size`` values
+        (a few reads of ``x`` for a billion values).
+        ``approximate`` reads ``x`` only twice and interpolates within a histogram of ``bins`` bins,
+        so it is off by at most the range of ``x`` divided by ``bins``.
+        (default exact)
+    chunk_size : int
+        Number of rows to read at a time from arrays.
+    bins : int
+        Number of histogram bins.
+
+    Examples
+    --------
+    >>> streaming_iqr(np.arange(101), chunk_size=10)
+    50.0
+    """
+    _check_iqr_method(method)
+    _check_reiterable(x, "x")
+    stats = _RunningStats()
+    for chunk in iter_chunks(x, chunk_size):
+        stats.update(chunk.reshape(-1))
+    if not stats.count:
+        raise ValueError("Can not take the IQR of an empty array.")
+    return _iqr(x, method, chunk_size, bins, stats)
+
+
+class _RunningStats:
+    """Count, mean, sum of squared deviations from the mean, min and max along the
+    first axis of the chunks it is updated with (merged per chunk, Chan et al.)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, chunk: np.ndarray):
+        n = len(chunk)
+        if not n:
+            return
+        mean = chunk.mean(axis=0)
+        m2 = np.square(chunk - mean).sum(axis=0)
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + np.square(delta) * (self.count * n / total)
+        self.min = np.minimum(self.min, chunk.min(axis=0))
+        self.max = np.maximum(self.max, chunk.max(axis=0))
+        self.count = total
+
+
+def _is_array(x) -> bool:
+    if isinstance(x, np.ndarray) or np.isscalar(x):
+        return True
+    return isinstance(x, (list, tuple)) and all(np.ndim(item) == 0 for item in x)
+
+
+def _iter_pairs(y_true, y_pred, chunk_size: int) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    sentinel = object()
+    true_chunks = iter_chunks(y_true, chunk_size)
+    pred_chunks = iter_chunks(y_pred, chunk_size)
+    while True:
+        true = next(true_chunks, sentinel)
+        pred = next(pred_chunks, sentinel)
+        if true is sentinel and pred is sentinel:
+            return
+        if true is sentinel or pred is sentinel:
+            raise ValueError("y_true and y_pred have a different number of chunks.")
+        if true.shape != pred.shape:
+            raise ValueError(
+                f"Chunks of y_true and y_pred have different shapes ({true.shape} and {pred.shape}),"
+                " both must be chunked the same way."
+            )
+        yield true, pred
+
+
+def _check_iqr_method(method: str):
+    if method not in ("exact", "approximate"):
+        raise ValueError("iqr_method must be 'exact' or 'approximate'.")
+
+
+def _check_reiterable(x, name: str):
+    if not _is_array(x) and iter(x) is x:
+        raise TypeError(
+            f"The IQR reads {name} more than once, so it must be an array or a list of chunks,"
+            " not a one-shot iterator such as a generator."
+        )
+
+
+def _iqr(x, method: str, chunk_size: int, bins: int, stats: _RunningStats) -> float:
+    low, high = float(stats.min), float(stats.max)
+    if np.isnan(low) or np.isnan(high):
+        return np.nan
+    # same linear interpolation between ranks as numpy.percentile (and so scipy.stats.iqr)
+    positions = [0.25 * (stats.count - 1), 0.75 * (stats.count - 1)]
+    if method == "approximate":
+        q1, q3 = _approximate_quantiles(x, positions, low, high, chunk_size, bins)
+        return q3 - q1
+    ranks = sorted({rank for pos in positions for rank in (int(np.floor(pos)), int(np.ceil(pos)))})
+    values = dict(zip(ranks, _select_ranks(x, ranks, stats.count, low, high, chunk_size, bins)))
+    q1, q3 = (
+        values[int(np.floor(pos))] + (values[int(np.ceil(pos))] - values[int(np.floor(pos))]) * (pos - np.floor(pos))
+        for pos in positions
+    )
+    return q3 - q1
+
+
+def _bin_indices(values: np.ndarray, low: float, high: float, bins: int) -> np.ndarray:
+    # halved so that the width does not overflow for values near the float limits
+    width = high / 2 - low / 2
+    idx = (values / 2 - low / 2) * (bins / width) if width > 0 else np.zeros(values.shape)
+    return np.clip(idx.astype(np.intp), 0, bins - 1)
+
+
+def _approximate_quantiles(
+    x, positions: Iterable[float], low: float, high: float, chunk_size: int, bins: int
+) -> list[float]:
+    counts = np.zeros(bins, dtype=np.int64)
+    for chunk in iter_chunks(x, chunk_size):
+        counts += np.bincount(_bin_indices(chunk.reshape(-1), low, high, bins), minlength=bins)
+    cumulative = np.cumsum(counts)
+    width = (high - low) / bins
+    quantiles = []
+    for pos in positions:
+        k = int(np.searchsorted(cumulative, pos, side="right"))
+        below = cumulative[k] - counts[k]
+        # assume the values of a bin are spread evenly across it
+        quantiles.append(low + width * (k + min((pos - below + 0.5) / counts[k], 1.0)))
+    return quantiles
+
+
+def _select_ranks(x, ranks: list[int], count: int, low: float, high: float, chunk_size: int, bins: int) -> list[float]:
+    """The values with ``ranks`` (0 based) among all the sorted values of ``x``.
+
+    Each rank has a window [low, high] of values that holds it, along with the number of
+    values below the window. Each read histograms the values in the window, and narrows the
+    window to the smallest and largest value in the bin the rank falls in, until the window
+    holds few enough values to sort.
+    """
+    windows = {rank: (low, high, 0, count) for rank in ranks}
+    values = {}
+    while windows:
+        gather = {rank: [] for rank, window in windows.items() if window[3] <= chunk_size}
+        hists = {
+            rank: (np.zeros(bins, dtype=np.int64), np.full(bins, np.inf), np.full(bins, -np.inf))
+            for rank in windows
+            if rank not in gather
+        }
+        for chunk in iter_chunks(x, chunk_size):
+            chunk = chunk.reshape(-1)
+            for rank, (lo, hi, _, _) in windows.items():
+                inside = chunk[(chunk >= lo) & (chunk <= hi)]
+                if rank in gather:
+                    gather[rank].append(inside)
+                    continue
+                counts, mins, maxs = hists[rank]
+                idx = _bin_indices(inside, lo, hi, bins)
+                counts += np.bincount(idx, minlength=bins)
+                np.minimum.at(mins, idx, inside)
+                np.maximum.at(maxs, idx, inside)
+
+        for rank, chunks in gather.items():
+            below = windows.pop(rank)[2]
+            values[rank] = float(np.sort(np.concatenate(chunks))[rank - below])
+        for rank, (counts, mins, maxs) in hists.items():
+            _, _, below, in_window = windows[rank]
+            cumulative = np.cumsum(counts)
+            k = int(np.searchsorted(cumulative, rank - below, side="right"))
+            if mins[k] == maxs[k]:
+                values[rank] = float(mins[k])
+                del windows[rank]
+            elif counts[k] == in_window:
+                # bins too narrow to split the window any further, sort it however big it is
+                windows[rank] = (mins[k], maxs[k], below, 0)
+            else:
+                windows[rank] = (mins[k], maxs[k], below + int(cumulative[k] - counts[k]), int(counts[k]))
+    return [values[rank] for rank in ranks]
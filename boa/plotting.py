@@ -5,6 +5,7 @@ Plotting Utils
 
 Plotting utility functions
 """
+
 from __future__ import annotations
 
 import os
@@ -15,7 +16,6 @@ import numpy as np
 import pandas as pd
 import panel as pn
 import plotly.graph_objs as go
-from ax.modelbridge.registry import get_model_from_generator_run
 from ax.plot.contour import plot_contour_plotly
 from ax.plot.helper import get_range_parameters_from_list
 from ax.plot.pareto_frontier import plot_pareto_frontier as ax_plot_pareto_frontier
@@ -25,11 +25,18 @@ from ax.plot.trace import optimization_trace_single_method_plotly
 from ax.service.utils.report_utils import exp_to_df
 
 from boa.definitions import PathLike_tup
+from boa.readonly_scheduler import ReadOnlyScheduler
 from boa.scheduler import Scheduler
-from boa.storage import scheduler_from_json_file
 
-SchedulerOrPath = Union[Scheduler, os.PathLike, str]
-SchedulersOrPathList = Union[List[Scheduler], List[Union[os.PathLike, str]], Scheduler, os.PathLike, str]
+SchedulerOrPath = Union[Scheduler, ReadOnlyScheduler, os.PathLike, str]
+SchedulersOrPathList = Union[
+    List[Union[Scheduler, ReadOnlyScheduler]],
+    List[Union[os.PathLike, str]],
+    Scheduler,
+    ReadOnlyScheduler,
+    os.PathLike,
+    str,
+]
 
 
 DEFAULT_CI_LEVEL: float = 0.9
@@ -48,19 +55,31 @@ __all__ = [
 
 def _maybe_load_scheduler(scheduler: SchedulerOrPath):
     if isinstance(scheduler, PathLike_tup):
-        scheduler = scheduler_from_json_file(scheduler)
-        model = get_model_from_generator_run(
-            generator_run=scheduler.generation_strategy.last_generator_run,
-            experiment=scheduler.experiment,
-            data=scheduler.experiment.fetch_data(),
-            models_enum=type(scheduler.generation_strategy.current_step.model),
-            after_gen=False,
-        )
-        scheduler.model = model
-
+        # only what the plots ask for is decoded, and the model is only refit by the model based plots
+        scheduler = ReadOnlyScheduler(scheduler)
     return scheduler
 
 
+def _get_data(scheduler: Scheduler | ReadOnlyScheduler):
+    if isinstance(scheduler, ReadOnlyScheduler):
+        return scheduler.data
+    return scheduler.experiment.fetch_data()
+
+
+def _experiment_view(scheduler: Scheduler | ReadOnlyScheduler):
+    """The experiment of ``scheduler``, or for a :class:`.ReadOnlyScheduler`, the scheduler itself,
+    which has the metrics and optimization config of its experiment without decoding it"""
+    if isinstance(scheduler, ReadOnlyScheduler):
+        return scheduler
+    return scheduler.experiment
+
+
+def _model_transitions(scheduler: Scheduler | ReadOnlyScheduler):
+    if isinstance(scheduler, ReadOnlyScheduler):
+        return scheduler.model_transitions
+    return scheduler.generation_strategy.model_transitions
+
+
 def _maybe_load_schedulers(schedulers: SchedulersOrPathList):
     if not isinstance(schedulers, list):
         schedulers = [schedulers]
@@ -90,7 +109,13 @@ def scheduler_to_df(scheduler: SchedulerOrPath, **kwargs) -> pd.DataFrame:
     A dataframe of inputs, metadata and metrics by trial and arm (and
     ``map_keys``, if present). If no trials are available, returns an empty
     dataframe.
+
+    For a saved scheduler with a results store (see :mod:`boa.results_store`), and no ``kwargs``,
+    the results store is read instead of decoding the experiment.
     """
+    scheduler = _maybe_load_scheduler(scheduler)
+    if isinstance(scheduler, ReadOnlyScheduler) and not kwargs and scheduler.results is not None:
+        return scheduler.results
     experiment = scheduler.experiment
     return exp_to_df(exp=experiment, **kwargs)
 
@@ -118,18 +143,19 @@ def plot_metrics_trace(
     """
 
     schedulers = _maybe_load_schedulers(schedulers)
+    experiment = _experiment_view(schedulers[0])
 
     if not metric_names:
-        metric_names = list(schedulers[0].experiment.metrics.keys())
+        metric_names = list(experiment.metrics.keys())
     metric_name = pn.widgets.Select(name="Metric Name", options=metric_names)
 
     def get_plot(metric_name):
         model_transitions = set()
         ys = []
         for scheduler in schedulers:
-            data = scheduler.experiment.fetch_data()
+            data = _get_data(scheduler)
             ys.append(data.df[data.df["metric_name"] == metric_name]["mean"])
-            model_transitions.update(scheduler.generation_strategy.model_transitions)
+            model_transitions.update(_model_transitions(scheduler))
         ys = np.array(ys)
         ylabel = metric_name.title()
 
@@ -141,13 +167,9 @@ def plot_metrics_trace(
                 # Try and use the metric's lower_is_better property, but fall back on
                 # objective's minimize property if relevent
                 optimization_direction=(
-                    (
-                        "minimize"
-                        if schedulers[0].experiment.metrics[metric_name].lower_is_better is True
-                        else "maximize"
-                    )
-                    if schedulers[0].experiment.metrics[metric_name].lower_is_better is not None
-                    else ("minimize" if schedulers[0].experiment.optimization_config.objective.minimize else "maximize")
+                    ("minimize" if experiment.metrics[metric_name].lower_is_better is True else "maximize")
+                    if experiment.metrics[metric_name].lower_is_better is not None
+                    else ("minimize" if experiment.optimization_config.objective.minimize else "maximize")
                 ),
                 plot_trial_points=True,
                 **kwargs,
@@ -320,7 +342,7 @@ def plot_pareto_frontier(
 
         frontier = compute_posterior_pareto_frontier(
             experiment=experiment,
-            data=experiment.fetch_data(),
+            data=_get_data(scheduler),
             primary_objective=primary_objective,
             secondary_objective=secondary_objective,
             absolute_metrics=[m.name for m in experiment.metrics.values()],
@@ -428,7 +450,7 @@ def app_view(
     """
     scheduler = _maybe_load_scheduler(scheduler)
     view = pn.Column()
-    if scheduler.experiment.is_moo_problem:
+    if _experiment_view(scheduler).is_moo_problem:
         pareto = plot_pareto_frontier(scheduler=scheduler, metric_names=metric_names)
     else:
         pareto = None
@@ -436,9 +458,11 @@ def app_view(
     if pareto:
         row1.append(pareto)
     view.append(row1)
-    view.append(plot_slice(scheduler=scheduler))
-    view.append(plot_contours(scheduler=scheduler, metric_names=metric_names))
-    view.append(scheduler_to_df(scheduler))
+    # the model based plots refit the model, and the table decodes the whole experiment,
+    # so they are loaded after the rest of the page
+    view.append(pn.panel(pn.bind(plot_slice, scheduler=scheduler), defer_load=True))
+    view.append(pn.panel(pn.bind(plot_contours, scheduler=scheduler, metric_names=metric_names), defer_load=True))
+    view.append(pn.panel(pn.bind(scheduler_to_df, scheduler), defer_load=True))
 
     template = pn.template.BootstrapTemplate(
         site="BOA",
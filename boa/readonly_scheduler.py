@@ -0,0 +1,198 @@
+"""
+###################################
+Read Only Scheduler
+###################################
+
+Read only view of a saved optimization, for analysis and plotting.
+
+Unlike :func:`.scheduler_from_json_file`, :class:`ReadOnlyScheduler` doesn't restore a
+scheduler that can continue the optimization. It never imports or instantiates your wrapper
+or starts the helper processes of its runner,
+and only decodes the parts of the scheduler file that are asked for, when they are first
+asked for: the optimization config, metrics, data of the trials and model transitions without
+decoding the rest of the experiment, then the experiment and the generation strategy. The model of the current
+generation step is only refit once a model based plot asks for it (see :attr:`ReadOnlyScheduler.model`).
+The results table of the trials is read from the results store next to the optimization csv,
+if there is one (see :attr:`ReadOnlyScheduler.results`).
+
+..  code-block:: python
+
+    from boa import ReadOnlyScheduler
+
+    scheduler = ReadOnlyScheduler("path/to/scheduler.json")
+    df = scheduler.data.df  # doesn't decode the trials or refit a model
+
+"""
+
+from __future__ import annotations
+
+import pathlib
+from functools import cached_property
+from inspect import isclass
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from ax import Data, Experiment, Metric, OptimizationConfig, Runner
+from ax.core.base_trial import BaseTrial
+from ax.modelbridge.base import ModelBridge
+from ax.modelbridge.generation_strategy import GenerationStrategy
+from ax.modelbridge.registry import get_model_from_generator_run
+from ax.storage.json_store.decoder import (
+    generation_strategy_from_json,
+    object_from_json,
+)
+from ax.storage.json_store.registry import CORE_DECODER_REGISTRY
+
+from boa.definitions import PathLike
+from boa.results_store import PART_GLOB, has_pyarrow, read_results, results_store_path
+from boa.runner import WrappedJobRunner
+from boa.storage import _copy_json, scheduler_json_from_file
+
+
+class _ReadOnlyRunner(Runner):
+    """Stand in for the :class:`.WrappedJobRunner` of a read only experiment, which can't run trials.
+    Decoding the real runner would make a wrapper and start a :func:`multiprocessing.Manager` process."""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+
+    def run(self, trial: BaseTrial) -> Dict[str, Any]:
+        raise NotImplementedError("The experiment of a ReadOnlyScheduler can't run trials")
+
+
+def _read_only_decoder_registry() -> Dict[str, type]:
+    """The json decoder registry, with :class:`_ReadOnlyRunner` in place of the :class:`.WrappedJobRunner` classes"""
+    return {
+        name: _ReadOnlyRunner if isclass(cls) and issubclass(cls, WrappedJobRunner) else cls
+        for name, cls in CORE_DECODER_REGISTRY.items()
+    }
+
+
+class ReadOnlyScheduler:
+    """Lazily decoded, read only view of the scheduler saved at ``filepath``.
+
+    The scheduler file (and its journal) is read when the first part is asked for,
+    and each part is decoded once.
+
+    Parameters
+    ----------
+    filepath
+        Path of a scheduler json file (which can be compressed) or SQLite database
+
+    Attributes
+    ----------
+    wrapper
+        Always None, the wrapper isn't loaded
+    """
+
+    wrapper = None
+
+    def __init__(self, filepath: PathLike):
+        self.scheduler_filepath = pathlib.Path(filepath)
+
+    @cached_property
+    def _serialized(self) -> Dict[str, Any]:
+        return scheduler_json_from_file(self.scheduler_filepath)
+
+    @cached_property
+    def optimization_config(self) -> Optional[OptimizationConfig]:
+        """Optimization config of the experiment, decoded without decoding the experiment"""
+        if "experiment" in self.__dict__:
+            return self.experiment.optimization_config
+        return object_from_json(_copy_json(self._serialized["experiment"]["optimization_config"]))
+
+    @cached_property
+    def metrics(self) -> Dict[str, Metric]:
+        """Metrics of the experiment (see :attr:`ax.Experiment.metrics`),
+        decoded without decoding the experiment"""
+        if "experiment" in self.__dict__:
+            return self.experiment.metrics
+        tracking_metrics = object_from_json(_copy_json(self._serialized["experiment"]["tracking_metrics"]))
+        optimization_config = self.optimization_config
+        return {
+            **{metric.name: metric for metric in tracking_metrics},
+            **(optimization_config.metrics if optimization_config is not None else {}),
+        }
+
+    @property
+    def is_moo_problem(self) -> bool:
+        """Whether the optimization config of the experiment has multiple objectives"""
+        return self.optimization_config is not None and self.optimization_config.is_moo_problem
+
+    @cached_property
+    def model_transitions(self) -> List[int]:
+        """Trial indices where the generation strategy moves on to its next model
+        (see :attr:`ax.modelbridge.generation_strategy.GenerationStrategy.model_transitions`),
+        worked out from its steps without decoding the experiment"""
+        if "generation_strategy" in self.__dict__:
+            return self.generation_strategy.model_transitions
+        steps = object_from_json(_copy_json(self._serialized["generation_strategy"]["steps"]))
+        return GenerationStrategy(steps=steps).model_transitions
+
+    @cached_property
+    def data(self) -> Data:
+        """Latest data of each trial (see :meth:`ax.Experiment.lookup_data`),
+        decoded without decoding the experiment"""
+        if "experiment" in self.__dict__:
+            return self.experiment.lookup_data()
+        latest = []
+        for data_by_ts in self._serialized["experiment"]["data_by_trial"].values():
+            if data_by_ts["value"]:
+                _, data = max(data_by_ts["value"], key=lambda ts_data: ts_data[0])
+                latest.append(object_from_json(_copy_json(data)))
+        return Data.from_multiple_data(latest) if latest else Data()
+
+    @cached_property
+    def results(self) -> Optional[pd.DataFrame]:
+        """Results table of the trials (see :func:`.read_results`), read from the results store
+        next to the optimization csv without decoding the experiment,
+        or None if there isn't a results store (or ``pyarrow`` to read it)"""
+        if not has_pyarrow():
+            return None
+        opt_csv = self._serialized.get("opt_csv")
+        opt_csv = pathlib.Path(object_from_json(_copy_json(opt_csv))) if opt_csv else pathlib.Path("optimization.csv")
+        # next to the scheduler file, if the optimization was moved since
+        for path in (opt_csv, self.scheduler_filepath.parent / opt_csv.name):
+            store_path = results_store_path(path)
+            if store_path.is_dir() and any(store_path.glob(PART_GLOB)):
+                return read_results(store_path)
+        return None
+
+    @cached_property
+    def experiment(self) -> Experiment:
+        """The experiment, decoded on first use (without a wrapper for its metrics,
+        and with a runner that can't run trials in place of its :class:`.WrappedJobRunner`)"""
+        # decoded from a copy, and only dropped once it is decoded, so it can be decoded again if this fails
+        experiment = object_from_json(
+            _copy_json(self._serialized["experiment"]), decoder_registry=_read_only_decoder_registry()
+        )
+        self._serialized.pop("experiment")
+        return experiment
+
+    @cached_property
+    def generation_strategy(self) -> GenerationStrategy:
+        """The generation strategy, decoded on first use.
+
+        Only the last generator run is decoded, the ones before it are
+        in the trials of :attr:`experiment`.
+        """
+        gs = self._serialized["generation_strategy"]
+        gs = _copy_json({**gs, "generator_runs": gs["generator_runs"][-1:]})
+        generation_strategy = generation_strategy_from_json(gs, experiment=self.experiment)
+        self._serialized.pop("generation_strategy")
+        return generation_strategy
+
+    @cached_property
+    def model(self) -> ModelBridge:
+        """Model of the current generation step, refit to the data of the trials on first use"""
+        generation_strategy = self.generation_strategy
+        return get_model_from_generator_run(
+            generator_run=generation_strategy.last_generator_run,
+            experiment=self.experiment,
+            data=self.data,
+            models_enum=type(generation_strategy.current_step.model),
+            after_gen=False,
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({str(self.scheduler_filepath)!r})"
@@ -0,0 +1,187 @@
+"""
+###################################
+Trial Resources
+###################################
+
+Resource aware admission of trials. Each trial declares how many CPU cores and how much
+memory it needs (``trial_resources`` in :class:`.BOAScriptOptions`, or
+:meth:`.BaseWrapper.trial_resources` in a python wrapper), and the runner only starts
+a trial once the :class:`ResourcePool` of this machine (``resource_pool``) has room for it.
+Trials that don't fit yet wait in the runner and are started as earlier trials finish.
+
+Each started trial is assigned its own CPU cores, listed in its run metadata
+(``trial.run_metadata["cpus"]``). Script commands of the trial are pinned to those cores
+(on platforms that support it) and are passed them in the ``BOA_TRIAL_CPUS`` environment
+variable. Memory is only accounted for, not enforced.
+
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from typing import NamedTuple, Optional
+
+import jinja2
+
+from boa.logger import get_logger
+
+logger = get_logger()
+
+_EXPRESSION_ENV = jinja2.Environment(undefined=jinja2.StrictUndefined)
+
+#: Environment variable listing the CPU cores assigned to a trial (comma separated)
+TRIAL_CPUS_ENV_VAR = "BOA_TRIAL_CPUS"
+# util-linux's taskset, used to pin script commands before they exec
+_TASKSET = shutil.which("taskset") if hasattr(os, "sched_setaffinity") else None
+
+
+class TrialResources(NamedTuple):
+    """Resources a trial needs while it runs
+
+    cpus: Number of CPU cores
+    memory: Memory in MB
+    """
+
+    cpus: int = 1
+    memory: float = 0
+
+
+def evaluate_trial_resources(spec: dict, parameters: dict) -> TrialResources:
+    """Evaluate the ``trial_resources`` of :class:`.BOAScriptOptions` for a trial.
+
+    Values are either numbers or jinja2 expressions of the trial's parameters.
+
+    Examples
+    --------
+    >>> evaluate_trial_resources({"cpus": "4 if x > 0.5 else 1", "memory": "x * 1000"}, {"x": 0.75})
+    TrialResources(cpus=4, memory=750.0)
+    """
+    values = {}
+    for name, value in spec.items():
+        if name not in TrialResources._fields:
+            raise ValueError(f"Unknown trial resource {name}, must be one of {TrialResources._fields}")
+        if isinstance(value, str):
+            value = _EXPRESSION_ENV.compile_expression(value)(**parameters)
+        values[name] = value
+    resources = TrialResources(**values)
+    return TrialResources(cpus=int(resources.cpus), memory=float(resources.memory))
+
+
+def available_cpus() -> list[int]:
+    """CPU cores this process is allowed to run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def pin_to_cpus(pid: int, cpus: list[int]):
+    """Pin a process to ``cpus``, if the platform supports it"""
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+    try:
+        os.sched_setaffinity(pid, cpus)
+    except OSError as e:  # the process may have already exited
+        logger.debug(f"Could not pin process {pid} to cpus {cpus}. Reason: {e!r}")
+
+
+def pin_command_to_cpus(args: list[str], cpus: list[int]) -> list[str]:
+    """Prefix a command with ``taskset``, if it is installed, so the process is pinned to ``cpus``
+    before it runs its command, and any processes or threads it starts are pinned too.
+    Returns ``args`` unchanged otherwise.
+    """
+    if not cpus or not _TASKSET:
+        return args
+    return [_TASKSET, "-c", ",".join(str(cpu) for cpu in cpus), *args]
+
+
+class ResourcePool:
+    """The CPU cores and memory that trials can be admitted to
+
+    Parameters
+    ----------
+    cpus
+        Number of CPU cores in the pool, defaults to all cores this process can run on
+    memory
+        Memory in MB in the pool, defaults to unlimited
+
+    Examples
+    --------
+    >>> pool = ResourcePool(cpus=4, memory=1000)
+    >>> first = pool.acquire(0, TrialResources(cpus=3, memory=200))
+    >>> len(first)
+    3
+    >>> pool.acquire(1, TrialResources(cpus=2)) is None  # doesn't fit until trial 0 is released
+    True
+    >>> pool.release(0)
+    >>> len(pool.acquire(1, TrialResources(cpus=2)))
+    2
+    """
+
+    def __init__(self, cpus: Optional[int] = None, memory: Optional[float] = None):
+        cores = available_cpus()
+        if cpus is not None:
+            if cpus > len(cores):
+                # the pool may be bigger than the cores we can pin to, so cores are shared round robin
+                cores = [cores[i % len(cores)] for i in range(cpus)]
+            else:
+                cores = cores[:cpus]
+        self.cpus = cores
+        self.memory = memory
+        self._free_cpus = list(range(len(cores)))  # slots into self.cpus
+        self._free_memory = memory
+        self._acquired: dict[int, tuple[list[int], float]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def n_free_cpus(self) -> int:
+        return len(self._free_cpus)
+
+    @property
+    def idle(self) -> bool:
+        """Whether no trial holds resources from the pool"""
+        return not self._acquired
+
+    def acquire(self, trial_index: int, resources: TrialResources) -> Optional[list[int]]:
+        """Take the resources a trial needs from the pool, if there is room for them.
+
+        A trial that needs more than the whole pool is only admitted when the pool is idle,
+        and then gets all of it.
+
+        Returns
+        -------
+        list[int] or None
+            The CPU cores assigned to the trial, or None if the trial doesn't fit yet
+        """
+        with self._lock:
+            if trial_index in self._acquired:
+                return [self.cpus[slot] for slot in self._acquired[trial_index][0]]
+            cpus = max(int(resources.cpus), 0)
+            memory = max(float(resources.memory or 0), 0)
+            if cpus > len(self.cpus) or (self.memory is not None and memory > self.memory):
+                if self._acquired:
+                    return None
+                logger.warning(
+                    f"Trial {trial_index} needs {resources}, which is more than the whole"
+                    f" resource pool ({len(self.cpus)} cpus, {self.memory} MB memory), running it alone"
+                )
+                cpus = len(self.cpus)
+                memory = self._free_memory or 0
+            if cpus > len(self._free_cpus) or (self._free_memory is not None and memory > self._free_memory):
+                return None
+            slots, self._free_cpus = self._free_cpus[:cpus], self._free_cpus[cpus:]
+            if self._free_memory is not None:
+                self._free_memory -= memory
+            self._acquired[trial_index] = (slots, memory)
+            return [self.cpus[slot] for slot in slots]
+
+    def release(self, trial_index: int):
+        """Return the resources of a trial to the pool"""
+        with self._lock:
+            if trial_index not in self._acquired:
+                return
+            slots, memory = self._acquired.pop(trial_index)
+            self._free_cpus = sorted(self._free_cpus + slots)
+            if self._free_memory is not None:
+                self._free_memory += memory
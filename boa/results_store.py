@@ -0,0 +1,206 @@
+"""
+###################################
+Columnar Results Store
+###################################
+
+Append only, columnar store of the results of an optimization: the rows of the
+optimization csv (one row per trial and arm, with the trial's status, generation method,
+parameters and metric means), kept as a Parquet dataset next to the optimization csv
+(the ``optimization.parquet`` directory for ``optimization.csv``) and updated on every checkpoint.
+
+Each checkpoint only appends the rows of the trials that changed since the last one
+(see :attr:`.SchedulerJournal.changed_trials`) as a new part file (``part-000001.parquet``),
+so writes cost as much as the trials that changed, not the whole optimization.
+When the optimization csv is rewritten (with a full snapshot of the scheduler), the store is
+rewritten too, as a single part with the rows of every trial, so the parts don't pile up.
+:func:`read_results` reads the parts and keeps the latest row of each trial and arm.
+
+The parts are plain Parquet files, so they can be read without BOA, by pandas, pyarrow or polars::
+
+    df = pd.concat(map(pd.read_parquet, sorted(pathlib.Path("optimization.parquet").glob("part-*.parquet"))))
+
+Writing the store needs ``pyarrow`` (see :func:`has_pyarrow`), without it only the optimization csv is written.
+A column whose values aren't all numbers (or all booleans, or all strings) in a part,
+such as a choice parameter mixing numbers and strings, is written as strings.
+
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import pathlib
+import threading
+from typing import Any, Iterable, Optional
+
+import pandas as pd
+from ax import Experiment
+from ax.service.utils.report_utils import _get_generation_method_str
+
+from boa.definitions import PathLike
+from boa.logger import get_logger
+from boa.wrappers.wrapper_utils import write_file_atomic
+
+logger = get_logger()
+
+#: Suffix of the results store directory next to the optimization csv
+RESULTS_STORE_SUFFIX = ".parquet"
+PART_GLOB = "part-*.parquet"
+
+_INDEX_COLUMNS = ("trial_index", "arm_name")
+
+
+def has_pyarrow() -> bool:
+    """Whether ``pyarrow``, which writing the results store needs, is installed"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def results_store_path(opt_filepath: PathLike) -> pathlib.Path:
+    """Path of the results store next to the optimization csv ``opt_filepath``
+
+    >>> results_store_path("exp_dir/optimization.csv").as_posix()
+    'exp_dir/optimization.parquet'
+    """
+    return pathlib.Path(opt_filepath).with_suffix(RESULTS_STORE_SUFFIX)
+
+
+def trial_rows(experiment: Experiment, trial_indices: Iterable[int]) -> list[dict[str, Any]]:
+    """Rows of the results table of ``trial_indices``, with the same columns as
+    :func:`ax.service.utils.report_utils.exp_to_df` (minus the failure reason)"""
+    rows = []
+    for index in sorted(trial_indices):
+        trial = experiment.trials[index]
+        means: dict[str, dict[str, float]] = {}
+        if experiment.data_by_trial.get(index):
+            data, _ = experiment.lookup_data_for_trial(index)
+            for row in data.df.itertuples():
+                means.setdefault(row.arm_name, {})[row.metric_name] = row.mean
+        generation_method = _get_generation_method_str(trial)
+        for arm in trial.arms:
+            rows.append(
+                {
+                    "trial_index": index,
+                    "arm_name": arm.name,
+                    "trial_status": trial.status.name,
+                    "generation_method": generation_method,
+                    **arm.parameters,
+                    **means.get(arm.name, {}),
+                }
+            )
+    return rows
+
+
+class ResultsStore:
+    """Append the results of an optimization to the Parquet dataset at ``path``
+    (see the module documentation for the layout).
+
+    The first write of a new ``ResultsStore`` starts the store over, so the rows of
+    an optimization that was restarted aren't kept twice.
+
+    Parameters
+    ----------
+    path
+        Directory of the store, see :func:`results_store_path`
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> store = ResultsStore(pathlib.Path(tempfile.mkdtemp()) / "optimization.parquet")
+    >>> store.append([{"trial_index": 0, "arm_name": "0_0", "trial_status": "RUNNING", "x": 0.5}])
+    >>> store.append([{"trial_index": 0, "arm_name": "0_0", "trial_status": "COMPLETED", "x": 0.5, "y": 2.0}])
+    >>> read_results(store.path)
+       trial_index arm_name trial_status    x    y
+    0            0      0_0    COMPLETED  0.5  2.0
+    >>> len(read_results(store.path, latest=False))
+    2
+    """
+
+    def __init__(self, path: PathLike):
+        self.path = pathlib.Path(path)
+        # None until the first write, which starts the store over
+        self._n_parts: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def append(self, rows: list[dict[str, Any]]):
+        """Append ``rows`` (dicts of column name to value) to the store as a new part.
+        Columns that rows are missing are missing values."""
+        if not rows:
+            return
+        with self._lock:
+            self._write_part(rows)
+
+    def rewrite(self, rows: list[dict[str, Any]]):
+        """Replace what is in the store with ``rows`` (the rows of every trial), as a single part"""
+        with self._lock:
+            part = self._write_part(rows)
+            # the new part is written before the old ones are removed, so readers never see the store empty
+            for old_part in _parts(self.path):
+                if old_part != part:
+                    old_part.unlink(missing_ok=True)
+
+    def _write_part(self, rows: list[dict[str, Any]]) -> pathlib.Path:
+        if self._n_parts is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            for part in _parts(self.path):
+                part.unlink()
+            self._n_parts = 0
+        part = self.path / f"part-{self._n_parts:06d}.parquet"
+        write_file_atomic(part, _parquet_bytes(rows))
+        self._n_parts += 1
+        return part
+
+
+def read_results(path: PathLike, columns: Optional[Iterable[str]] = None, latest: bool = True) -> pd.DataFrame:
+    """Read the results store at ``path`` into a data frame.
+
+    Parameters
+    ----------
+    path
+        Directory of the store, see :func:`results_store_path`
+    columns
+        Columns to read (``trial_index`` and ``arm_name`` are always read). Defaults to all
+    latest
+        Only keep the latest row of each trial and arm (otherwise all rows that were
+        appended are returned, in the order they were appended)
+    """
+    import pyarrow.parquet as pq
+
+    wanted = None if columns is None else set(columns) | set(_INDEX_COLUMNS)
+    frames = []
+    for part in _parts(pathlib.Path(path)):
+        try:
+            parquet_file = pq.ParquetFile(part, memory_map=True)
+        except FileNotFoundError:  # removed by a rewrite since the parts were listed
+            continue
+        names = parquet_file.schema_arrow.names
+        if wanted is not None:
+            names = [name for name in names if name in wanted]
+        frames.append(parquet_file.read(columns=names).to_pandas())
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    if latest and len(df) and set(_INDEX_COLUMNS) <= set(df.columns):
+        df = df.drop_duplicates(list(_INDEX_COLUMNS), keep="last").sort_values("trial_index", kind="stable")
+        df = df.reset_index(drop=True)
+    return df
+
+
+def _parts(path: pathlib.Path) -> list[pathlib.Path]:
+    """the part files of the store at ``path``, in the order they were written"""
+    return sorted(path.glob(PART_GLOB))
+
+
+def _parquet_bytes(rows: list[dict[str, Any]]) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrays = {}
+    for name in dict.fromkeys(name for row in rows for name in row):
+        values = [row.get(name) for row in rows]
+        try:
+            arrays[name] = pa.array(values, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # values of different types, such as a choice parameter of numbers and strings
+            arrays[name] = pa.array([None if pd.isna(value) else str(value) for value in values], type=pa.string())
+    sink = pa.BufferOutputStream()
+    pq.write_table(pa.table(arrays), sink)
+    return sink.getvalue().to_pybytes()
@@ -8,22 +8,44 @@ Runner that calls your :mod:`.wrappers` to run your model and poll the trial sta
 """
 
 import concurrent.futures
+import copy
 import logging
 import multiprocessing
+import pickle
+import sys
+import weakref
 from collections import defaultdict
-from typing import Any, Dict, Iterable, Set
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 
-from ax.core.base_trial import TrialStatus
+from ax.core.base_trial import BaseTrial, TrialStatus
+from ax.core.batch_trial import BatchTrial, GeneratorRunStruct
 from ax.core.runner import Runner
 from ax.core.trial import Trial
 
+from boa.batch_queue import BatchQueue, JobState, load_batch_queue
+from boa.config import RunBackend
 from boa.logger import get_logger
 from boa.metaclasses import RunnerRegister
-from boa.utils import serialize_init_args
+from boa.resources import ResourcePool, TrialResources
+from boa.utils import _load_module_from_path, serialize_init_args
 from boa.wrappers.base_wrapper import BaseWrapper
 
 logger = get_logger()
 
+# attributes of runners that are recreated as needed instead of being serialized
+_RUNTIME_ATTRIBUTES = ("_resource_pool", "_waiting_trials", "_admitted_trials", "_batch_queue", "_process_pool")
+
+# wrapper of a ``process`` run backend worker, set once per worker process by the pool initializer
+_process_wrapper: BaseWrapper = None
+# run metadata key of the terminal status a ``process`` run backend worker left a trial in,
+# applied once the scheduler has marked the trial running (see :meth:`WrappedJobRunner.poll_trial_status`)
+WORKER_STATUS_KEY = "worker_trial_status"
+# run metadata key of whether a trial was deployed, or is waiting for room in the resource pool
+# (see :attr:`WrappedJobRunner.waiting_trials`), so trials left waiting when the optimization
+# stopped are put back in line instead of being failed (see :func:`.recover_running_trials`)
+ADMITTED_KEY = "admitted"
+
 
 class WrappedJobRunner(Runner, metaclass=RunnerRegister):
     def __init__(self, wrapper: BaseWrapper = None, *args, **kwargs):
@@ -32,7 +54,46 @@ class WrappedJobRunner(Runner, metaclass=RunnerRegister):
         self.queue = multiprocessing.Manager().Queue()
         super().__init__(*args, **kwargs)
 
-    def run(self, trial: Trial) -> Dict[str, Any]:
+    @property
+    def run_backend(self) -> RunBackend:
+        """How trials are deployed in :meth:`run_multiple`, set by ``run_backend`` in
+        :class:`.BOAScriptOptions`"""
+        backend = getattr(getattr(self.wrapper, "script_options", None), "run_backend", None)
+        backend = RunBackend(backend) if backend else RunBackend.THREAD
+        if backend == RunBackend.PROCESS and not self.wrapper.supports_process_backend:
+            raise ValueError(
+                f"{type(self.wrapper).__name__} does not support the `process` run_backend "
+                "(its run_model starts processes that have to be watched from the main process), "
+                "use the `thread` run_backend instead."
+            )
+        return backend
+
+    @property
+    def max_workers(self) -> Optional[int]:
+        """Maximum number of threads or processes used by :meth:`run_multiple`, set by
+        ``max_workers`` in :class:`.BOAScriptOptions`"""
+        return getattr(getattr(self.wrapper, "script_options", None), "max_workers", None)
+
+    @property
+    def resource_pool(self) -> Optional[ResourcePool]:
+        """Pool of CPU cores and memory that trials are admitted to, set by ``resource_pool`` in
+        :class:`.BOAScriptOptions`, or None if trials don't declare ``trial_resources``"""
+        if getattr(self, "_resource_pool", None) is None:
+            script_options = getattr(self.wrapper, "script_options", None)
+            if getattr(script_options, "trial_resources", None) is None:
+                return None
+            self._resource_pool = ResourcePool(**script_options.resource_pool)
+        return self._resource_pool
+
+    @property
+    def waiting_trials(self) -> List[BaseTrial]:
+        """Trials handed to :meth:`run_multiple` that are waiting for room in the
+        :attr:`resource_pool` to be deployed"""
+        if not hasattr(self, "_waiting_trials"):
+            self._waiting_trials = []
+        return self._waiting_trials
+
+    def run(self, trial: BaseTrial) -> Dict[str, Any]:
         """Deploys a trial based on custom runner subclass implementation.
 
         Add a logging queue handler to the boa and ax root loggers to capture logs from the
@@ -50,23 +111,24 @@ class WrappedJobRunner(Runner, metaclass=RunnerRegister):
         ax_logger = logging.getLogger("ax")
         ax_logger.addHandler(qh)
 
-        if not isinstance(trial, Trial):
-            raise ValueError("This runner only handles `Trial`.")
+        if not isinstance(trial, (Trial, BatchTrial)):
+            raise ValueError("This runner only handles `Trial` and `BatchTrial`.")
 
-        self.wrapper.write_configs(trial)
-
-        self.wrapper.run_model(trial)
-        # This run metadata will be attached to trial as `trial.run_metadata`
-        # by the base `Scheduler`.
-        return {"job_id": trial.index}
+        return _deploy_trial(self.wrapper, trial)
 
     def run_multiple(self, trials) -> Dict[int, Dict[str, Any]]:
         """Runs a single evaluation for each of the given trials. Useful when deploying
         multiple trials at once is more efficient than deploying them one-by-one.
         Used in Ax ``Scheduler``.
 
-        NOTE: By default simply loops over `run_trial`. Should be overwritten
-        if deploying multiple trials in batch is preferable.
+        Trials are deployed according to ``run_backend`` in :class:`.BOAScriptOptions`,
+        either in a thread pool (the default), a process pool, or inline one after another.
+
+        If trials declare ``trial_resources``, only the trials that the :attr:`resource_pool`
+        has room for are deployed, each with the CPU cores assigned to it in its run metadata
+        (``trial.run_metadata["cpus"]``). The rest wait and are deployed by
+        :meth:`poll_trial_status` as earlier trials finish. Whether a trial was deployed
+        is kept in its run metadata (``trial.run_metadata["admitted"]``).
 
         Args:
             trials: Iterable of trials to be deployed, each containing arms with
@@ -78,8 +140,23 @@ class WrappedJobRunner(Runner, metaclass=RunnerRegister):
             Dict of trial index to the run metadata of that trial from the deployment
             process.
         """
+        if self.resource_pool is not None:
+            trials = list(trials)
+            self.waiting_trials.extend(trials)
+            self._admit_waiting_trials()
+            waiting = {trial.index for trial in self.waiting_trials}
+            return {trial.index: {"job_id": trial.index, ADMITTED_KEY: trial.index not in waiting} for trial in trials}
+        return self._deploy_multiple(trials)
+
+    def _deploy_multiple(self, trials) -> Dict[int, Dict[str, Any]]:
+        backend = self.run_backend
+        if backend == RunBackend.INLINE:
+            return {trial.index: self.run(trial=trial) for trial in trials}
+        if backend == RunBackend.PROCESS:
+            return self._run_multiple_in_processes(trials)
+
         results = {}
-        with concurrent.futures.ThreadPoolExecutor() as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             trial_runs = {executor.submit(self.run, trial=trial): trial.index for trial in trials}
             for future in concurrent.futures.as_completed(trial_runs):
                 trial_index = trial_runs[future]
@@ -92,7 +169,61 @@ class WrappedJobRunner(Runner, metaclass=RunnerRegister):
 
         return results
 
-    def poll_trial_status(self, trials: Iterable[Trial]) -> Dict[TrialStatus, Set[int]]:
+    def _run_multiple_in_processes(self, trials) -> Dict[int, Dict[str, Any]]:
+        trials = list(trials)
+        for trial in trials:
+            if not isinstance(trial, (Trial, BatchTrial)):
+                raise ValueError("This runner only handles `Trial` and `BatchTrial`.")
+
+        results = {}
+        executor = self.process_pool
+        trial_runs = {executor.submit(_deploy_trial_in_process, _detach_trial(trial)): trial for trial in trials}
+        for future in concurrent.futures.as_completed(trial_runs):
+            trial = trial_runs[future]
+            try:
+                run_metadata, status, trial_results = future.result()
+            except Exception as e:
+                logger.exception(f"Error completing run because of {e}!")
+                if isinstance(e, concurrent.futures.process.BrokenProcessPool):
+                    # a worker died, start a new pool for the next trials
+                    self._shutdown_process_pool()
+                raise
+            self.wrapper.import_trial_results(trial, trial_results)
+            # trials are only marked running by the scheduler after they are deployed, so a terminal
+            # status the wrapper set in the worker is carried in the run metadata and applied on the next poll
+            if status.is_terminal:
+                run_metadata = {**run_metadata, WORKER_STATUS_KEY: status.name}
+            results[trial.index] = run_metadata
+
+        return results
+
+    @property
+    def process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """Pool of worker processes used by the ``process`` run backend, started the first
+        time it is needed and kept for the life of the runner.
+
+        Workers are spawned (not forked, since the main process runs threads such as the
+        logging manager's), and each gets a copy of the wrapper as it was when the pool started.
+        """
+        if getattr(self, "_process_pool", None) is None:
+            wrapper_cls = type(self.wrapper)
+            module_path = str(wrapper_cls._path) if getattr(wrapper_cls, "_path", None) else None
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(wrapper_cls.__module__, module_path, pickle.dumps(self.wrapper)),
+            )
+            weakref.finalize(self, self._process_pool.shutdown, wait=False)
+        return self._process_pool
+
+    def _shutdown_process_pool(self):
+        pool = getattr(self, "_process_pool", None)
+        self._process_pool = None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def poll_trial_status(self, trials: Iterable[BaseTrial]) -> Dict[TrialStatus, Set[int]]:
         """Checks the status of any non-terminal trials and returns their
         indices as a mapping from TrialStatus to a list of indices. Required
         for runners used with Ax ``Scheduler``.
@@ -109,19 +240,270 @@ class WrappedJobRunner(Runner, metaclass=RunnerRegister):
             include trials that at the time of polling already have a terminal
             (ABANDONED, FAILED, COMPLETED) status (but it may).
         """
+        trials = list(trials)
+        _apply_worker_statuses(trials)
+        waiting = {trial.index for trial in self.waiting_trials}
+        self.wrapper.set_trial_statuses(
+            [trial for trial in trials if trial.index not in waiting and not trial.status.is_terminal]
+        )
+
+        if self.resource_pool is not None or self.waiting_trials:
+            self._release_finished_trials()
+            self._admit_waiting_trials()
+            _apply_worker_statuses(trials)
+
         status_dict = defaultdict(set)
         for trial in trials:
-            self.wrapper.set_trial_status(trial)
             status_dict[trial.status].add(trial.index)
 
         return status_dict
 
+    def poll_available_capacity(self) -> int:
+        """Number of new trials the :attr:`resource_pool` could start right now
+        (at least one core each), or -1 (unlimited) if trials don't declare ``trial_resources``.
+        No new trials are asked for while trials are waiting for room in the pool."""
+        if self.resource_pool is None:
+            return super().poll_available_capacity()
+        if self.waiting_trials:
+            return 0
+        return self.resource_pool.n_free_cpus
+
+    def _admit_waiting_trials(self):
+        """deploy the waiting trials that fit in the resource pool, in order,
+        letting smaller trials go ahead of ones that don't fit yet
+        (all of them if there is no resource pool, for trials put back in line after a restart)"""
+        if not hasattr(self, "_admitted_trials"):
+            self._admitted_trials = {}
+        pool = self.resource_pool
+        admitted = []
+        for trial in list(self.waiting_trials):
+            if trial.status.is_terminal:  # abandoned while waiting
+                self.waiting_trials.remove(trial)
+                continue
+            run_metadata = {ADMITTED_KEY: True}
+            if pool is not None:
+                resources = self.wrapper.trial_resources(trial) or TrialResources()
+                cpus = pool.acquire(trial.index, resources)
+                if cpus is None:
+                    continue
+                self._admitted_trials[trial.index] = trial
+                run_metadata["cpus"] = cpus
+            self.waiting_trials.remove(trial)
+            trial.update_run_metadata(run_metadata)
+            admitted.append(trial)
+        if not admitted:
+            return
+        logger.info(f"Deploying trials {[trial.index for trial in admitted]} with room in the resource pool")
+        try:
+            run_metadata = self._deploy_multiple(admitted)
+        except Exception as e:
+            logger.exception(f"Error deploying trials, failing them. Reason: {e!r}")
+            for trial in admitted:
+                if not trial.status.is_terminal:
+                    trial.mark_failed(unsafe=True)
+            self._release_finished_trials()
+            return
+        for trial in admitted:
+            trial.update_run_metadata(run_metadata.get(trial.index, {}))
+
+    def _release_finished_trials(self):
+        """return the resources of admitted trials that have finished to the pool"""
+        for trial_index, trial in list(getattr(self, "_admitted_trials", {}).items()):
+            if trial.status.is_terminal:
+                self.resource_pool.release(trial_index)
+                del self._admitted_trials[trial_index]
+
     def to_dict(self) -> dict:
         """Convert runner to a dictionary."""
 
         parents = self.__class__.mro()[1:]  # index 0 is the class itself
 
         properties = serialize_init_args(self, parents=parents, match_private=True, exclude_fields=["wrapper", "queue"])
+        # state that only lives as long as this process
+        for name in _RUNTIME_ATTRIBUTES:
+            properties.pop(name, None)
 
         properties["__type"] = self.__class__.__name__
         return properties
+
+
+class ArrayJobRunner(WrappedJobRunner):
+    """Runner that submits trials to a batch queue as array jobs.
+
+    Used instead of :class:`WrappedJobRunner` when ``batch_queue`` is set in
+    :class:`.BOAScriptOptions`. Trials deployed together are grouped into array jobs
+    of up to ``array_size`` trials, each trial running the command from
+    :meth:`.BaseWrapper.job_command` as one job of the array. The job ID of each trial
+    is stored in its run metadata.
+
+    Each status poll queries the queue once for the jobs of all running trials,
+    and only the trials whose jobs finished (or that the queue no longer knows about)
+    are polled by the wrapper. Trials whose jobs failed are marked failed.
+    See :mod:`boa.batch_queue` for the available queues and how to plug in your own.
+
+    The Ax scheduler only deploys more than one trial at a time if
+    ``run_trials_in_batches`` is set in the scheduler options.
+    """
+
+    @property
+    def batch_queue(self) -> BatchQueue:
+        """The batch queue set by ``batch_queue`` in :class:`.BOAScriptOptions`,
+        created the first time it is accessed"""
+        if getattr(self, "_batch_queue", None) is None:
+            script_options = self.wrapper.script_options
+            self._batch_queue = load_batch_queue(
+                script_options.batch_queue, base_path=script_options.base_path, **script_options.batch_queue_options
+            )
+        return self._batch_queue
+
+    @property
+    def array_size(self) -> Optional[int]:
+        """Most trials submitted in one array job, set by ``array_size`` in
+        :class:`.BOAScriptOptions`"""
+        return getattr(getattr(self.wrapper, "script_options", None), "array_size", None)
+
+    def run(self, trial: BaseTrial) -> Dict[str, Any]:
+        """Submits a trial to the batch queue as an array job of its own.
+
+        Args:
+            trial: The trial to deploy.
+
+        Returns:
+            Dict of run metadata from the deployment process.
+        """
+        return self.run_multiple([trial])[trial.index]
+
+    def run_multiple(self, trials) -> Dict[int, Dict[str, Any]]:
+        """Submits the given trials to the batch queue as array jobs of up to
+        ``array_size`` trials each.
+
+        Args:
+            trials: Iterable of trials to be deployed.
+
+        Returns:
+            Dict of trial index to the run metadata of that trial, with the
+            job ID of its job in the batch queue.
+        """
+        trials = list(trials)
+        for trial in trials:
+            if not isinstance(trial, (Trial, BatchTrial)):
+                raise ValueError("This runner only handles `Trial` and `BatchTrial`.")
+
+        commands = []
+        for trial in trials:
+            self.wrapper.write_configs(trial)
+            commands.append(self.wrapper.job_command(trial))
+
+        results = {}
+        array_size = self.array_size or len(trials) or 1
+        for start in range(0, len(trials), array_size):
+            array_trials = trials[start : start + array_size]
+            job_ids = self.batch_queue.submit_array(commands[start : start + array_size], cwd=self.wrapper.working_dir)
+            for array_index, (trial, job_id) in enumerate(zip(array_trials, job_ids)):
+                # This run metadata will be attached to trial as `trial.run_metadata`
+                # by the base `Scheduler`.
+                results[trial.index] = {"job_id": job_id, "array_index": array_index}
+        return results
+
+    def poll_available_capacity(self) -> int:
+        """The batch queue decides when jobs run, so capacity is unlimited"""
+        return -1
+
+    def poll_trial_status(self, trials: Iterable[BaseTrial]) -> Dict[TrialStatus, Set[int]]:
+        """Queries the batch queue once for the jobs of all trials, and polls the trials
+        whose jobs finished through the wrapper. Trials whose jobs are still pending or
+        running are left running, and trials whose jobs failed are marked failed.
+
+        Args:
+            trials: Trials to poll.
+
+        Returns:
+            A dictionary mapping TrialStatus to a list of trial indices that have
+            the respective status at the time of the polling.
+        """
+        trials = list(trials)
+        job_ids = {trial.index: trial.run_metadata.get("job_id") for trial in trials}
+        states = self.batch_queue.poll([job_id for job_id in job_ids.values() if job_id is not None])
+
+        finished = []
+        for trial in trials:
+            state = states.get(job_ids[trial.index])
+            if trial.status.is_terminal or state in (JobState.PENDING, JobState.RUNNING):
+                continue
+            if state == JobState.FAILED:
+                logger.warning(f"Job {job_ids[trial.index]} of trial {trial.index} failed, failing trial")
+                trial.mark_failed(unsafe=True)
+                continue
+            finished.append(trial)
+        if finished:
+            self.wrapper.set_trial_statuses(finished)
+
+        status_dict = defaultdict(set)
+        for trial in trials:
+            status_dict[trial.status].add(trial.index)
+
+        return status_dict
+
+
+def _deploy_trial(wrapper: BaseWrapper, trial: BaseTrial) -> Dict[str, Any]:
+    wrapper.write_configs(trial)
+
+    wrapper.run_model(trial)
+    # This run metadata will be attached to trial as `trial.run_metadata`
+    # by the base `Scheduler`.
+    return {"job_id": trial.index}
+
+
+def _init_process_worker(module_name: str, module_path: Optional[str], wrapper: bytes):
+    global _process_wrapper
+    # wrappers loaded from a path (see :func:`.initialize_wrapper`) are not importable by name
+    # in a spawned worker, so load their module the same way before unpickling the wrapper
+    if module_name not in sys.modules and module_path is not None:
+        try:
+            __import__(module_name)
+        except ImportError:
+            _load_module_from_path(module_path, module_name)
+    _process_wrapper = pickle.loads(wrapper)
+
+
+def _deploy_trial_in_process(trial: BaseTrial) -> Tuple[Dict[str, Any], TrialStatus, dict]:
+    # stand-in for the experiment's status bookkeeping, so the wrapper can still mark the trial
+    trial._experiment = SimpleNamespace(_trial_indices_by_status=defaultdict(set, {trial.status: {trial.index}}))
+    run_metadata = _deploy_trial(_process_wrapper, trial)
+    return run_metadata, trial.status, _process_wrapper.export_trial_results(trial)
+
+
+def _apply_worker_statuses(trials: List[BaseTrial]):
+    """mark the running trials that a ``process`` run backend worker finished with the status it left them in"""
+    for trial in trials:
+        status = trial.run_metadata.get(WORKER_STATUS_KEY)
+        if status is not None and trial.status.is_running:
+            trial.mark_as(TrialStatus[status], unsafe=True)
+
+
+def _detach_trial(trial: BaseTrial) -> BaseTrial:
+    """Shallow copy of a trial that can be pickled and sent to a worker process.
+
+    The experiment, runner, and the optimization config and search space of the generator
+    run(s) all hold the wrapper and metrics (which may hold unpicklable callables), and none of
+    them are needed to deploy the trial, so they are left out (in the worker, ``trial.experiment`` only
+    keeps track of the trial's status, see :attr:`.BaseWrapper.supports_process_backend`).
+    """
+    detached = copy.copy(trial)
+    detached._experiment = None
+    detached._runner = None
+    if isinstance(trial, BatchTrial):
+        detached._generator_run_structs = [
+            GeneratorRunStruct(generator_run=_detach_generator_run(struct.generator_run), weight=struct.weight)
+            for struct in trial._generator_run_structs
+        ]
+    elif trial.generator_run is not None:
+        detached._generator_run = _detach_generator_run(trial.generator_run)
+    return detached
+
+
+def _detach_generator_run(generator_run):
+    generator_run = copy.copy(generator_run)
+    generator_run._optimization_config = None
+    generator_run._search_space = None
+    return generator_run
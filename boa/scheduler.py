@@ -1,20 +1,98 @@
 from __future__ import annotations
 
 import pathlib
+import threading
+import time
+from contextlib import contextmanager
 from pprint import pformat
-from typing import Iterable, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Optional
 
+import ax.service.scheduler
 from ax.core.optimization_config import OptimizationConfig
 from ax.modelbridge.base import ModelBridge
 from ax.service.scheduler import Scheduler as AxScheduler
 
+from boa.config import StorageBackend
 from boa.definitions import PathLike
 from boa.logger import get_logger
 from boa.runner import WrappedJobRunner
 from boa.wrappers.base_wrapper import BaseWrapper
 
+if TYPE_CHECKING:  # pragma: no cover
+    from boa.storage import SchedulerJournal
+
 logger = get_logger()
 
+# the wrapper of the scheduler waiting for trials in each thread, see _sleep
+_waiting = threading.local()
+# how many schedulers are waiting for trials, while ``sleep`` of Ax's scheduler module is replaced
+_n_waiting = 0
+_ax_sleep: Optional[Callable[[float], None]] = None
+_sleep_lock = threading.Lock()
+
+
+class CheckpointPolicy:
+    """When :meth:`Scheduler.report_results` checkpoints the scheduler (see :meth:`Scheduler.save_data`).
+
+    With neither ``n_trials`` nor ``seconds`` set, every report is checkpointed. Otherwise a report
+    is only checkpointed once ``n_trials`` trials have finished since the last checkpoint, once
+    ``seconds`` have passed since it, or (with ``on_step_change``) once the generation strategy
+    has moved on to a new generation step, whichever comes first.
+
+    Parameters
+    ----------
+    n_trials
+        Checkpoint once this many trials finished (completed, failed, etc.) since the last checkpoint
+    seconds
+        Checkpoint once this many seconds passed since the last checkpoint
+    on_step_change
+        Checkpoint when the generation step changes, so the switch to a new model is never lost
+
+    Examples
+    --------
+    >>> policy = CheckpointPolicy(n_trials=3)
+    >>> policy.record(n_finished=0, step=0, now=0.0)
+    >>> policy.is_due(n_finished=2, step=0, now=10.0)
+    False
+    >>> policy.is_due(n_finished=3, step=0, now=10.0)
+    True
+    >>> policy.is_due(n_finished=1, step=1, now=10.0)  # moved on to the next model
+    True
+    """
+
+    def __init__(self, n_trials: Optional[int] = None, seconds: Optional[float] = None, on_step_change: bool = True):
+        self.n_trials = n_trials
+        self.seconds = seconds
+        self.on_step_change = on_step_change
+        self._last: Optional[tuple[int, int, float]] = None  # (n_finished, step, time) of the last checkpoint
+
+    @classmethod
+    def from_options(cls, script_options=None) -> CheckpointPolicy:
+        """The policy set by the ``checkpoint_*`` options of :class:`.BOAScriptOptions`"""
+        if script_options is None:
+            return cls()
+        return cls(
+            n_trials=script_options.checkpoint_every_n_trials,
+            seconds=script_options.checkpoint_every_seconds,
+            on_step_change=script_options.checkpoint_on_step_change,
+        )
+
+    def is_due(self, n_finished: int, step: int, now: Optional[float] = None) -> bool:
+        """Whether to checkpoint, with ``n_finished`` trials finished and the generation strategy at ``step``"""
+        if self._last is None or (self.n_trials is None and self.seconds is None):
+            return True
+        last_finished, last_step, last_time = self._last
+        now = time.monotonic() if now is None else now
+        return (
+            (self.n_trials is not None and n_finished - last_finished >= self.n_trials)
+            or (self.seconds is not None and now - last_time >= self.seconds)
+            or (self.on_step_change and step != last_step)
+        )
+
+    def record(self, n_finished: int, step: int, now: Optional[float] = None):
+        """Record that a checkpoint was taken"""
+        self._last = (n_finished, step, time.monotonic() if now is None else now)
+
 
 class Scheduler(AxScheduler):
     runner: WrappedJobRunner
@@ -29,6 +107,33 @@ class Scheduler(AxScheduler):
     def wrapper(self) -> BaseWrapper:
         return self.runner.wrapper
 
+    @property
+    def journal(self) -> SchedulerJournal:
+        """Journal the scheduler is checkpointed through, see :class:`.SchedulerJournal`,
+        or :class:`.SQLiteSchedulerStore` if ``storage`` is ``sqlite`` in :class:`.BOAScriptOptions`"""
+        if getattr(self, "_journal", None) is None:
+            from boa.storage import SchedulerJournal, SQLiteSchedulerStore
+
+            config = getattr(getattr(self.runner, "wrapper", None), "config", None)
+            if config is not None and config.script_options.storage == StorageBackend.SQLITE:
+                self._journal = SQLiteSchedulerStore()
+            else:
+                self._journal = SchedulerJournal()
+        return self._journal
+
+    @property
+    def checkpoint_policy(self) -> CheckpointPolicy:
+        """When results are checkpointed, see :class:`CheckpointPolicy`. Defaults to the
+        ``checkpoint_*`` options of :class:`.BOAScriptOptions`"""
+        if getattr(self, "_checkpoint_policy", None) is None:
+            config = getattr(getattr(self.runner, "wrapper", None), "config", None)
+            self._checkpoint_policy = CheckpointPolicy.from_options(getattr(config, "script_options", None))
+        return self._checkpoint_policy
+
+    @checkpoint_policy.setter
+    def checkpoint_policy(self, policy: CheckpointPolicy):
+        self._checkpoint_policy = policy
+
     @property
     def model(self):
         return self._model or self.generation_strategy.model
@@ -53,20 +158,53 @@ class Scheduler(AxScheduler):
     def opt_csv(self, path: PathLike):
         self._opt_csv = pathlib.Path(path)
 
+    def wait_for_completed_trials_and_report_results(
+        self,
+        idle_callback: Optional[Callable[[AxScheduler], None]] = None,
+        force_refit: bool = False,
+    ) -> Dict[str, Any]:
+        """Continuously poll for successful trials, with limited exponential
+        backoff, and process the results. Stop once at least one successful
+        trial has been found.
+
+        Same as Ax's version, except that its waits (between polls, and before polling trials
+        that just started) wait on :meth:`.BaseWrapper.wait_for_trial_updates` instead of sleeping,
+        so wrappers that can tell when trials finish (such as :class:`.ScriptWrapper` with
+        ``watch_trial_files``) are polled right away instead of after the full poll interval.
+
+        Args:
+            idle_callback: Callable that takes a Scheduler instance as an argument to
+                deliver information while the trials are still running.
+            force_refit: Whether to force a refit of the model during report_results.
+
+        Returns:
+            Results of the optimization so far, see :meth:`report_results`.
+        """
+        with _waiting_on_trial_updates(self.wrapper):
+            return super().wait_for_completed_trials_and_report_results(
+                idle_callback=idle_callback, force_refit=force_refit
+            )
+
     def report_results(self, force_refit: bool = False):
         """
         Ran whenever a batch of data comes in and the results are ready. This could be
         from one trial or a group of trials at once since it does interval polls to check
         trial statuses.
 
-        saves the scheduler to json and saves to the log a status update of what trials
-        have finished, which are running, and what generation step will be used to
-        generate the next trials.
+        checkpoints the scheduler (see :meth:`save_data`) when :attr:`checkpoint_policy` says a
+        checkpoint is due, and saves to the log a status update of what trials have finished,
+        which are running, and what generation step will be used to generate the next trials.
+
+        The end of the optimization is checkpointed with a full snapshot by
+        :meth:`_complete_optimization` and :meth:`_abort_optimization` instead.
 
         Args:
-            force_refit: Not used. Arg from Ax for compatibility.
+            force_refit: Whether to force a refit of the model. Ax passes True on every report
+                once it is done scheduling trials and waits for the running ones to finish,
+                which are checkpointed by the :attr:`checkpoint_policy` like any other report.
         """
-        self.save_data()
+        if self.checkpoint_policy.is_due(*self._checkpoint_progress()):
+            self.save_data()
         try:
             trials = self.best_raw_trials()
             best_trial_map = {idx: trial_dict["means"] for idx, trial_dict in trials.items()} if trials else {}
@@ -85,6 +223,22 @@ class Scheduler(AxScheduler):
         )
         logger.info(update)
 
+    def _complete_optimization(self, *args, **kwargs) -> Dict[str, Any]:
+        """Same as Ax's version, then writes a full snapshot of the scheduler
+        (whatever the :attr:`checkpoint_policy` skipped) and waits for it to be written"""
+        try:
+            return super()._complete_optimization(*args, **kwargs)
+        finally:
+            self.save_data(compact=True, wait=True)
+
+    def _abort_optimization(self, *args, **kwargs) -> Dict[str, Any]:
+        """Same as Ax's version, then writes a full snapshot of the scheduler
+        (whatever the :attr:`checkpoint_policy` skipped) and waits for it to be written"""
+        try:
+            return super()._abort_optimization(*args, **kwargs)
+        finally:
+            self.save_data(compact=True, wait=True)
+
     def best_fitted_trials(
         self,
         optimization_config: Optional[OptimizationConfig] = None,
@@ -249,8 +403,16 @@ class Scheduler(AxScheduler):
                 trials = {int(best_trial): dict(params=best_params, means=means_dict, cov_matrix=cov_matrix)}
         return trials
 
-    def save_data(self, **kwargs):
-        """Save Scheduler to json file. Defaults to `wrapper.experiment_dir` / `filepath`"""
+    def save_data(self, compact: bool = False, wait: bool = False, **kwargs):
+        """Save Scheduler to json file. Defaults to `wrapper.experiment_dir` / `filepath`
+
+        Only what changed since the last save is appended to the journal next to the
+        json file, and the json file and optimization csv are rewritten in full when
+        the journal is compacted or ``compact`` is True (see :class:`.SchedulerJournal`).
+
+        The files are written in the background, unless ``wait`` is True,
+        see :meth:`flush_data` to wait for them.
+        """
         from boa.storage import dump_scheduler_data
 
         try:
@@ -259,7 +421,74 @@ class Scheduler(AxScheduler):
                 dir_=self.runner.wrapper.experiment_dir,
                 scheduler_filepath=self.scheduler_filepath,
                 opt_filepath=self.opt_csv,
+                compact=compact,
+                wait=wait,
                 **kwargs,
             )
+            self.checkpoint_policy.record(*self._checkpoint_progress())
         except Exception as e:
             logger.exception("failed to save scheduler to json! Reason: %s" % repr(e))
+
+    def _checkpoint_progress(self) -> tuple[int, int]:
+        """number of finished trials and index of the current generation step, for the checkpoint policy"""
+        n_finished = sum(
+            len(indices) for status, indices in self.experiment.trial_indices_by_status.items() if status.is_terminal
+        )
+        return n_finished, self.generation_strategy.current_step_index
+
+    def flush_data(self):
+        """Wait for the checkpoints :meth:`save_data` is writing in the background to be written,
+        raising the error of one that failed to be written (see :meth:`.SchedulerJournal.flush`)"""
+        journal = getattr(self, "_journal", None)
+        if journal is not None:
+            journal.flush()
+
+    # Ax passes the trials it updates (their status, run metadata or data) to these, to save them to its
+    # database. Trials that had already finished are only looked at by the next checkpoint if they are marked
+    # (see :meth:`.SchedulerJournal.mark_trials_changed`)
+
+    def _save_or_update_trial_in_db_if_possible(self, experiment, trial, *args, **kwargs):
+        self.journal.mark_trials_changed([trial.index])
+        return super()._save_or_update_trial_in_db_if_possible(experiment, trial, *args, **kwargs)
+
+    def _save_or_update_trials_in_db_if_possible(self, experiment, trials, *args, **kwargs):
+        self.journal.mark_trials_changed(trial.index for trial in trials)
+        return super()._save_or_update_trials_in_db_if_possible(experiment, trials, *args, **kwargs)
+
+    def _save_or_update_trials_and_generation_strategy_if_possible(self, experiment, trials, *args, **kwargs):
+        self.journal.mark_trials_changed(trial.index for trial in trials)
+        return super()._save_or_update_trials_and_generation_strategy_if_possible(experiment, trials, *args, **kwargs)
+
+
+@contextmanager
+def _waiting_on_trial_updates(wrapper: BaseWrapper):
+    """Make Ax's scheduler wait on the trial updates of ``wrapper`` in this thread instead of sleeping.
+
+    Ax waits with the ``sleep`` of its scheduler module, which is replaced with :func:`_sleep`
+    while any :class:`Scheduler` is waiting for trials, and restored once the last one is done.
+    """
+    global _n_waiting, _ax_sleep
+    with _sleep_lock:
+        if _n_waiting == 0:
+            _ax_sleep = ax.service.scheduler.sleep
+            ax.service.scheduler.sleep = _sleep
+        _n_waiting += 1
+    previous, _waiting.wrapper = getattr(_waiting, "wrapper", None), wrapper
+    try:
+        yield
+    finally:
+        _waiting.wrapper = previous
+        with _sleep_lock:
+            _n_waiting -= 1
+            if _n_waiting == 0:
+                ax.service.scheduler.sleep = _ax_sleep
+
+
+def _sleep(seconds: float):
+    """``sleep`` of :mod:`ax.service.scheduler`, which waits on the trial updates of the wrapper of
+    the :class:`Scheduler` waiting for trials in this thread, if any, instead of sleeping"""
+    wrapper = getattr(_waiting, "wrapper", None)
+    if wrapper is None:
+        _ax_sleep(seconds)
+    else:
+        wrapper.wait_for_trial_updates(seconds)
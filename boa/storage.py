@@ -8,13 +8,24 @@ stop and restart.
 
 """
 
-import json
+import contextlib
+import copy
+import gzip
 import logging
+import os
 import pathlib
-from copy import deepcopy
+import sqlite3
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed
 from dataclasses import asdict
-from typing import Any, Callable, Dict, Optional, Type
+from functools import partial
+from json.decoder import scanstring
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple, Type, Union
 
+import pandas as pd
 from ax import Experiment
 from ax.exceptions.core import AxError
 from ax.exceptions.storage import JSONDecodeError as AXJSONDecodeError
@@ -33,11 +44,14 @@ from ax.storage.json_store.registry import (
     CORE_ENCODER_REGISTRY,
 )
 
+from boa import json_codec
 from boa.__version__ import __version__
+from boa.checkpoint_writer import CheckpointWriter
 from boa.definitions import PathLike
 from boa.logger import get_logger
 from boa.metrics.modular_metric import ModularMetric
-from boa.runner import WrappedJobRunner
+from boa.results_store import ResultsStore, has_pyarrow, results_store_path, trial_rows
+from boa.runner import ADMITTED_KEY, WrappedJobRunner
 from boa.scheduler import Scheduler
 from boa.utils import (
     _load_attr_from_module,
@@ -46,42 +60,206 @@ from boa.utils import (
 )
 from boa.wrappers.base_wrapper import BaseWrapper
 from boa.wrappers.script_wrapper import ScriptWrapper
+from boa.wrappers.wrapper_utils import write_file_atomic
 
 logger = get_logger()
 
+#: Suffix of the journal file next to the scheduler json file, see :class:`SchedulerJournal`
+JOURNAL_SUFFIX = ".journal.jsonl"
+#: Default for how large the journal can grow, relative to the scheduler json file, before it is compacted
+JOURNAL_COMPACTION_RATIO = 1.0
+#: Suffix of the SQLite database that replaces the scheduler json file, see :class:`SQLiteSchedulerStore`
+SQLITE_SUFFIX = ".sqlite"
+#: Compressions of the scheduler json file, by file extension (``scheduler.json.gz``).
+#: zstd needs the ``zstandard`` package
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
 
 def scheduler_to_json_file(
     scheduler, scheduler_filepath: PathLike = "scheduler.json", dir_: PathLike = None, **kwargs
 ) -> None:
     """Save a JSON-serialized snapshot of this `Scheduler`'s settings and state
     to a .json file by the given path.
+
+    The file is compressed if its name ends in a compression extension
+    (see :data:`COMPRESSION_SUFFIXES`), such as ``scheduler.json.gz``.
     """
     if dir_:
         scheduler_filepath = pathlib.Path(dir_) / scheduler_filepath
-    with open(scheduler_filepath, "w+") as file:  # pragma: no cover
-        file.write(json.dumps(scheduler_to_json_snapshot(scheduler), indent=4))
-        logger.info(
-            f"Saved JSON-serialized state of optimization to `{scheduler_filepath}`." f"\nBoa version: {__version__}"
-        )
+    write_snapshot(scheduler_filepath, scheduler_to_json_snapshot(scheduler))
+    logger.info(
+        f"Saved JSON-serialized state of optimization to `{scheduler_filepath}`." f"\nBoa version: {__version__}"
+    )
 
 
 def scheduler_from_json_file(filepath: PathLike = "scheduler.json", wrapper=None, **kwargs) -> Scheduler:
     """Restore an `Scheduler` and its state from a JSON-serialized snapshot,
     residing in a .json file by the given path.
+
+    If the snapshot was written by a :class:`SchedulerJournal`, the checkpoints appended
+    to its journal since the snapshot are replayed on top of it.
+    ``filepath`` can also be a SQLite database written by :class:`SQLiteSchedulerStore`,
+    or a compressed snapshot (see :func:`write_snapshot`).
     """
-    with open(filepath, "r") as file:  # pragma: no cover
-        serialized = json.loads(file.read())
+    if is_sqlite_file(filepath):
+        serialized = sqlite_to_json_snapshot(filepath)
+        scheduler = scheduler_from_json_snapshot(serialized=serialized, filepath=filepath, **kwargs)
+        if isinstance(scheduler.journal, SQLiteSchedulerStore):
+            # further checkpoints of this scheduler only write what changed to the same database
+            scheduler.journal.resume(scheduler, filepath)
+    else:
+        serialized, size = read_snapshot(filepath)
+        snapshot_id = serialized.get("snapshot_id")
+        journal_size = replay_journal(serialized, journal_path(filepath)) if snapshot_id else 0
         scheduler = scheduler_from_json_snapshot(serialized=serialized, filepath=filepath, **kwargs)
+        if snapshot_id and not isinstance(scheduler.journal, SQLiteSchedulerStore):
+            # further checkpoints of this scheduler append to the same journal
+            scheduler.journal.resume(scheduler, filepath, snapshot_id, size, journal_size)
+
+    if scheduler.wrapper is not None:
+        recover_running_trials(scheduler)
+    return scheduler
+
+
+def recover_running_trials(
+    scheduler: Scheduler,
+    max_workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+    resume_running: Optional[bool] = None,
+) -> Dict[int, bool]:
+    """Check the status of the trials that were running when the optimization stopped,
+    to complete or fail them before it is resumed.
 
+    The status of the trials is checked concurrently (with :meth:`.BaseWrapper.set_trial_status`
+    in a thread pool, or with a single call of :meth:`.BaseWrapper.set_trial_statuses` if
+    a :class:`.ScriptWrapper` has a ``set_trial_statuses`` command), and progress is logged
+    as the checks finish. Trials that are still running after their check are marked failed,
+    unless ``resume_running`` is set, and trials whose check didn't start within ``timeout``
+    are left running for the scheduler's regular polling to check (checks that already
+    started are waited for, so they never change a trial the scheduler polls).
+    Trials completed but still waiting on their data
+    (see :meth:`.ScriptWrapper.fetch_trial_data`) are left running as well.
+    Trials that were never deployed, as they were waiting for room in the resource pool,
+    are not checked but put back in line with the runner (see :attr:`.WrappedJobRunner.waiting_trials`).
+
+    Parameters
+    ----------
+    scheduler
+        Scheduler that was just loaded, with a wrapper
+    max_workers
+        Number of trials to check at once, defaults to ``recovery_workers``
+        in :class:`.BOAScriptOptions`
+    timeout
+        Seconds to wait for the checks, defaults to ``recovery_timeout``
+        in :class:`.BOAScriptOptions` (waiting for all checks if it isn't set)
+    resume_running
+        Leave trials that are still running after their check running instead of failing them,
+        defaults to ``resume_running_trials`` in :class:`.BOAScriptOptions`
+
+    Returns
+    -------
+    dict[int, bool]
+        The index of every trial that was running (and deployed), and whether its check finished
+    """
     wrapper = scheduler.wrapper
+    script_options = getattr(getattr(wrapper, "config", None), "script_options", None)
+    if max_workers is None:
+        max_workers = getattr(script_options, "recovery_workers", None)
+    if timeout is None:
+        timeout = getattr(script_options, "recovery_timeout", None)
+    if resume_running is None:
+        resume_running = getattr(script_options, "resume_running_trials", False)
 
-    if wrapper is not None:
-        for trial in scheduler.running_trials:
-            wrapper.set_trial_status(trial)  # try and complete or fail any leftover trials
+    trials = sorted(scheduler.running_trials, key=lambda trial: trial.index)  # oldest first
+    waiting = [trial for trial in trials if trial.run_metadata.get(ADMITTED_KEY) is False]
+    if waiting:
+        queued = {trial.index for trial in scheduler.runner.waiting_trials}
+        scheduler.runner.waiting_trials.extend(trial for trial in waiting if trial.index not in queued)
+        logger.info(f"Putting {len(waiting)} trial(s) that were waiting for room in the resource pool back in line.")
+        trials = [trial for trial in trials if trial.run_metadata.get(ADMITTED_KEY) is not False]
+    if not trials:
+        return {}
+    logger.info(f"Checking the status of {len(trials)} trial(s) left running when the optimization stopped.")
+    if isinstance(wrapper, ScriptWrapper):
+        wrapper.pending_fetches  # created up front, the checks below share it
+
+    checked = {trial.index: False for trial in trials}
+    if isinstance(wrapper, ScriptWrapper) and script_options.set_trial_statuses:
+        wrapper.set_trial_statuses(trials)  # a single command checks all of them
+        checked = dict.fromkeys(checked, True)
+    else:
+        checked.update(_check_trial_statuses(wrapper, trials, max_workers, timeout))
+
+    n_failed = 0
+    for trial in trials:
+        if not trial.status.is_running or not checked[trial.index] or resume_running:
+            continue
+        if isinstance(wrapper, ScriptWrapper) and trial.index in wrapper.pending_fetches:
+            continue  # completed and waiting on its data, the scheduler will keep polling it
+        trial.mark_failed()  # still running after its check, so it was lost when the optimization stopped
+        n_failed += 1
+    n_deferred = sum(not done for done in checked.values())
+    logger.info(
+        f"Checked the status of {len(trials) - n_deferred}/{len(trials)} trial(s) left running,"
+        f" {n_failed} of which were marked failed as they were no longer running"
+        + (f", {n_deferred} will be checked while the optimization runs." if n_deferred else ".")
+    )
+    return checked
 
-        for trial in scheduler.running_trials:  # any trial that was marked above is no longer here
-            trial.mark_failed()  # fail anything leftover from above
-    return scheduler
+
+def _check_trial_statuses(
+    wrapper: BaseWrapper, trials: list, max_workers: Optional[int], timeout: Optional[float]
+) -> Dict[int, bool]:
+    """call ``wrapper.set_trial_status`` on each trial in a thread pool, returning which checks finished
+    (the checks that didn't start within ``timeout`` are cancelled, and the ones that did are waited for).
+    Trials whose check raised are marked failed."""
+    checked = {}
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="BoaRecovery")
+    futures = {executor.submit(wrapper.set_trial_status, trial): trial for trial in trials}
+    log_every = max(len(trials) // 10, 1)
+    try:
+        for i, future in enumerate(as_completed(futures, timeout=timeout), start=1):
+            checked[futures[future].index] = True
+            _fail_failed_check(futures[future], future)
+            if i % log_every == 0 or i == len(trials):
+                logger.info(f"Checked the status of {i}/{len(trials)} trial(s) left running.")
+    except FuturesTimeoutError:
+        n_cancelled = sum(future.cancel() for future in futures)
+        logger.warning(
+            f"{n_cancelled} trial status check(s) didn't start within {timeout} seconds,"
+            " leaving those trials running to be checked while the optimization runs."
+        )
+    finally:
+        for future in futures:
+            future.cancel()
+        # checks that started change their trials, so they have to finish before the scheduler polls them
+        executor.shutdown(wait=True)
+    for future, trial in futures.items():
+        if not future.cancelled() and trial.index not in checked:
+            checked[trial.index] = True
+            _fail_failed_check(trial, future)
+    return checked
+
+
+def _fail_failed_check(trial, future):
+    if future.exception() is not None:
+        logger.warning(
+            f"Could not check the status of trial {trial.index}, marking it failed. Reason: {future.exception()!r}"
+        )
+        if trial.status.is_running:
+            trial.mark_failed()
+
+
+def scheduler_json_from_file(filepath: PathLike = "scheduler.json") -> Dict[str, Any]:
+    """Read the JSON serialization of a scheduler (see :func:`scheduler_to_json_snapshot`)
+    from a scheduler json file, with its journal replayed, or from a SQLite database,
+    without decoding any of it (see :func:`scheduler_from_json_file` for that)."""
+    if is_sqlite_file(filepath):
+        return sqlite_to_json_snapshot(filepath)
+    serialized, _ = read_snapshot(filepath)
+    if serialized.get("snapshot_id"):
+        replay_journal(serialized, journal_path(filepath))
+    return serialized
 
 
 def scheduler_to_json_snapshot(
@@ -95,11 +273,23 @@ def scheduler_to_json_snapshot(
     Returns:
         A JSON-safe dict representation of this `Scheduler`.
     """
+    return _scheduler_to_json(scheduler, encoder_registry, class_encoder_registry)
+
+
+def _scheduler_to_json(
+    scheduler: Scheduler,
+    encoder_registry: Optional[Dict[Type, Callable[[Any], Dict[str, Any]]]] = None,
+    class_encoder_registry: Optional[Dict[Type, Callable[[Any], Dict[str, Any]]]] = None,
+    trials: bool = True,
+) -> Dict[str, Any]:
+    """:func:`scheduler_to_json_snapshot`, or if ``trials`` is False, everything in it except for the
+    trials, data and generator runs (which are what grows with the number of trials)"""
     if encoder_registry is None:
         encoder_registry = CORE_ENCODER_REGISTRY
 
     if class_encoder_registry is None:
         class_encoder_registry = CORE_CLASS_ENCODER_REGISTRY
+    registries = dict(encoder_registry=encoder_registry, class_encoder_registry=class_encoder_registry)
 
     options = asdict(scheduler.options)
     options.pop("global_stopping_strategy", None)
@@ -116,19 +306,22 @@ def scheduler_to_json_snapshot(
         logger.error(e)
         wrapper_serialization = scheduler.experiment.runner.wrapper.to_dict()
 
-    gs = object_to_json(
-        scheduler.generation_strategy,
-        encoder_registry=encoder_registry,
-        class_encoder_registry=class_encoder_registry,
-    )
+    if trials:
+        experiment = object_to_json(scheduler.experiment, **registries)
+        gs = _object_to_json_without(scheduler.generation_strategy, ["experiment"], **registries)
+        # the generation strategy holds the same experiment, no need to serialize it twice
+        gs["experiment"] = (
+            experiment
+            if scheduler.generation_strategy._experiment is scheduler.experiment
+            else object_to_json(scheduler.generation_strategy._experiment, **registries)
+        )
+    else:
+        experiment = _object_to_json_without(scheduler.experiment, _JOURNALED_EXPERIMENT_FIELDS, **registries)
+        gs = _object_to_json_without(scheduler.generation_strategy, _JOURNALED_GS_FIELDS, **registries)
 
     serialization = {
         "_type": scheduler.__class__.__name__,
-        "experiment": object_to_json(
-            scheduler.experiment,
-            encoder_registry=encoder_registry,
-            class_encoder_registry=class_encoder_registry,
-        ),
+        "experiment": experiment,
         "generation_strategy": gs,
         "options": object_to_json(
             options,
@@ -152,6 +345,16 @@ def scheduler_to_json_snapshot(
     return serialization
 
 
+def _object_to_json_without(obj, exclude, **kwargs) -> Dict[str, Any]:
+    """``object_to_json(obj)``, without serializing the fields in ``exclude``"""
+    encoder_registry = kwargs.get("encoder_registry", CORE_ENCODER_REGISTRY)
+    if type(obj) not in encoder_registry:
+        serialized = object_to_json(obj, **kwargs)
+        return {key: value for key, value in serialized.items() if key not in exclude}
+    obj_dict = encoder_registry[type(obj)](obj)
+    return {key: object_to_json(value, **kwargs) for key, value in obj_dict.items() if key not in exclude}
+
+
 def scheduler_from_json_snapshot(
     serialized: Dict[str, Any],
     decoder_registry: Optional[Dict[str, Type]] = None,
@@ -185,11 +388,6 @@ def scheduler_from_json_snapshot(
     wrapper = None
     if "wrapper" in serialized:
         wrapper_dict = serialized.pop("wrapper", {})
-        config = object_from_json(
-            deepcopy(wrapper_dict["config"]),
-            decoder_registry=decoder_registry,
-            class_decoder_registry=class_decoder_registry,
-        )
         # sometimes the way people write their to_dict methods wrap it in a list
         if isinstance(wrapper_dict, list) and len(wrapper_dict) == 1:
             wrapper_dict = wrapper_dict[0]
@@ -202,7 +400,7 @@ def scheduler_from_json_snapshot(
 
         if exp_dir:
             exp_dir = object_from_json(
-                deepcopy(exp_dir),
+                _copy_json(exp_dir),
                 decoder_registry=decoder_registry,
                 class_decoder_registry=class_decoder_registry,
             )
@@ -224,11 +422,16 @@ def scheduler_from_json_snapshot(
 
         try:
             wrapper = object_from_json(
-                deepcopy(wrapper_dict),
+                _copy_json(wrapper_dict),
                 decoder_registry=decoder_registry,
                 class_decoder_registry=class_decoder_registry,
             )
         except Exception as e:  # pragma: no cover  # The only way to test this is to have a bad wrapper
+            config = object_from_json(
+                _copy_json(wrapper_dict["config"]),
+                decoder_registry=decoder_registry,
+                class_decoder_registry=class_decoder_registry,
+            )
             deserialized = recursive_deserialize(
                 wrapper_dict,
                 decoder_registry=decoder_registry,
@@ -269,6 +472,869 @@ def scheduler_from_json_snapshot(
     return scheduler
 
 
+def _copy_json(obj):
+    """copy of ``obj`` for :func:`object_from_json`, which pops the types out of the dicts it decodes.
+    Only the dicts and lists are copied, which is all JSON has to copy, unlike :func:`copy.deepcopy`
+
+    >>> obj = {"__type": "Path", "parts": ["a", "b"]}
+    >>> copied = _copy_json(obj)
+    >>> copied == obj and copied is not obj and copied["parts"] is not obj["parts"]
+    True
+    """
+    if isinstance(obj, dict):
+        return {key: _copy_json(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_copy_json(value) for value in obj]
+    return obj
+
+
+_JOURNALED_EXPERIMENT_FIELDS = ("trials", "data_by_trial")
+_JOURNALED_GS_FIELDS = ("generator_runs", "experiment")
+
+
+def write_snapshot(scheduler_filepath: PathLike, serialization: Dict[str, Any]) -> int:
+    """Atomically write the scheduler snapshot ``serialization`` to ``scheduler_filepath``,
+    compact encoded (see :func:`encode_snapshot`) and compressed by the file extension
+    (see :data:`COMPRESSION_SUFFIXES`).
+
+    Returns
+    -------
+    int
+        Size of the snapshot in bytes, before compression
+    """
+    content, size = _snapshot_bytes(scheduler_filepath, serialization)
+    write_file_atomic(pathlib.Path(scheduler_filepath), content)
+    return size
+
+
+def read_snapshot(scheduler_filepath: PathLike) -> Tuple[Dict[str, Any], int]:
+    """Read a scheduler snapshot, decompressing it by the file extension.
+
+    Snapshots written by :func:`write_snapshot` are decoded a line at a time: one top level entry,
+    or one trial (its data, or generator run) of the experiment (or generation strategy),
+    so the file is never held in memory in full next to what it decodes to.
+    Other scheduler json files (such as indented ones) are decoded in one go.
+
+    Returns
+    -------
+    tuple[dict, int]
+        The snapshot, and its size in bytes before compression
+    """
+    with _open_snapshot(scheduler_filepath) as file:
+        head = file.readline()
+        line = file.readline()
+        if head.rstrip() != "{" or not line.startswith('"'):
+            content = head + line + file.read()
+            return json_codec.loads(content), len(content)
+        serialized = {}
+        # the objects (and arrays) that are written an entry per line, from the outermost one
+        open_containers = [serialized]
+        size = len(head)
+        while open_containers:
+            if not line:
+                raise ValueError(f"Scheduler snapshot {scheduler_filepath} ends before its last entry")
+            size += len(line)
+            entry = line.rstrip()
+            entry = entry[:-1] if entry.endswith(",") else entry
+            if entry in ("}", "]"):
+                open_containers.pop()
+            else:
+                container = open_containers[-1]
+                if isinstance(container, dict):
+                    key, end = scanstring(entry, 1)
+                    entry = entry[end + 1 :]  # past the colon
+                # a line that only opens an object (or array) is followed by its entries
+                value = {} if entry == "{" else [] if entry == "[" else json_codec.loads(entry)
+                if isinstance(container, dict):
+                    container[key] = value
+                else:
+                    container.append(value)
+                if entry in ("{", "["):
+                    open_containers.append(value)
+            line = file.readline()
+        size += len(line) + len(file.read())
+    return serialized, size
+
+
+def encode_snapshot(serialization: Dict[str, Any]) -> bytes:
+    """Compact JSON encoding of a scheduler snapshot, one top level entry per line,
+    which :func:`read_snapshot` decodes a line at a time. The trials and data of the experiment,
+    and the generator runs of the generation strategy, which are most of a snapshot,
+    are written one per line as well (see :data:`_SNAPSHOT_LINES`).
+
+    The experiment of the generation strategy is left out if it is the experiment of the
+    scheduler, as the generation strategy is loaded with the experiment of the scheduler.
+
+    >>> print(encode_snapshot({"_type": "Scheduler", "options": {"max_pending_trials": 10}}).decode())
+    {
+    "_type":"Scheduler",
+    "options":{"max_pending_trials":10}
+    }
+    <BLANKLINE>
+    """
+    gs = serialization.get("generation_strategy")
+    if isinstance(gs, dict) and "experiment" in gs and gs["experiment"] is serialization.get("experiment"):
+        gs = {key: value for key, value in gs.items() if key != "experiment"}
+        serialization = {**serialization, "generation_strategy": gs}
+    return _encode_snapshot_lines(serialization, _SNAPSHOT_LINES) + b"\n"
+
+
+# the entries of a snapshot written an entry per line, by key, each with the entries
+# of its own that are written an entry per line (see :func:`encode_snapshot`)
+_SNAPSHOT_LINES = {
+    "experiment": {"trials": {}, "data_by_trial": {}},
+    "generation_strategy": {"generator_runs": {}},
+}
+
+
+def _encode_snapshot_lines(obj: Union[dict, list], lines: Dict[str, dict]) -> bytes:
+    """``obj`` encoded an entry per line, and so are the entries of it in ``lines``
+
+    >>> print(_encode_snapshot_lines({"a": {"b": [1, 2], "c": 3}, "d": {}}, {"a": {"b": {}}}).decode())
+    {
+    "a":{
+    "b":[
+    1,
+    2
+    ],
+    "c":3
+    },
+    "d":{}
+    }
+    """
+    if isinstance(obj, dict):
+        entries = []
+        for key, value in obj.items():
+            # keys that aren't strings are encoded the way json encodes them
+            key = key if isinstance(key, str) else json_codec.dumps(key).decode()
+            if key in lines and isinstance(value, (dict, list)) and value:
+                encoded = _encode_snapshot_lines(value, lines[key])
+            else:
+                encoded = json_codec.dumps(value)
+            entries.append(json_codec.dumps(key) + b":" + encoded)
+        brackets = b"{", b"}"
+    else:
+        entries = [json_codec.dumps(value) for value in obj]
+        brackets = b"[", b"]"
+    if not entries:
+        return brackets[0] + brackets[1]
+    return brackets[0] + b"\n" + b",\n".join(entries) + b"\n" + brackets[1]
+
+
+def snapshot_compression(scheduler_filepath: PathLike) -> Optional[str]:
+    """Compression of the scheduler json file ``scheduler_filepath``, by its extension
+
+    >>> snapshot_compression("exp_dir/scheduler.json.gz")
+    'gzip'
+    >>> snapshot_compression("exp_dir/scheduler.json") is None
+    True
+    """
+    return COMPRESSION_SUFFIXES.get(pathlib.Path(scheduler_filepath).suffix.lower())
+
+
+def _snapshot_bytes(scheduler_filepath: PathLike, serialization: Dict[str, Any]) -> Tuple[bytes, int]:
+    """the contents of the snapshot file, and the size of the snapshot before compression"""
+    content = encode_snapshot(serialization)
+    compression = snapshot_compression(scheduler_filepath)
+    if compression == "gzip":
+        return gzip.compress(content, compresslevel=6), len(content)
+    if compression == "zstd":
+        return _zstandard().ZstdCompressor().compress(content), len(content)
+    return content, len(content)
+
+
+def _open_snapshot(scheduler_filepath: PathLike):
+    compression = snapshot_compression(scheduler_filepath)
+    if compression == "gzip":
+        return gzip.open(scheduler_filepath, "rt", encoding="utf-8")
+    if compression == "zstd":
+        return _zstandard().open(scheduler_filepath, "rt", encoding="utf-8")
+    return open(scheduler_filepath, "r", encoding="utf-8")
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:  # pragma: no cover
+        raise ImportError("zstd compressed scheduler files need the zstandard package: pip install zstandard") from e
+    return zstandard
+
+
+def _uncompressed_path(scheduler_filepath: PathLike) -> pathlib.Path:
+    scheduler_filepath = pathlib.Path(scheduler_filepath)
+    return scheduler_filepath.with_suffix("") if snapshot_compression(scheduler_filepath) else scheduler_filepath
+
+
+def journal_path(scheduler_filepath: PathLike) -> pathlib.Path:
+    """Path of the journal of the scheduler json file ``scheduler_filepath``
+
+    >>> journal_path("exp_dir/scheduler.json").as_posix()
+    'exp_dir/scheduler.journal.jsonl'
+    >>> journal_path("exp_dir/scheduler.json.gz").as_posix()
+    'exp_dir/scheduler.journal.jsonl'
+    """
+    scheduler_filepath = _uncompressed_path(scheduler_filepath)
+    return scheduler_filepath.with_name(scheduler_filepath.stem + JOURNAL_SUFFIX)
+
+
+class SchedulerJournal:
+    """Checkpoints a :class:`.Scheduler` as a snapshot plus a journal of what changed since.
+
+    Rewriting the whole scheduler json file on every checkpoint costs more and more as
+    the number of trials grows. Instead, the first checkpoint writes a full snapshot
+    (the scheduler json file, see :func:`scheduler_to_json_snapshot`), and each later
+    checkpoint appends one line to the journal next to it (``scheduler.journal.jsonl``
+    for ``scheduler.json``) with only the trials, data and generator runs that are new or
+    changed since the last checkpoint (and the rest of the scheduler, if that changed).
+
+    Once the journal grows larger than ``compaction_ratio`` times the snapshot, the next
+    checkpoint compacts it: it writes a new full snapshot and starts a new, empty journal,
+    so the total checkpointing work grows linearly with the number of trials.
+    :func:`scheduler_from_json_file` replays the journal on top of the snapshot.
+
+    Only the trials that can have changed since the last checkpoint are looked at: the trials that
+    hadn't finished then, new trials, and the trials marked as changed with :meth:`mark_trials_changed`
+    (which :class:`.Scheduler` does for the trials Ax updates), so a checkpoint costs as much as those
+    trials, not all of them.
+
+    Everything is written from the background thread of :attr:`writer`, and serialized there,
+    from a copy of the scheduler (or of the trials that changed) taken at the checkpoint.
+    If a write fails, the next checkpoint
+    (or :meth:`flush`) raises its error, and the checkpoint after that starts over
+    with a full snapshot, as what failed to be written may be lost.
+
+    Parameters
+    ----------
+    compaction_ratio
+        How large the journal can grow, relative to the snapshot, before it is compacted
+    """
+
+    def __init__(self, compaction_ratio: float = JOURNAL_COMPACTION_RATIO):
+        self.compaction_ratio = compaction_ratio
+        self.writer = CheckpointWriter()
+        self.results: Optional[ResultsStore] = None
+        self._reset()
+
+    def _reset(self):
+        """forget what was checkpointed, so the next checkpoint starts from scratch"""
+        self.snapshot_path: Optional[pathlib.Path] = None
+        self.snapshot_id: Optional[str] = None
+        self.snapshot_size = 0
+        self.journal_size = 0
+        #: Indices of the trials that were new or changed at the last checkpoint
+        self.changed_trials: Set[int] = set()
+        self._trial_fingerprints: Dict[int, tuple] = {}
+        self._data: Dict[int, Dict[int, Any]] = {}
+        # trials that hadn't finished at the last checkpoint, the only ones (with new trials) that change by themselves
+        self._open_trials: Set[int] = set()
+        self._n_trials = 0
+        self._marked_trials: Set[int] = set()
+        self._n_generator_runs = 0
+        self._header_fingerprint: Optional[tuple] = None
+        self._header: Optional[bytes] = None
+
+    @property
+    def path(self) -> Optional[pathlib.Path]:
+        """Path of the journal file, None before the first checkpoint"""
+        return journal_path(self.snapshot_path) if self.snapshot_path else None
+
+    def mark_trials_changed(self, trial_indices: Iterable[int]):
+        """Have the next checkpoint look at the trials ``trial_indices`` for changes.
+
+        Trials that haven't finished are always looked at, this is for the trials
+        that are changed after they finished (such as data attached to them later).
+        """
+        self._marked_trials.update(trial_indices)
+
+    def checkpoint(self, scheduler: Scheduler, scheduler_filepath: PathLike, compact: bool = False) -> bool:
+        """Checkpoint ``scheduler`` to ``scheduler_filepath`` and its journal.
+
+        Parameters
+        ----------
+        scheduler
+            Scheduler to checkpoint
+        scheduler_filepath
+            Path of the scheduler json file (the snapshot)
+        compact
+            Write a full snapshot, even if the journal hasn't grown large enough to be compacted
+
+        Returns
+        -------
+        bool
+            Whether a full snapshot was written
+        """
+        scheduler_filepath = pathlib.Path(os.path.abspath(scheduler_filepath))
+        with self._start_over_on_write_error():
+            self.writer.raise_error()
+            if (
+                compact
+                or self.snapshot_id is None
+                or scheduler_filepath != self.snapshot_path
+                # the size of a snapshot that is still being written isn't known yet
+                or (self.snapshot_size is not None and self.journal_size > self.compaction_ratio * self.snapshot_size)
+            ):
+                self.compact(scheduler, scheduler_filepath)
+                return True
+            changes, state = self._journal_record(scheduler)
+            if changes:
+                path = self.path
+                snapshot_id = self.snapshot_id
+
+                def produce() -> bytes:
+                    return json_codec.dumps(_serialize_journal_record(snapshot_id, changes)) + b"\n"
+
+                self.writer.append(path, produce, self._journaled(path))
+            self._update_state(**state)
+            return False
+
+    def flush(self):
+        """Wait for the checkpoints to be written, raising the error of one that failed
+        (see :meth:`.CheckpointWriter.flush`)"""
+        with self._start_over_on_write_error():
+            self.writer.flush()
+
+    @contextlib.contextmanager
+    def _start_over_on_write_error(self):
+        """forget what was checkpointed if a write failed, so the next checkpoint starts over from scratch"""
+        try:
+            yield
+        except RuntimeError:
+            self._reset()
+            self.results = None
+            raise
+
+    def _journaled(self, path: pathlib.Path) -> Callable[[int], None]:
+        def on_done(size: int):
+            self.journal_size += size
+            logger.info(f"Journaled checkpoint of optimization to `{path}`.")
+
+        return on_done
+
+    def compact(self, scheduler: Scheduler, scheduler_filepath: PathLike):
+        """Write a full snapshot of ``scheduler`` to ``scheduler_filepath`` and start a new, empty journal"""
+        scheduler_filepath = pathlib.Path(os.path.abspath(scheduler_filepath))
+        snapshot_id = uuid.uuid4().hex
+        snapshot = _scheduler_snapshot_copy(scheduler)
+        size = 0
+
+        def produce() -> bytes:
+            nonlocal size
+            serialization = scheduler_to_json_snapshot(snapshot)
+            serialization["snapshot_id"] = snapshot_id
+            content, size = _snapshot_bytes(scheduler_filepath, serialization)
+            return content
+
+        def on_snapshot_done(_):
+            # compaction is decided by the sizes before compression, the journal isn't compressed
+            self.snapshot_size = size
+            logger.info(
+                f"Saved JSON-serialized state of optimization to `{scheduler_filepath}`."
+                f"\nBoa version: {__version__}"
+            )
+
+        def on_journal_done(size: int):
+            self.journal_size = size
+
+        # resumed before the writes are queued, so the size set once the snapshot is written isn't overwritten
+        self.resume(scheduler, scheduler_filepath, snapshot_id, None, 0)
+        # serialized and encoded on the writer thread, from the copy of the scheduler taken now
+        self.writer.replace(scheduler_filepath, produce, on_snapshot_done)
+        # records of the old journal have the old snapshot id, so even if this is interrupted
+        # before the journal is cleared, they won't be replayed on top of the new snapshot
+        self.writer.replace(journal_path(scheduler_filepath), lambda: b"", on_journal_done)
+
+    def resume(
+        self,
+        scheduler: Scheduler,
+        scheduler_filepath: PathLike,
+        snapshot_id: str,
+        snapshot_size: Optional[int],
+        journal_size: int,
+    ):
+        """Continue journaling to the snapshot ``snapshot_id`` at ``scheduler_filepath``,
+        whose snapshot and journal ``scheduler`` is in the state of
+        (``snapshot_size`` is None while the snapshot is still being written)"""
+        self.snapshot_path = pathlib.Path(os.path.abspath(scheduler_filepath))
+        self.snapshot_id = snapshot_id
+        self.snapshot_size = snapshot_size
+        self.journal_size = journal_size
+        self._forget_trials()
+        _, state = self._journal_record(scheduler)
+        self._update_state(**state)
+
+    def _forget_trials(self):
+        """look at every trial at the next checkpoint (as when starting from a new snapshot)"""
+        self._trial_fingerprints = {}
+        self._data = {}
+        self._open_trials = set()
+        self._n_trials = 0
+
+    def _trials_to_check(self, experiment: Experiment) -> Set[int]:
+        """the trials that can have changed since the last checkpoint"""
+        return self._open_trials | self._marked_trials | set(range(self._n_trials, len(experiment.trials)))
+
+    def _journal_record(self, scheduler: Scheduler) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """what changed since the last checkpoint (empty if nothing did), for :func:`_serialize_journal_record`
+        to serialize on the writer thread, and the state to keep track of once it is written"""
+        experiment = scheduler.experiment
+        changes = {}
+
+        trial_fingerprints = {}
+        data = {}
+        changed_trials = {}
+        changed_data = {}
+        for index in self._trials_to_check(experiment):
+            trial = experiment.trials.get(index)
+            if trial is None:
+                continue
+            trial_fingerprints[index] = _trial_fingerprint(trial)
+            if self._trial_fingerprints.get(index) != trial_fingerprints[index]:
+                # a copy, so the trial can go on changing while it is serialized
+                changed_trials[index] = _copy_attributes(trial)
+            data[index] = dict(experiment.data_by_trial.get(index, {}))
+            known_data = self._data.get(index, {})
+            new_data = [(ts, d) for ts, d in data[index].items() if known_data.get(ts) is not d]
+            if new_data:
+                changed_data[index] = new_data
+
+        generator_runs = scheduler.generation_strategy._generator_runs
+        new_generator_runs = generator_runs[self._n_generator_runs :]
+
+        header_fingerprint = _header_fingerprint(scheduler)
+        header = self._header
+        if header is None or header_fingerprint != self._header_fingerprint:
+            header = json_codec.dumps(_scheduler_to_json(scheduler, trials=False), sort_keys=True)
+
+        if changed_trials:
+            changes["trials"] = changed_trials
+        if changed_data:
+            changes["data_by_trial"] = changed_data
+        if new_generator_runs:
+            changes["generator_runs"] = {"start": self._n_generator_runs, "value": list(new_generator_runs)}
+        if header != self._header:
+            changes["header"] = header
+
+        state = dict(
+            trial_fingerprints=trial_fingerprints,
+            data=data,
+            open_trials={index for index in trial_fingerprints if not experiment.trials[index].status.is_terminal},
+            n_trials=len(experiment.trials),
+            changed_trials=set(changed_trials) | set(changed_data),
+            n_generator_runs=len(generator_runs),
+            header_fingerprint=header_fingerprint,
+            header=header,
+        )
+        return changes, state
+
+    def _update_state(
+        self,
+        trial_fingerprints,
+        data,
+        open_trials,
+        n_trials,
+        changed_trials,
+        n_generator_runs,
+        header_fingerprint,
+        header,
+    ):
+        self._trial_fingerprints.update(trial_fingerprints)
+        self._data.update(data)
+        self._open_trials = open_trials
+        self._n_trials = n_trials
+        self._marked_trials = set()
+        self.changed_trials = changed_trials
+        self._n_generator_runs = n_generator_runs
+        self._header_fingerprint = header_fingerprint
+        self._header = header
+
+
+def _serialize_journal_record(snapshot_id: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """the journal record of ``changes`` (see :meth:`SchedulerJournal._journal_record`)"""
+    record = {"snapshot": snapshot_id}
+    if "trials" in changes:
+        record["trials"] = object_to_json(changes["trials"])
+    if "data_by_trial" in changes:
+        record["data_by_trial"] = object_to_json(changes["data_by_trial"])
+    if "generator_runs" in changes:
+        generator_runs = changes["generator_runs"]
+        record["generator_runs"] = {"start": generator_runs["start"], "value": object_to_json(generator_runs["value"])}
+    if "header" in changes:
+        record["header"] = json_codec.loads(changes["header"])
+    return record
+
+
+class SQLiteSchedulerStore(SchedulerJournal):
+    """Checkpoints a :class:`.Scheduler` to a SQLite database instead of a json file.
+
+    Set ``storage: sqlite`` in :class:`.BOAScriptOptions` to use it. The database is
+    written next to where the scheduler json file would be, with a ``.sqlite`` suffix
+    (``scheduler.sqlite``), and each checkpoint only writes the trials, data and generator
+    runs that are new or changed since the last one, in a single transaction.
+
+    The database is in WAL mode, so it can be read (with :func:`connect_sqlite_readonly`,
+    :func:`sqlite_trials` and :func:`sqlite_results`) while the optimization is writing to it,
+    and it can be loaded back with :func:`scheduler_from_json_file` like a scheduler json file.
+    It has these tables:
+
+    * ``header``: the json serialization of everything but the trials, data and generator runs
+    * ``trials``: ``trial_index``, ``status`` (indexed) and ``json`` of each trial
+    * ``data``: ``trial_index``, ``timestamp`` and ``json`` of the data attached to each trial
+    * ``results``: ``trial_index``, ``timestamp``, ``arm_name``, ``metric_name`` (indexed),
+      ``mean`` and ``sem`` of each row of the data
+    * ``generator_runs``: ``position`` and ``json`` of the generator runs of the generation strategy
+    """
+
+    def __init__(self):
+        super().__init__(compaction_ratio=float("inf"))
+
+    @property
+    def path(self) -> Optional[pathlib.Path]:
+        """Path of the database, None before the first checkpoint"""
+        return self.snapshot_path
+
+    def checkpoint(self, scheduler: Scheduler, scheduler_filepath: PathLike, compact: bool = False) -> bool:
+        """Write what changed in ``scheduler`` since the last checkpoint to the database next to
+        ``scheduler_filepath`` (see :func:`sqlite_path`).
+
+        Returns
+        -------
+        bool
+            ``compact``, there is nothing to compact in the database, but the caller can
+            still use it to only write out other files (the optimization csv) now and then
+        """
+        path = sqlite_path(scheduler_filepath)
+        with self._start_over_on_write_error():
+            self.writer.raise_error()
+            if path != self.snapshot_path:
+                # a new database, or one written by another optimization, so start from scratch
+                self._reset()
+                self.snapshot_path = path
+            changes, state = self._journal_record(scheduler)
+            if changes:
+                clear = self.snapshot_id is None
+
+                def write():
+                    # serialized from the copies of the trials that changed, taken at the checkpoint
+                    record = _serialize_journal_record(path.name, changes)
+                    statuses, results = _sqlite_record_rows(changes)
+                    conn = _connect_sqlite(path)
+                    try:
+                        with conn:  # one transaction, so readers never see half a checkpoint
+                            if clear:
+                                for table in _SQLITE_TABLES:
+                                    conn.execute(f"DELETE FROM {table}")
+                            _write_sqlite_record(conn, record, statuses, results)
+                    finally:
+                        conn.close()
+                    logger.info(f"Saved changes to the state of optimization to `{path}`.")
+
+                self.writer.call(write)
+            self.snapshot_id = path.name
+            self._update_state(**state)
+            return compact
+
+    def compact(self, scheduler: Scheduler, scheduler_filepath: PathLike):
+        """Write all of ``scheduler`` to the database next to ``scheduler_filepath``, replacing what is in it"""
+        self._reset()
+        self.checkpoint(scheduler, scheduler_filepath)
+
+    def resume(self, scheduler: Scheduler, scheduler_filepath: PathLike, *args):
+        """Continue writing to the database of ``scheduler_filepath``, which ``scheduler`` was loaded from"""
+        self.snapshot_path = sqlite_path(scheduler_filepath)
+        self.snapshot_id = self.snapshot_path.name
+        self._forget_trials()
+        _, state = self._journal_record(scheduler)
+        self._update_state(**state)
+
+
+_SQLITE_TABLES = ("header", "trials", "data", "results", "generator_runs")
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS header (id INTEGER PRIMARY KEY CHECK (id = 0), json TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS trials (trial_index INTEGER PRIMARY KEY, status TEXT NOT NULL, json TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS trials_status ON trials (status);
+CREATE TABLE IF NOT EXISTS data (
+    trial_index INTEGER NOT NULL, timestamp INTEGER NOT NULL, json TEXT NOT NULL, PRIMARY KEY (trial_index, timestamp)
+);
+CREATE TABLE IF NOT EXISTS results (
+    trial_index INTEGER NOT NULL, timestamp INTEGER NOT NULL, arm_name TEXT, metric_name TEXT, mean REAL, sem REAL
+);
+CREATE INDEX IF NOT EXISTS results_trial ON results (trial_index, timestamp);
+CREATE INDEX IF NOT EXISTS results_metric ON results (metric_name, mean);
+CREATE TABLE IF NOT EXISTS generator_runs (position INTEGER PRIMARY KEY, json TEXT NOT NULL);
+"""
+
+
+def sqlite_path(scheduler_filepath: PathLike) -> pathlib.Path:
+    """Path of the database :class:`SQLiteSchedulerStore` writes instead of ``scheduler_filepath``
+
+    >>> sqlite_path("exp_dir/scheduler.json").as_posix().endswith("exp_dir/scheduler.sqlite")
+    True
+    """
+    return _uncompressed_path(os.path.abspath(scheduler_filepath)).with_suffix(SQLITE_SUFFIX)
+
+
+def is_sqlite_file(path: PathLike) -> bool:
+    """Whether ``path`` is a SQLite database"""
+    try:
+        with open(path, "rb") as file:
+            return file.read(16) == b"SQLite format 3\x00"
+    except OSError:
+        return False
+
+
+def connect_sqlite_readonly(path: PathLike) -> sqlite3.Connection:
+    """Open a read only connection to a database written by :class:`SQLiteSchedulerStore`,
+    which can be used while the optimization is writing to it"""
+    return sqlite3.connect(f"{pathlib.Path(path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def sqlite_trials(path: PathLike, status: Optional[str] = None) -> pd.DataFrame:
+    """Index and status of the trials in a database written by :class:`SQLiteSchedulerStore`
+
+    Parameters
+    ----------
+    path
+        Path of the database
+    status
+        Only return trials with this status (``COMPLETED``, ``RUNNING``, etc.)
+    """
+    query, params = "SELECT trial_index, status FROM trials", ()
+    if status is not None:
+        query, params = f"{query} WHERE status = ?", (str(status).upper(),)
+    conn = connect_sqlite_readonly(path)
+    try:
+        return pd.read_sql_query(f"{query} ORDER BY trial_index", conn, params=params)
+    finally:
+        conn.close()
+
+
+def sqlite_results(path: PathLike, metric_name: Optional[str] = None) -> pd.DataFrame:
+    """Results (trial index, arm name, metric name, mean and sem) of the latest data of each trial
+    in a database written by :class:`SQLiteSchedulerStore`
+
+    Parameters
+    ----------
+    path
+        Path of the database
+    metric_name
+        Only return results of this metric
+    """
+    query = (
+        "SELECT results.trial_index, arm_name, metric_name, mean, sem FROM results"
+        " JOIN (SELECT trial_index, MAX(timestamp) AS timestamp FROM data GROUP BY trial_index) AS latest"
+        " ON results.trial_index = latest.trial_index AND results.timestamp = latest.timestamp"
+    )
+    params = ()
+    if metric_name is not None:
+        query, params = f"{query} WHERE metric_name = ?", (metric_name,)
+    conn = connect_sqlite_readonly(path)
+    try:
+        return pd.read_sql_query(f"{query} ORDER BY results.trial_index, arm_name", conn, params=params)
+    finally:
+        conn.close()
+
+
+def sqlite_to_json_snapshot(path: PathLike) -> Dict[str, Any]:
+    """Read a database written by :class:`SQLiteSchedulerStore` back into the same
+    json serialization :func:`scheduler_to_json_snapshot` makes"""
+    conn = connect_sqlite_readonly(path)
+    try:
+        (header,) = conn.execute("SELECT json FROM header").fetchone()
+        serialized = json_codec.loads(header)
+        experiment = serialized["experiment"]
+        experiment["trials"] = {
+            str(index): json_codec.loads(trial) for index, trial in conn.execute("SELECT trial_index, json FROM trials")
+        }
+        data_by_trial = {}
+        for index, ts, data in conn.execute("SELECT trial_index, timestamp, json FROM data ORDER BY timestamp"):
+            data_by_trial.setdefault(str(index), {"__type": "OrderedDict", "value": []})["value"].append(
+                [ts, json_codec.loads(data)]
+            )
+        experiment["data_by_trial"] = data_by_trial
+        serialized["generation_strategy"]["generator_runs"] = [
+            json_codec.loads(run) for (run,) in conn.execute("SELECT json FROM generator_runs ORDER BY position")
+        ]
+    finally:
+        conn.close()
+    return serialized
+
+
+def _connect_sqlite(path: pathlib.Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    # readers don't block the writer, and the writer doesn't block readers
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SQLITE_SCHEMA)
+    return conn
+
+
+def _sqlite_record_rows(changes: Dict[str, Any]) -> Tuple[Dict[int, str], Dict[Tuple[int, int], list]]:
+    """the trial statuses and result rows of ``changes`` (see :meth:`SchedulerJournal._journal_record`)"""
+    statuses = {index: trial.status.name for index, trial in changes.get("trials", {}).items()}
+    results = {}
+    for index, entries in changes.get("data_by_trial", {}).items():
+        for ts, data in entries:
+            df = data.df
+            results[(index, ts)] = [
+                (index, ts, row.arm_name, row.metric_name, _sql_float(row.mean), _sql_float(row.sem))
+                for row in df.itertuples()
+            ]
+    return statuses, results
+
+
+def _write_sqlite_record(
+    conn: sqlite3.Connection,
+    record: Dict[str, Any],
+    statuses: Dict[int, str],
+    results: Dict[Tuple[int, int], list],
+):
+    if "header" in record:
+        conn.execute("INSERT OR REPLACE INTO header VALUES (0, ?)", (_sql_json(record["header"]),))
+    conn.executemany(
+        "INSERT OR REPLACE INTO trials VALUES (?, ?, ?)",
+        [(index, statuses[index], _sql_json(trial)) for index, trial in record.get("trials", {}).items()],
+    )
+    for index, entries in record.get("data_by_trial", {}).items():
+        for ts, data in entries:
+            conn.execute("INSERT OR REPLACE INTO data VALUES (?, ?, ?)", (index, ts, _sql_json(data)))
+            conn.execute("DELETE FROM results WHERE trial_index = ? AND timestamp = ?", (index, ts))
+            conn.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)", results[(index, ts)])
+    generator_runs = record.get("generator_runs")
+    if generator_runs:
+        conn.executemany(
+            "INSERT OR REPLACE INTO generator_runs VALUES (?, ?)",
+            [(generator_runs["start"] + i, _sql_json(run)) for i, run in enumerate(generator_runs["value"])],
+        )
+
+
+def _sql_json(obj) -> str:
+    # stored as text, so SQLite's JSON functions can query it
+    return json_codec.dumps(obj).decode()
+
+
+def _sql_float(value) -> Optional[float]:
+    return None if pd.isna(value) else float(value)
+
+
+def _trial_fingerprint(trial) -> tuple:
+    """what changes about a trial, so that it is only journaled when it changed"""
+    if not trial.status.is_terminal:
+        # trials that haven't finished are few, but still have their metadata filled in as they run
+        return trial.status, trial.time_run_started, len(trial.arms), repr(trial.run_metadata)
+    return trial.status, trial.time_completed, len(trial.run_metadata), len(trial.stop_metadata)
+
+
+def _header_fingerprint(scheduler: Scheduler) -> tuple:
+    """what changes about the rest of the scheduler (see :func:`_scheduler_to_json` with ``trials=False``)
+    when it is replaced, rather than updated in place, so the header is only serialized when it changed"""
+    experiment = scheduler.experiment
+    gs = scheduler.generation_strategy
+    wrapper = getattr(experiment.runner, "wrapper", None)
+    return (
+        experiment.name,
+        experiment.description,
+        experiment.is_test,
+        id(experiment.search_space),
+        id(experiment.optimization_config),
+        id(experiment.runner),
+        id(experiment.status_quo),
+        tuple(experiment.metrics),
+        repr(experiment._properties),
+        gs.current_step.index,
+        gs.model is not None,
+        id(scheduler.options),
+        str(scheduler.scheduler_filepath),
+        str(scheduler.opt_csv),
+        id(wrapper),
+        id(getattr(wrapper, "config", None)),
+    )
+
+
+def _scheduler_snapshot_copy(scheduler: Scheduler) -> Scheduler:
+    """a copy of ``scheduler`` to serialize on another thread while the optimization goes on,
+    with its own copies of what checkpoints change (the trials, their data and the generator runs),
+    sharing everything else"""
+    experiment = _experiment_snapshot_copy(scheduler.experiment)
+    gs = scheduler.generation_strategy
+    gs = _copy_attributes(gs, _experiment=experiment if gs._experiment is scheduler.experiment else gs._experiment)
+    return _copy_attributes(scheduler, experiment=experiment, generation_strategy=gs)
+
+
+def _experiment_snapshot_copy(experiment: Experiment) -> Experiment:
+    """a copy of ``experiment`` with its own copies of the trials and their data,
+    see :func:`_scheduler_snapshot_copy`"""
+    copied = _copy_attributes(experiment)
+    copied._trials = {index: _copy_attributes(trial, _experiment=copied) for index, trial in experiment.trials.items()}
+    copied._data_by_trial = {index: OrderedDict(data) for index, data in experiment.data_by_trial.items()}
+    return copied
+
+
+def _copy_attributes(obj, **attributes):
+    """a copy of ``obj`` with ``attributes`` replaced, sharing the values of its other attributes,
+    except for dicts, lists and sets, which are copied so that adding to them doesn't change the copy"""
+    copied = object.__new__(type(obj))
+    for name, value in vars(obj).items():
+        copied.__dict__[name] = copy.copy(value) if isinstance(value, (dict, list, set)) else value
+    copied.__dict__.update(attributes)
+    return copied
+
+
+def replay_journal(serialized: Dict[str, Any], path: PathLike) -> int:
+    """Apply the records of the journal at ``path`` that belong to the snapshot
+    ``serialized`` (see :class:`SchedulerJournal`) to it, in place.
+
+    A partially written last record (from the optimization being killed mid checkpoint)
+    is ignored.
+
+    Returns
+    -------
+    int
+        Size of the journal in bytes (0 if there is none)
+    """
+    path = pathlib.Path(path)
+    if not path.exists():
+        return 0
+    n_records = 0
+    size = 0
+    with open(path, "rb") as file:
+        # a record at a time, the journal is never held in memory in full
+        for line in file:
+            size += len(line)
+            try:
+                record = json_codec.loads(line)
+            except ValueError:
+                logger.warning(f"Ignoring incomplete record at the end of journal `{path}`.")
+                break
+            if record.get("snapshot") != serialized.get("snapshot_id"):
+                continue
+            _apply_journal_record(serialized, record)
+            n_records += 1
+    if n_records:
+        logger.info(f"Replayed {n_records} checkpoint(s) from journal `{path}`.")
+    return size
+
+
+def _apply_journal_record(serialized: Dict[str, Any], record: Dict[str, Any]):
+    header = dict(record.get("header", {}))
+    if header:
+        serialized["experiment"].update(header.pop("experiment"))
+        serialized["generation_strategy"].update(header.pop("generation_strategy"))
+        serialized.update(header)
+
+    experiment = serialized["experiment"]
+    experiment["trials"].update(record.get("trials", {}))
+    for index, entries in record.get("data_by_trial", {}).items():
+        data_by_ts = experiment["data_by_trial"].setdefault(index, {"__type": "OrderedDict", "value": []})
+        values = dict(data_by_ts["value"])
+        values.update(entries)
+        data_by_ts["value"] = [[ts, data] for ts, data in values.items()]
+
+    generator_runs = record.get("generator_runs")
+    if generator_runs:
+        start = generator_runs["start"]
+        runs = serialized["generation_strategy"]["generator_runs"]
+        runs[start : start + len(generator_runs["value"])] = generator_runs["value"]
+
+
 def recursive_deserialize(obj, **kwargs):
     if isinstance(obj, dict):
         try:
@@ -290,26 +1356,100 @@ def exp_opt_to_csv(
     ax_kwargs: Optional[Dict[str, Any]] = None,
     **kwargs,
 ) -> pathlib.Path:
-    ax_kwargs = ax_kwargs or {}
     if dir_:
         opt_filepath = pathlib.Path(dir_) / opt_filepath
-    df = exp_to_df(experiment, **ax_kwargs)
-    metrics = list(experiment.metrics.keys())
-    isin = df.columns.isin(metrics).sum() == len(metrics)
-    if metrics_to_end and isin:
-        df = df[[col for col in df.columns if col not in metrics] + metrics]
+    df = _exp_opt_df(experiment, metrics_to_end=metrics_to_end, ax_kwargs=ax_kwargs)
     kwargs.setdefault("na_rep", "NA")
     df.to_csv(path_or_buf=opt_filepath, index=False, **kwargs)
     logger.info(f"Saved optimization parametrization and objective to `{opt_filepath}`.")
     return opt_filepath
 
 
+def _exp_opt_df(
+    experiment: Experiment, metrics_to_end: bool = False, ax_kwargs: Optional[Dict[str, Any]] = None
+) -> pd.DataFrame:
+    df = exp_to_df(experiment, **(ax_kwargs or {}))
+    metrics = list(experiment.metrics.keys())
+    isin = df.columns.isin(metrics).sum() == len(metrics)
+    if metrics_to_end and isin:
+        df = df[[col for col in df.columns if col not in metrics] + metrics]
+    return df
+
+
 def scheduler_opt_to_csv(scheduler: Scheduler, **kwargs):
     opt_csv = exp_opt_to_csv(scheduler.experiment, **kwargs)
     scheduler.opt_csv = opt_csv
     return opt_csv
 
 
-def dump_scheduler_data(scheduler, scheduler_filepath, opt_filepath, **kwargs):
-    scheduler_opt_to_csv(scheduler, opt_filepath=opt_filepath, **kwargs)
-    scheduler_to_json_file(scheduler, scheduler_filepath=scheduler_filepath, **kwargs)
+def dump_scheduler_data(
+    scheduler,
+    scheduler_filepath,
+    opt_filepath,
+    compact: bool = False,
+    wait: bool = True,
+    *,
+    write_csv: bool = False,
+    metrics_to_end: bool = False,
+    ax_kwargs: Optional[Dict[str, Any]] = None,
+    **kwargs,
+):
+    """Checkpoint ``scheduler`` through its :class:`SchedulerJournal`.
+
+    The optimization csv is only rewritten when a full snapshot is written
+    (on compaction of the journal, or when ``compact`` is True), or when ``write_csv`` is True,
+    while the rows of trials that changed are appended to the columnar results store next to it
+    on every checkpoint, if ``pyarrow`` is installed (see :mod:`boa.results_store`).
+    To read the trials of a running optimization, read the results store (see :func:`.read_results`)
+    instead of the optimization csv.
+
+    The state of the scheduler is captured right away (as a copy, see :class:`SchedulerJournal`),
+    and then serialized and written out from the background thread of the journal's
+    :class:`.CheckpointWriter`. If ``wait`` is True (the default), this waits for the files
+    to be written, otherwise they are written while the caller moves on
+    (use ``scheduler.flush_data()`` to wait for them later). Either way, the error of
+    a write that failed is raised by the next checkpoint, or once waited for.
+    """
+    dir_ = kwargs.pop("dir_", None)
+    if dir_:
+        scheduler_filepath = pathlib.Path(dir_) / scheduler_filepath
+        opt_filepath = pathlib.Path(dir_) / opt_filepath
+    journal = scheduler.journal
+    scheduler.opt_csv = opt_filepath  # before the checkpoint, so what is checkpointed has it
+    full_snapshot = journal.checkpoint(scheduler, scheduler_filepath, compact=compact)
+    experiment = None
+    if full_snapshot or write_csv:
+        experiment = _experiment_snapshot_copy(scheduler.experiment)
+        kwargs.setdefault("na_rep", "NA")
+
+        def produce() -> bytes:
+            df = _exp_opt_df(experiment, metrics_to_end=metrics_to_end, ax_kwargs=ax_kwargs)
+            return df.to_csv(index=False, **kwargs).encode()
+
+        def on_done(size: int):
+            logger.info(f"Saved optimization parametrization and objective to `{opt_filepath}`.")
+
+        with journal._start_over_on_write_error():
+            journal.writer.replace(os.path.abspath(opt_filepath), produce, on_done)
+    if has_pyarrow():
+        results_path = results_store_path(os.path.abspath(opt_filepath))
+        new_store = journal.results is None or journal.results.path != results_path
+        if new_store:
+            journal.results = ResultsStore(results_path)
+        store = journal.results
+        if full_snapshot or new_store:
+            # the rows of every trial, made on the writer thread from a copy of the experiment
+            experiment = experiment or _experiment_snapshot_copy(scheduler.experiment)
+
+            def rewrite():
+                store.rewrite(trial_rows(experiment, experiment.trials))
+
+            with journal._start_over_on_write_error():
+                journal.writer.call(rewrite)
+        else:
+            rows = trial_rows(scheduler.experiment, journal.changed_trials)
+            if rows:
+                with journal._start_over_on_write_error():
+                    journal.writer.call(partial(store.append, rows))
+    if wait:
+        journal.flush()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import importlib
 import pathlib
 from typing import Optional
@@ -7,6 +8,9 @@ from typing import Optional
 import jinja2
 from attrs import asdict, define
 
+#: Most compiled templates kept around by :func:`compile_template`
+TEMPLATE_CACHE_SIZE = 1024
+
 
 @define
 class JinjaTemplateVars:
@@ -60,6 +64,9 @@ def render_template(source: str, template_kw: Optional[dict] = None, **kwargs):
     """
     Render a template from a path.
 
+    Templates are compiled once per source text and set of ``template_kw`` options, and
+    the compiled templates are reused on later calls (see :func:`compile_template`).
+
     Parameters
     ----------
     path : str
@@ -69,12 +76,45 @@ def render_template(source: str, template_kw: Optional[dict] = None, **kwargs):
     **kwargs
         Keyword arguments to pass to the template as variables to render.
     """
-    template_kw = template_kw if template_kw is not None else {}
-    template_kw.setdefault("extensions", []).append("jinja2.ext.do")
-    if "undefined" not in template_kw:
-        template_kw["undefined"] = jinja2.DebugUndefined
-    kwargs["load_py"] = importlib.import_module
-    template = jinja2.Template(source, **template_kw)
+    template = compile_template(source, template_kw)
     return template.render(
         **kwargs,
     )
+
+
+def compile_template(source: str, template_kw: Optional[dict] = None) -> jinja2.Template:
+    """
+    Compile a template, reusing the compiled template if the same source text was
+    compiled with the same ``template_kw`` options before.
+
+    The ``jinja2.ext.do`` extension is always added, ``undefined`` defaults to
+    :class:`jinja2.DebugUndefined`, and ``load_py`` (:func:`importlib.import_module`)
+    is available as a global.
+
+    Parameters
+    ----------
+    source : str
+        The template source text.
+    template_kw : dict, optional
+        Dictionary of keyword arguments to pass to the jinja2.Template constructor.
+    """
+    template_kw = dict(template_kw) if template_kw is not None else {}
+    template_kw["extensions"] = tuple(dict.fromkeys([*template_kw.get("extensions", []), "jinja2.ext.do"]))
+    template_kw.setdefault("undefined", jinja2.DebugUndefined)
+    options = tuple(sorted(template_kw.items()))
+    try:
+        return _compile_template(source, options)
+    except TypeError:  # unhashable options can't be cached
+        return _get_environment.__wrapped__(options).from_string(source)
+
+
+@functools.lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def _compile_template(source: str, options: tuple) -> jinja2.Template:
+    return _get_environment(options).from_string(source)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_environment(options: tuple) -> jinja2.Environment:
+    environment = jinja2.Environment(**dict(options))
+    environment.globals["load_py"] = importlib.import_module
+    return environment
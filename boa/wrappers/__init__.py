@@ -46,10 +46,16 @@ to the following sections
         write_configs: whatever your write_configs run command is  # only include `write_configs` if you are using a `Write Configs Script`
         run_model: whatever your run_model run command is
         set_trial_status: whatever your set_trial_status run command is  # only include `set_trial_status` if you are using a `Set Trial Status Script`
+        # or, to check the status of all running trials with one command per poll instead of one per trial
+        # set_trial_statuses: whatever your set_trial_statuses run command is
         fetch_trial_data: whatever your fetch_trial_data run command is  # only include `fetch_trial_data` if you are using a `Fetch Trial Data Script`
 
+If starting your scripts is slow (loading an interpreter, importing libraries, etc.), you can
+have BOA start them once and send them each trial instead, with ``server_mode`` in ``script_options``.
+See :mod:`boa.wrappers.script_server` for how that works and for helpers that set it up for you.
+
 For examples on the formatting of the json files you will output back to BOA, see :meth:`.ScriptWrapper.fetch_trial_data`
-and :meth:`.ScriptWrapper.set_trial_status`
+and :meth:`.ScriptWrapper.set_trial_status` (or :meth:`.ScriptWrapper.set_trial_statuses`)
 
 Here is an example of a `Run Model Script` that handles setting the trial status and outputting
 the data back to BOA as well. So this script is all that is needed (other than the model itself,
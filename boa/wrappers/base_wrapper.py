@@ -9,9 +9,13 @@ from __future__ import annotations
 
 import copy
 import pathlib
+import threading
+import time
 from typing import Optional
 
 from ax import Trial
+from ax.core.base_trial import BaseTrial
+from ax.core.batch_trial import BatchTrial
 from ax.core.types import TParameterization
 from ax.storage.json_store.encoder import object_to_json
 
@@ -19,6 +23,8 @@ from boa.config import BOAConfig
 from boa.definitions import PathLike
 from boa.logger import get_logger
 from boa.metaclasses import WrapperRegister
+from boa.metric_cache import MetricCache, metric_cache_options
+from boa.resources import TrialResources, evaluate_trial_resources
 from boa.utils import yaml_dump
 from boa.wrappers.wrapper_utils import (
     initialize_wrapper,
@@ -28,9 +34,20 @@ from boa.wrappers.wrapper_utils import (
 
 logger = get_logger()
 
+_fetch_locks_lock = threading.Lock()
+# number of locks the fetches of trials are spread over (by trial index), see ``BaseWrapper._trial_fetch_lock``
+_N_FETCH_LOCKS = 64
+
 
 class BaseWrapper(metaclass=WrapperRegister):
     _path: PathLike
+    #: Whether trials can be deployed in worker processes by the ``process`` run backend.
+    #: ``write_configs`` and ``run_model`` then get a copy of the trial without its experiment
+    #: (``trial.experiment`` only keeps track of the trial's status), so set this to False if they need it
+    supports_process_backend: bool = True
+    #: Names of the dictionary attributes (keyed by trial index) that ``run_model`` stores
+    #: trial results in, sent back from worker processes by the ``process`` run backend
+    trial_result_attributes: tuple[str, ...] = ()
 
     def __init__(
         self,
@@ -48,7 +65,8 @@ class BaseWrapper(metaclass=WrapperRegister):
         self._output_dir = None
         self.model_settings = None
         self.script_options = None
-        self._metric_cache = {}
+        self._metric_cache = None
+        self._fetch_locks = None
         self._metric_properties = {}
         self._metric_names = kwargs.get("metric_names", [])
 
@@ -94,6 +112,12 @@ class BaseWrapper(metaclass=WrapperRegister):
                     raise ValueError("No experiment_dir set or returned from mk_experiment_dir")
         self.setup()
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # locks can't be copied to other processes
+        state.pop("_fetch_locks", None)
+        return state
+
     @property
     def metric_names(self):
         """list of metric names associated with this experiment"""
@@ -109,6 +133,21 @@ class BaseWrapper(metaclass=WrapperRegister):
         else:
             self._metric_names = []
 
+    @property
+    def metric_cache(self) -> MetricCache:
+        """What :meth:`fetch_trial_data` returned for each trial, by trial index, bounded by the
+        ``metric_cache_*`` options of :class:`.BOAScriptOptions` (see :mod:`boa.metric_cache`)"""
+        with _fetch_locks_lock:
+            # in case users don't subclass with super
+            if getattr(self, "_metric_cache", None) is None:
+                self._metric_cache = MetricCache(**metric_cache_options(self.script_options))
+            return self._metric_cache
+
+    def invalidate_metric_cache(self, trial_index: Optional[int] = None):
+        """Forget what :meth:`fetch_trial_data` returned for a trial (or for every trial if None),
+        so it is fetched again the next time it is needed"""
+        self.metric_cache.invalidate(trial_index)
+
     @property
     def metric_params(self) -> dict:
         """dictionary of metric name to list of parameter names associated with each metric"""
@@ -335,6 +374,55 @@ class BaseWrapper(metaclass=WrapperRegister):
             "\nOr an instantiated wrapper."
         )
 
+    def job_command(self, trial: BaseTrial) -> list[str]:
+        """
+        The command that runs a trial as a job of a batch queue, used instead of
+        :meth:`run_model` when ``batch_queue`` is set in :class:`.BOAScriptOptions`
+        (see :class:`.ArrayJobRunner`).
+
+        Parameters
+        ----------
+        trial
+
+        Returns
+        -------
+        list[str]
+            The command, split into a list (see :func:`.split_shell_command`)
+        """
+        raise NotImplementedError(
+            f"{self.__class__.__name__} can't be submitted to a batch queue."
+            "\nImplement `job_command` to use the batch_queue option."
+        )
+
+    def trial_resources(self, trial: BaseTrial) -> Optional[TrialResources]:
+        """
+        The CPU cores and memory a trial needs while it runs, used to only start trials
+        when there is room for them (see :mod:`boa.resources`).
+
+        By default this evaluates ``trial_resources`` in :class:`.BOAScriptOptions` with the
+        parameters of the trial. Override this to compute the resources of a trial yourself,
+        in which case set ``trial_resources`` in your config to anything (like ``{}``) to turn
+        on resource aware admission.
+
+        Parameters
+        ----------
+        trial
+
+        Returns
+        -------
+        TrialResources or None
+            The resources of the trial, or None for the default of 1 CPU core and no memory
+        """
+        script_options = getattr(self.config, "script_options", None)
+        spec = getattr(script_options, "trial_resources", None)
+        if not spec:
+            return None
+        if isinstance(trial, BatchTrial):
+            parameters = {"n_arms": len(trial.arms)}
+        else:
+            parameters = {**trial.arm.parameters, "n_arms": 1}
+        return evaluate_trial_resources(spec, parameters)
+
     def set_trial_status(self, trial: Trial) -> None:
         """
         Marks the status of a trial to reflect the status of the model run for the trial.
@@ -389,21 +477,83 @@ class BaseWrapper(metaclass=WrapperRegister):
         # TODO add sphinx link to ax trial status
         """
 
+    def set_trial_statuses(self, trials: list[Trial]) -> None:
+        """
+        Marks the status of all trials that are polled at once.
+
+        By default this calls :meth:`set_trial_status` on each trial. Override this if
+        checking the status of many trials at once is cheaper than checking them one at
+        a time, for example by querying a batch job queue once for all jobs.
+
+        Parameters
+        ----------
+        trials
+            The running trials being polled
+        """
+        for trial in trials:
+            self.set_trial_status(trial)
+
+    def wait_for_trial_updates(self, timeout: float) -> bool:
+        """
+        Wait between status polls of running trials.
+
+        By default this sleeps for ``timeout`` seconds. Override this if your wrapper can
+        tell when a trial has finished (or has new results) to return early and have the
+        scheduler poll the trials right away.
+
+        Parameters
+        ----------
+        timeout
+            The most seconds to wait before the next poll
+
+        Returns
+        -------
+        bool
+            True if the wait ended early because trials were updated, False otherwise
+        """
+        time.sleep(timeout)
+        return False
+
     def _fetch_trial_data(
         self,
         parameters: TParameterization,
         metric_name: str,
-        trial: Trial,
+        trial: BaseTrial,
         param_names: list[str] = None,
+        fetch_none_ok: Optional[bool] = None,
         **kwargs,
     ):
-        # in case users don't subclass with super
-        if not hasattr(self, "_metric_cache"):
-            self._metric_cache = {}
-        if trial.index not in self._metric_cache:
-            self._metric_cache[trial.index] = {}
-        if metric_name in self._metric_cache[trial.index]:
-            return self._metric_cache[trial.index][metric_name]
+        """:meth:`fetch_trial_data`, cached, and checked that it returned data unless ``fetch_none_ok``
+        (which defaults to :attr:`fetch_none_ok`, or to True if :meth:`fetch_trial_data` failed the trial)"""
+        with self._trial_fetch_lock(trial.index):
+            return self._fetch_trial_data_locked(parameters, metric_name, trial, param_names, fetch_none_ok, **kwargs)
+
+    def _trial_fetch_lock(self, trial_index: int) -> threading.Lock:
+        """lock held while the data of a trial is fetched, so threads fetching the data of the same
+        trial for different metrics (see :meth:`.ModularMetric.fetch_trials_data`) only fetch it once.
+        Trials share a fixed number of locks (by trial index), so there aren't more locks as trials pile up."""
+        with _fetch_locks_lock:
+            # in case users don't subclass with super
+            if getattr(self, "_fetch_locks", None) is None:
+                self._fetch_locks = [threading.Lock() for _ in range(_N_FETCH_LOCKS)]
+            return self._fetch_locks[trial_index % _N_FETCH_LOCKS]
+
+    def _fetch_trial_data_locked(
+        self,
+        parameters: TParameterization,
+        metric_name: str,
+        trial: BaseTrial,
+        param_names: list[str] = None,
+        fetch_none_ok: Optional[bool] = None,
+        **kwargs,
+    ):
+        metric_cache = self.metric_cache
+        cache = metric_cache.get(trial.index, {})
+        is_batch = isinstance(trial, BatchTrial)
+        if is_batch and all(metric_name in cache.get(arm_name, {}) for arm_name in trial.arms_by_name):
+            return {arm_name: cache[arm_name][metric_name] for arm_name in trial.arms_by_name}
+        if not is_batch and metric_name in cache:
+            return cache[metric_name]
         res = self.fetch_trial_data(
             parameters=parameters,
             metric_name=metric_name,
@@ -412,27 +562,48 @@ class BaseWrapper(metaclass=WrapperRegister):
             param_names=param_names,
             **kwargs,
         )
-        if res is None and not self.fetch_none_ok:
+        if fetch_none_ok is None:
+            # decided for this call, wrappers fetching for many threads at once don't share it
+            fetch_none_ok = self.fetch_none_ok or trial.status.is_failed
+        if res is None and not fetch_none_ok:
             raise ValueError(
                 "No data returned when fetching Metric!"
                 " Make sure you return something form `fetch_trial_data`"
                 " or if using language agnostic setup, write out your data as specified in"
                 " the Wrapper docs."
             )
+        if not is_batch:
+            self._cache_metric_results(cache, res, metric_name)
+            metric_cache[trial.index] = cache  # sized and evicted by what was added
+            return cache[metric_name]
+
+        res = res or {}
+        missing = [arm_name for arm_name in trial.arms_by_name if arm_name not in res]
+        if missing and not fetch_none_ok:
+            raise ValueError(
+                f"No data returned for arms {missing} of batch trial {trial.index}!"
+                " For batch trials, `fetch_trial_data` should return a dictionary"
+                " with the arm names as keys and the data for that arm as values."
+            )
+        for arm_name in trial.arms_by_name:
+            self._cache_metric_results(cache.setdefault(arm_name, {}), res.get(arm_name), metric_name)
+        metric_cache[trial.index] = cache
+        return {arm_name: cache[arm_name][metric_name] for arm_name in trial.arms_by_name}
+
+    def _cache_metric_results(self, cache: dict, res, metric_name: str):
         if not isinstance(res, dict):
             res = {"wrapper_args": res}
         if metric_name not in res:
             res = {metric_name: res}
-        self._metric_cache[trial.index].update(res)
+        cache.update(res)
 
-        for name in self._metric_cache[trial.index].keys():
+        for name in cache.keys():
             if self.metric_names and name not in self.metric_names:
                 raise ValueError(
                     f"found extra returned metric: {name} in returned metrics from fetch_trial_data"
                     "Check the name of your metrics in your config file line up with the metric names "
                     "you return from your wrapper class or wrapper script."
                 )
-        return self._metric_cache[trial.index][metric_name]
 
     def fetch_trial_data(
         self,
@@ -461,6 +632,18 @@ class BaseWrapper(metaclass=WrapperRegister):
         In the key value parameter pairs, you can also specify the key "sem" for the standard error
         for this metric on this trial.
 
+        For a :class:`~ax.core.batch_trial.BatchTrial` (``trial_type: BATCH_TRIAL`` in the scheduler
+        options), ``parameters`` maps each arm name to the parameters of that arm, and the return value
+        is a dictionary with the arm names as keys and, as values, what you would return for a
+        single arm trial, so all arms of a batch can be evaluated at once.
+
+        .. code-block:: python
+
+            {
+                "0_0": {"Mean": {"a": [1, 2, 3, 4]}},
+                "0_1": {"Mean": {"a": [2, 3, 4, 5]}},
+            }
+
         Parameters
         ----------
         parameters
@@ -556,6 +739,53 @@ class BaseWrapper(metaclass=WrapperRegister):
         ...     return {"a": funcs[metric_properties[metric_name]["function"]](parameters)}
         """
 
+    def export_trial_results(self, trial: Trial) -> dict:
+        """
+        Collect whatever this wrapper stored for a trial while deploying it, so it can be
+        sent back to the main process when using the ``process`` run backend
+        (see ``run_backend`` in :class:`.BOAScriptOptions`).
+
+        By default, this collects the entry for ``trial.index`` from each dictionary
+        attribute named in :attr:`trial_result_attributes`, which covers the common pattern of
+        storing results in ``run_model`` with ``self.data[trial.index] = ...``
+        (with ``trial_result_attributes = ("data",)`` on your wrapper class).
+        Override this (and :meth:`import_trial_results`) if your wrapper stores trial
+        results some other way.
+
+        Parameters
+        ----------
+        trial
+
+        Returns
+        -------
+        dict
+            Mapping of attribute name to the value stored for this trial
+        """
+        results = {}
+        for name in self.trial_result_attributes:
+            value = getattr(self, name, None)
+            if isinstance(value, dict) and trial.index in value:
+                results[name] = value[trial.index]
+        return results
+
+    def import_trial_results(self, trial: Trial, results: dict) -> None:
+        """
+        Store results collected by :meth:`export_trial_results` in a worker process
+        back onto this wrapper.
+
+        Parameters
+        ----------
+        trial
+        results
+            Mapping of attribute name to the value stored for this trial
+        """
+        for name, value in results.items():
+            attr = getattr(self, name, None)
+            if isinstance(attr, dict):
+                attr[trial.index] = value
+            else:
+                setattr(self, name, {trial.index: value})
+
     def to_dict(self) -> dict:
         """Convert BaseWrapper to a dictionary."""
 
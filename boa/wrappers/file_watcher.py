@@ -0,0 +1,228 @@
+"""
+########################
+Trial File Watcher
+########################
+
+Watches the trial directories of an experiment for trial status and output files
+(see :meth:`.ScriptWrapper.set_trial_status`) so the scheduler can be woken up as soon
+as a trial writes out its results, instead of waiting for its next poll.
+
+The watcher uses inotify on Linux. On other platforms, or if inotify can't be set up,
+it is unavailable and waiting on it just sleeps, which is the same as regular polling.
+
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import pathlib
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Iterable
+
+from boa.definitions import PathLike
+from boa.logger import get_logger
+
+logger = get_logger()
+
+#: File suffixes that BOA reads trial status and output files from
+JSONLIKE_SUFFIXES = frozenset({".json", ".yml", ".yaml"})
+#: File suffixes that BOA reads arrays of trial output from (see :func:`.load_arrays`)
+ARRAY_SUFFIXES = frozenset({".npy", ".npz", ".parquet"})
+
+# from <sys/inotify.h>
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_ISDIR = 0x40000000
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def is_output_file(name: str, file_names: Iterable[str]) -> bool:
+    """Whether ``name`` is a JSON, YAML or binary array file named one of ``file_names``
+
+    >>> is_output_file("output.json", ["output"])
+    True
+    >>> is_output_file("output.json.j2", ["output"])
+    False
+    >>> is_output_file("output.rmse.y_pred.npy", ["output"])
+    True
+    """
+    suffix = pathlib.Path(name).suffix.lower()
+    return (suffix in JSONLIKE_SUFFIXES or suffix in ARRAY_SUFFIXES) and any(
+        name.startswith(f"{file_name}.") for file_name in file_names
+    )
+
+
+class TrialFileWatcher:
+    """Watch the trial directories in ``experiment_dir`` for files named one of ``file_names``.
+
+    Trial directories created after the watcher starts are picked up automatically.
+
+    Parameters
+    ----------
+    experiment_dir
+        Experiment directory the trial directories are created in
+    file_names
+        Names (without suffix) of the files to watch for
+    """
+
+    def __init__(self, experiment_dir: PathLike, file_names: Iterable[str]):
+        self.experiment_dir = pathlib.Path(experiment_dir)
+        self.file_names = tuple(file_names)
+        self._updated: dict[int, float] = {}
+        self._overflowed = False
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._fd = None
+        self._libc = None
+        self._watches: dict[int, int] = {}  # watch descriptor -> trial index (-1 for experiment dir)
+        self._thread = None
+        self._wake_r = self._wake_w = None
+        if sys.platform.startswith("linux"):
+            try:
+                self._start()
+            except OSError as e:
+                logger.warning(f"Could not watch trial files, falling back to polling. Reason: {e!r}")
+                self.close()
+
+    @property
+    def available(self) -> bool:
+        """Whether file events are being watched for (if not, trials are only polled)"""
+        return self._fd is not None
+
+    def wait(self, timeout: float) -> bool:
+        """Wait up to ``timeout`` seconds for a trial status or output file to be written.
+
+        Returns
+        -------
+        bool
+            True if a file was written before the timeout, False otherwise
+        """
+        if not self.available:
+            time.sleep(timeout)
+            return False
+        woken = self._event.wait(timeout)
+        self._event.clear()
+        return woken
+
+    def pop_updated_trials(self, trial_indices: Iterable[int]) -> dict[int, float] | None:
+        """Return which of ``trial_indices`` had files written since they were last popped,
+        mapped to when the first of those files was written (as a :func:`time.time` timestamp).
+
+        Returns None if events were missed (or the watcher is unavailable), in which case
+        every trial directory needs to be checked.
+        """
+        if not self.available:
+            return None
+        with self._lock:
+            updated = {idx: self._updated.pop(idx) for idx in trial_indices if idx in self._updated}
+            overflowed, self._overflowed = self._overflowed, False
+        return None if overflowed else updated
+
+    def notify(self, trial_index: int):
+        """Mark a trial as updated and wake up anything waiting on the watcher, for
+        updates that don't come from files being written (such as a script exiting)"""
+        self._mark_updated(trial_index)
+
+    def close(self):
+        """Stop watching"""
+        if self._wake_w is not None:
+            os.write(self._wake_w, b"\0")
+        if self._thread is not None:
+            self._thread.join()
+        for fd in (self._fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                os.close(fd)
+        self._fd = self._wake_r = self._wake_w = self._thread = None
+
+    def _start(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise _oserror()
+        self._fd = fd
+        self._add_watch(self.experiment_dir, -1, _IN_CREATE | _IN_MOVED_TO)
+        with os.scandir(self.experiment_dir) as entries:
+            for entry in entries:
+                if entry.name.isdigit() and entry.is_dir():
+                    self._watch_trial_dir(entry.name)
+        self._wake_r, self._wake_w = os.pipe()
+        self._thread = threading.Thread(target=self._run, name="BoaTrialFileWatcher", daemon=True)
+        self._thread.start()
+
+    def _add_watch(self, path: pathlib.Path, trial_index: int, mask: int):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise _oserror(path)
+        self._watches[wd] = trial_index
+
+    def _watch_trial_dir(self, name: str):
+        trial_dir = self.experiment_dir / name
+        try:
+            self._add_watch(trial_dir, int(name), _IN_CLOSE_WRITE | _IN_MOVED_TO)
+        except OSError as e:
+            # this trial still gets polled, it just won't wake the scheduler
+            logger.warning(f"Could not watch {trial_dir} for trial files. Reason: {e!r}")
+            return
+        # files written before the watch was added don't produce events
+        with os.scandir(trial_dir) as entries:
+            if any(is_output_file(entry.name, self.file_names) for entry in entries):
+                self._mark_updated(int(name))
+
+    def _mark_updated(self, trial_index: int):
+        with self._lock:
+            self._updated.setdefault(trial_index, time.time())
+        self._event.set()
+
+    def _run(self):
+        while True:
+            readable, _, _ = select.select([self._fd, self._wake_r], [], [])
+            if self._wake_r in readable:
+                return
+            try:
+                buffer = os.read(self._fd, 65536)
+            except BlockingIOError:
+                continue
+            try:
+                self._handle_events(buffer)
+            except Exception as e:
+                logger.exception(f"Error handling trial file events: {e!r}")
+
+    def _handle_events(self, buffer: bytes):
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                with self._lock:
+                    self._overflowed = True
+                self._event.set()
+                continue
+            trial_index = self._watches.get(wd)
+            if trial_index is None:
+                continue
+            if trial_index == -1:
+                if mask & _IN_ISDIR and name.isdigit():
+                    self._watch_trial_dir(name)
+            elif is_output_file(name, self.file_names):
+                self._mark_updated(trial_index)
+
+
+def _oserror(path=None) -> OSError:
+    err = ctypes.get_errno()
+    msg = os.strerror(err)
+    if err == errno.ENOSPC:
+        msg += " (inotify watch limit reached, see fs.inotify.max_user_watches)"
+    return OSError(err, msg, str(path) if path else None)
@@ -0,0 +1,253 @@
+"""
+########################
+Script Server
+########################
+
+Server mode keeps a script command running as a long lived worker process instead of
+starting it again for every trial, so interpreter start up and imports are only paid once.
+Turn it on with ``server_mode`` in :class:`.BOAScriptOptions`.
+
+BOA and the worker talk over the worker's stdin and stdout, one JSON object per line.
+For each trial, BOA writes a request to the worker's stdin
+
+.. code-block:: none
+
+    {"id": 3, "command": "run_model", "trial_index": 3, "trial_dir": "/path/to/exp_dir/000003"}
+
+and the worker handles the trial the same way the script would if it was passed
+``trial_dir`` as its last command line argument, and then writes a response to its stdout
+
+.. code-block:: none
+
+    {"id": 3, "exit_code": 0}
+
+A non-zero ``exit_code`` fails the trial, just like a non-zero exit code of a script.
+Workers may answer requests in any order. Any other output on stdout or stderr is logged.
+When BOA is done with a worker, it closes the worker's stdin, and the worker should exit.
+Workers are started with the environment variable ``BOA_SCRIPT_SERVER`` set to ``1``.
+
+Reference clients that handle the protocol for you are in
+:mod:`boa.wrappers.script_server_client` for Python and
+``tests/scripts/other_langs/r_utils/boa_server.R`` for R.
+
+"""
+
+from __future__ import annotations
+
+import atexit
+import concurrent.futures
+import itertools
+import os
+import subprocess
+import threading
+import weakref
+from typing import Callable, Optional
+
+from boa import json_codec
+from boa.logger import get_logger
+
+logger = get_logger()
+
+#: Environment variable set to "1" for script commands started in server mode
+SERVER_ENV_VAR = "BOA_SCRIPT_SERVER"
+
+_servers: weakref.WeakSet = weakref.WeakSet()
+
+
+class ScriptServer:
+    """Pool of long lived worker processes running one script command.
+
+    Workers are started when the first request is sent to them, and restarted if they exit.
+
+    Parameters
+    ----------
+    args
+        Command to start a worker, split into a list (see :func:`.split_shell_command`)
+    n_workers
+        Number of worker processes. Each request is sent to the worker with the fewest
+        unanswered requests.
+    **popen_kwargs
+        Extra keyword arguments for :class:`subprocess.Popen`
+    """
+
+    def __init__(self, args: list[str], n_workers: int = 1, **popen_kwargs):
+        self.args = args
+        self.popen_kwargs = {**popen_kwargs, "env": {**popen_kwargs.get("env", os.environ), SERVER_ENV_VAR: "1"}}
+        self._workers = [_Worker(self) for _ in range(max(n_workers, 1))]
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        _servers.add(self)
+
+    def request(
+        self, command: str, trial_index: int, trial_dir: os.PathLike, on_exit: Optional[Callable[[int], None]] = None
+    ) -> concurrent.futures.Future:
+        """Send a trial to a worker.
+
+        Parameters
+        ----------
+        command
+            Name of the script command (``run_model``, ``fetch_trial_data``, etc.)
+        trial_index
+            Index of the trial
+        trial_dir
+            Trial directory of the trial
+        on_exit
+            Called with the exit code the worker responds with, before the returned future resolves.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the exit code the worker responds with
+        """
+        with self._lock:
+            request_id = next(self._ids)
+            worker = min(self._workers, key=lambda w: w.n_pending)
+        msg = {"id": request_id, "command": command, "trial_index": trial_index, "trial_dir": str(trial_dir)}
+        return worker.send(msg, on_exit)
+
+    def close(self):
+        """Close the stdin of each worker and wait for them to exit"""
+        for worker in self._workers:
+            worker.close()
+
+
+class _Worker:
+    """One worker slot of a :class:`ScriptServer`, (re)starting its process as needed"""
+
+    def __init__(self, server: ScriptServer):
+        self.server = server
+        self.process: Optional[_WorkerProcess] = None
+        self.lock = threading.Lock()
+
+    @property
+    def n_pending(self) -> int:
+        process = self.process
+        if process is None:
+            return 0
+        with process.lock:
+            return len(process.pending)
+
+    def send(self, msg: dict, on_exit) -> concurrent.futures.Future:
+        with self.lock:
+            if self.process is None or self.process.p.poll() is not None:
+                self.process = _WorkerProcess(self.server.args, **self.server.popen_kwargs)
+            process = self.process
+        return process.send(msg, on_exit)
+
+    def close(self):
+        with self.lock:
+            process, self.process = self.process, None
+        if process is not None:
+            process.close()
+
+
+class _WorkerProcess:
+    def __init__(self, args: list[str], **popen_kwargs):
+        self.p = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            **popen_kwargs,
+        )
+        self.pending: dict[int, tuple[concurrent.futures.Future, Optional[Callable[[int], None]]]] = {}
+        self.exit_code: Optional[int] = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        name = f"BoaScriptServer-{self.p.pid}"
+        threading.Thread(target=self._read_stdout, name=name, daemon=True).start()
+        threading.Thread(target=self._read_stderr, name=f"{name}-stderr", daemon=True).start()
+
+    def send(self, msg: dict, on_exit) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self.lock:
+            exit_code = self.exit_code
+            if exit_code is None:
+                self.pending[msg["id"]] = (future, on_exit)
+        if exit_code is not None:
+            # the worker exited between being picked and being sent the request
+            _finish(future, exit_code or 1, on_exit)
+            return future
+        # writing isn't done under self.lock, so the stdout reader is never blocked by a full stdin pipe
+        with self.write_lock:
+            try:
+                self.p.stdin.write(json_codec.dumps(msg).decode() + "\n")
+                self.p.stdin.flush()
+            except (OSError, ValueError) as e:  # ValueError if stdin was already closed
+                logger.warning(f"Could not send request to script server worker: {e!r}")
+                # fail the request here, the worker may not exit (say, if it only closed its stdin)
+                with self.lock:
+                    request = self.pending.pop(msg["id"], None)
+                if request is not None:
+                    _finish(future, 1, on_exit)
+        return future
+
+    def close(self):
+        with self.write_lock:
+            try:
+                self.p.stdin.close()
+            except OSError:
+                pass
+        self.p.wait()
+
+    def _read_stdout(self):
+        for line in self.p.stdout:
+            response = _parse_response(line)
+            if response is None:
+                logger.info(line.strip())
+                continue
+            with self.lock:
+                future, on_exit = self.pending.pop(response["id"], (None, None))
+            if future is not None:
+                _finish(future, response["exit_code"], on_exit)
+        self.p.stdout.close()
+        exit_code = self.p.wait()
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.exit_code = exit_code
+        if pending:
+            logger.warning(
+                f"Script server worker exited with exit code {exit_code}"
+                f" before responding to {len(pending)} request(s)"
+            )
+        for future, on_exit in pending.values():
+            _finish(future, exit_code or 1, on_exit)
+
+    def _read_stderr(self):
+        for line in self.p.stderr:
+            logger.warning(line.strip())
+        self.p.stderr.close()
+
+
+def _parse_response(line: str) -> Optional[dict]:
+    """the response in line, or None if it is some other output
+
+    >>> _parse_response('{"id": 1, "exit_code": 0}')
+    {'id': 1, 'exit_code': 0}
+    >>> _parse_response("model output") is None
+    True
+    """
+    try:
+        response = json_codec.loads(line)
+    except ValueError:
+        return None
+    if isinstance(response, dict) and "id" in response and "exit_code" in response:
+        return response
+    return None
+
+
+def _finish(future: concurrent.futures.Future, exit_code: int, on_exit):
+    if on_exit is not None:
+        try:
+            on_exit(exit_code)
+        except Exception as e:
+            logger.exception(f"Error handling response of script server: {e!r}")
+    future.set_result(exit_code)
+
+
+@atexit.register
+def _close_servers():
+    for server in list(_servers):
+        server.close()
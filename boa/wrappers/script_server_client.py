@@ -0,0 +1,84 @@
+"""
+########################
+Script Server Client
+########################
+
+Python reference client for server mode (see :mod:`boa.wrappers.script_server`).
+
+Write your script as a function of the trial directory and hand it to :func:`serve`.
+When BOA starts the script in server mode, :func:`serve` answers BOA's requests for
+each trial until BOA is done with it, otherwise it handles the single trial directory
+passed as the last command line argument, so the same script works either way.
+
+..  code-block:: python
+
+    from boa.wrappers.script_server_client import serve
+
+    import my_model  # slow imports are only paid once in server mode
+
+
+    def run_model(trial_dir):
+        ...
+
+
+    if __name__ == "__main__":
+        serve(run_model)
+
+This module only uses the standard library, so it can be copied next to your scripts
+if they run in an environment without BOA installed.
+
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import pathlib
+import sys
+import traceback
+from typing import Callable, Optional
+
+SERVER_ENV_VAR = "BOA_SCRIPT_SERVER"
+
+
+def serve(handler: Callable[[pathlib.Path], Optional[int]], argv: Optional[list[str]] = None):
+    """
+    Call ``handler`` with the trial directory of each trial BOA sends.
+
+    ``handler`` returns an exit code (None is the same as 0), and any exception it
+    raises is printed and returned as exit code 1 (which fails the trial).
+
+    Parameters
+    ----------
+    handler
+        Function that takes a trial directory and handles that trial
+    argv
+        Command line arguments to take the trial directory from when not in server mode.
+        Defaults to ``sys.argv``
+    """
+    if os.environ.get(SERVER_ENV_VAR) != "1":
+        argv = sys.argv if argv is None else argv
+        sys.exit(_handle(handler, argv[-1]))
+
+    responses = sys.stdout
+    # keep anything the handler prints out of the responses
+    sys.stdout = sys.stderr
+    try:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            exit_code = _handle(handler, request["trial_dir"])
+            responses.write(json.dumps({"id": request["id"], "exit_code": exit_code}) + "\n")
+            responses.flush()
+    finally:
+        sys.stdout = responses
+
+
+def _handle(handler: Callable[[pathlib.Path], Optional[int]], trial_dir: str) -> int:
+    try:
+        exit_code = handler(pathlib.Path(trial_dir))
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return int(exit_code or 0)
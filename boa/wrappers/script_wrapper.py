@@ -1,21 +1,36 @@
 from __future__ import annotations
 
-import subprocess
+import concurrent.futures
+import os
+import pathlib
 import threading
 import time
-from typing import Iterable
+from functools import partial
+from typing import Iterable, NamedTuple
 
 from attrs import asdict
 from ax import Trial
 from ax.core.base_trial import TrialStatus
+from ax.core.batch_trial import BatchTrial
 from ax.storage.json_store.encoder import object_to_json
 
+from boa import json_codec
 from boa.logger import get_logger
 from boa.template import JinjaTemplateVars, render_template
 from boa.wrappers.base_wrapper import BaseWrapper
+from boa.wrappers.file_watcher import (
+    JSONLIKE_SUFFIXES,
+    TrialFileWatcher,
+    is_output_file,
+)
+from boa.wrappers.script_server import ScriptServer
+from boa.wrappers.subprocess_engine import get_subprocess_engine
 from boa.wrappers.wrapper_utils import (
+    TrialManifest,
     get_trial_dir,
+    load_arrays,
     load_jsonlike,
+    nest_dotted_keys,
     save_trial_data,
     split_shell_command,
 )
@@ -24,6 +39,9 @@ logger = get_logger()
 
 
 OUTPUT_FILES = ("output", "outputs", "result", "results", "metric", "metrics")
+STATUS_FILES = ("trial_status", "TrialStatus", *OUTPUT_FILES)
+
+_script_servers_lock = threading.Lock()
 
 
 class ScriptWrapper(BaseWrapper):
@@ -41,9 +59,61 @@ class ScriptWrapper(BaseWrapper):
     which is a comprehensive json file of everything above, as well as the param_names from your
     config file for each metric, and the metric_properties you custom configure for any individual
     metric (though metric_properties is only available in the final stages when fetch_trial_status
-    is being called).
+    is being called). These files are only rewritten when their content changes, and ``manifest.json``
+    has a hash of their content, so you can skip re-reading them if it hasn't changed
+    (see :class:`.TrialManifest`).
     """
 
+    # scripts are started without blocking and watched from the process that started them
+    supports_process_backend = False
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        # the file watcher and script servers stay in this process
+        state.pop("_file_watcher", None)
+        state.pop("_script_servers", None)
+        state.pop("_constants", None)
+        return state
+
+    @property
+    def _script_constants(self) -> _ScriptConstants:
+        """Values every script command of every trial is rendered with, computed once per config
+        instead of once per trial. Don't mutate them, copy them first."""
+        constants = getattr(self, "_constants", None)
+        if constants is None or constants.config is not self.config or constants.config_path != self.config_path:
+            param_names = {metric.name: metric.param_names for metric in self.config.objective.metrics}
+            config_path = self.config_path or self.config.config_path
+            constants = _ScriptConstants(
+                config=self.config,
+                config_path=self.config_path,
+                param_names_kw={"param_names": param_names} if param_names else {},
+                template_vars=asdict(JinjaTemplateVars(config_path)) if config_path else {},
+            )
+            self._constants = constants
+        return constants
+
+    @property
+    def file_watcher(self) -> TrialFileWatcher | None:
+        """Watcher of the trial directories, started the first time it is accessed if
+        ``watch_trial_files`` is set in :class:`.BOAScriptOptions`, else None"""
+        if getattr(self, "_file_watcher", None) is None:
+            if not (self.config and self.config.script_options.watch_trial_files and self.experiment_dir):
+                return None
+            self._file_watcher = TrialFileWatcher(self.experiment_dir, file_names=STATUS_FILES)
+        return self._file_watcher
+
+    def wait_for_trial_updates(self, timeout: float) -> bool:
+        """
+        Wait between status polls of running trials.
+
+        If ``watch_trial_files`` is set in :class:`.BOAScriptOptions`, this returns
+        as soon as a trial writes out a trial status or output file, otherwise it sleeps
+        for ``timeout`` seconds.
+        """
+        if self.file_watcher is not None:
+            return self.file_watcher.wait(timeout)
+        return super().wait_for_trial_updates(timeout)
+
     def write_configs(self, trial: Trial) -> None:
         """
         It can be convenient to separate our your writing out model configuration files
@@ -61,8 +131,7 @@ class ScriptWrapper(BaseWrapper):
         ----------
         trial : Trial
         """
-        param_names = {metric.name: metric.param_names for metric in self.config.objective.metrics}
-        kw = {"param_names": param_names} if param_names else {}
+        kw = self._script_constants.param_names_kw
         self._run_subprocess_script_cmd_if_exists(trial, "write_configs", block=True, **kw)
 
     def run_model(self, trial: Trial) -> None:
@@ -88,10 +157,35 @@ class ScriptWrapper(BaseWrapper):
         ----------
         trial Trial
         """
-        param_names = {metric.name: metric.param_names for metric in self.config.objective.metrics}
-        kw = {"param_names": param_names} if param_names else {}
+        kw = self._script_constants.param_names_kw
         self._run_subprocess_script_cmd_if_exists(trial, "run_model", **kw)
 
+    def job_command(self, trial: Trial) -> list[str]:
+        """
+        The ``run_model`` command of a trial, to run the trial as a job of a batch queue
+        instead of running it directly (see ``batch_queue`` in :class:`.BOAScriptOptions`).
+
+        The trial data files are written out to the trial directory, and the command is
+        rendered and passed the trial directory just as when :meth:`run_model` runs it.
+
+        Parameters
+        ----------
+        trial : Trial
+
+        Returns
+        -------
+        list[str]
+            The command, split into a list
+        """
+        run_cmd = self.config.script_options.run_model
+        if not run_cmd:
+            raise ValueError("A `run_model` script command is needed to submit trials to a batch queue")
+        kw = self._script_constants.param_names_kw
+        trial_dir = save_trial_data(
+            trial, experiment_dir=self.experiment_dir, manifest=self._trial_manifest(trial), **kw
+        )
+        return self._render_script_cmd(trial, run_cmd, trial_dir)
+
     def set_trial_status(self, trial: Trial) -> None:
         """
         Marks the status of a trial to reflect the status of the model run for the trial.
@@ -179,33 +273,103 @@ class ScriptWrapper(BaseWrapper):
         :meth:`~boa.wrappers.script_wrapper.ScriptWrapper.run_model`
         # TODO add sphinx link to ax trial status
         """
-        param_names = {metric.name: metric.param_names for metric in self.config.objective.metrics}
-        kw = {"param_names": param_names} if param_names else {}
+        kw = self._script_constants.param_names_kw
         self._run_subprocess_script_cmd_if_exists(trial, "set_trial_status", **kw)
-        data = self._read_subprocess_script_output(trial, file_names=["trial_status", "TrialStatus", *OUTPUT_FILES])
+        data = self._read_subprocess_script_output(trial, file_names=STATUS_FILES)
         if data is not None:
-            trial_status_keys = [k for k in data.keys() if k.lower() == "trialstatus" or k.lower() == "trial_status"]
-            if not trial_status_keys:
-                data["trial_status"] = "COMPLETED"
-                trial_status_keys = ["trial_status"]
-            if trial_status_keys:
-                trial_status_key = trial_status_keys[0]
-                trial_status = data[trial_status_key]
-                # some languages jsonify dicts as 1 element lists sometimes
-                if isinstance(trial_status, list):
-                    trial_status = trial_status[0]
-                try:
-                    # convert trial_status to an enum for trial.mark_as
-                    try:  # if it is an int or a str of an int this will work
-                        trial_status = TrialStatus(int(trial_status))
-                    # if it is a string of a trial status name ("completed" etc.), then get the TrialStatus enum version
-                    except ValueError:
-                        trial_status = TrialStatus[trial_status.upper()]
-                    # you can't set a running trial to running, so we leave, which is equivalent
-                    if trial_status != TrialStatus.RUNNING:
-                        trial.mark_as(trial_status)
-                except ValueError as e:
-                    raise ValueError(f"Invalid trial status - {trial_status} - passed to `set_trial_status`") from e
+            self._mark_trial_status(trial, data)
+
+    def set_trial_statuses(self, trials: list[Trial]) -> None:
+        """
+        Marks the status of all polled trials at once.
+
+        If there is a ``set_trial_statuses`` script option, that command is run once
+        (blocking) for all trials with the experiment directory passed as a command line argument.
+        The experiment directory will have a ``running_trials.json`` file listing the
+        ``trial_index`` and ``trial_dir`` of each trial being polled. The script can
+        then write out either a ``trial_statuses.json`` file to the experiment directory,
+        mapping trial indices to trial statuses, or ``trial_status.json`` files to each
+        trial directory as described in :meth:`set_trial_status`.
+
+        If there is a ``set_trial_status`` script option, that command still has to be run
+        for each trial, so this falls back to calling :meth:`set_trial_status` on each trial.
+        So it does if a subclass overrides :meth:`set_trial_status`, so its override sees every poll.
+
+        Otherwise, the experiment directory and each polled trial directory are only
+        listed once per poll to look for status and output files.
+
+        **Format**
+
+        format for trial_statuses.json file
+
+        .. code-block:: none
+
+            {
+                "0": "COMPLETED",
+                "1": "RUNNING",
+                "2": "FAILED"
+            }
+
+        Parameters
+        ----------
+        trials
+            The running trials being polled
+        """
+        overridden = type(self).set_trial_status is not ScriptWrapper.set_trial_status
+        if self.config.script_options.set_trial_status or overridden:
+            return super().set_trial_statuses(trials)
+        batch_statuses = {}
+        if self.config.script_options.set_trial_statuses:
+            batch_statuses = self._run_batch_status_cmd(trials)
+        elif self.file_watcher is not None:
+            # only trials that had files written since they were last polled can have a new status
+            updated = self.file_watcher.pop_updated_trials(trial.index for trial in trials)
+            if updated is not None:
+                trials = [trial for trial in trials if trial.index in updated or trial.index in self.pending_fetches]
+
+        trial_dirs = {get_trial_dir(self.experiment_dir, trial.index).name: trial for trial in trials}
+        with os.scandir(self.experiment_dir) as entries:
+            for entry in entries:
+                trial = trial_dirs.get(entry.name)
+                if trial is None or not entry.is_dir():
+                    continue
+                if str(trial.index) in batch_statuses:
+                    data = {"trial_status": batch_statuses[str(trial.index)]}
+                else:
+                    # the arrays of output files are only loaded once the trial's data is fetched
+                    data = _load_output_file(pathlib.Path(entry.path), file_names=STATUS_FILES, arrays=False)
+                if data is not None:
+                    self._mark_trial_status(trial, data)
+
+    def _run_batch_status_cmd(self, trials: list[Trial]) -> dict:
+        """
+        Run the ``set_trial_statuses`` script command once for all ``trials`` and return
+        the contents of the ``trial_statuses`` file it wrote out (if any), with the keys
+        converted to strings.
+        """
+        running_trials = [
+            {"trial_index": trial.index, "trial_dir": str(get_trial_dir(self.experiment_dir, trial.index))}
+            for trial in trials
+        ]
+        with open(self.experiment_dir / "running_trials.json", "wb") as file:
+            file.write(json_codec.dumps(running_trials, indent=True))
+        # don't pick up statuses left over from the last poll if the script fails to write new ones
+        for path in self.experiment_dir.glob("trial_statuses.*"):
+            path.unlink()
+
+        run_cmd = self.config.script_options.set_trial_statuses
+        kw = dict(self._script_constants.template_vars)
+        kw["experiment_dir"] = self.experiment_dir
+        run_cmd = render_template(run_cmd, **kw)
+        logger.info(run_cmd)
+
+        args = split_shell_command(f"{run_cmd} {self.experiment_dir}")
+        exit_code = get_subprocess_engine().start(args, cwd=self._script_cwd).result()
+        if exit_code != 0:
+            logger.warning(f"set_trial_statuses exited with exit code {exit_code}")
+
+        data = _load_output_file(self.experiment_dir, file_names="trial_statuses")
+        return {str(k): v for k, v in data.items()} if data else {}
 
     def fetch_trial_data(self, trial: Trial, metric_properties: dict, *args, **kwargs) -> dict | None:
         """
@@ -219,6 +383,12 @@ class ScriptWrapper(BaseWrapper):
         The return value of this function is a dictionary, with keys that match the keys
         of the metric used in the objective function.
 
+        Your ``fetch_trial_data`` script is started as soon as a trial reports that it
+        completed (see :meth:`set_trial_status`), and the trial is left running until the
+        script has exited and an output file has been written out, so the scheduler never
+        waits on it. If that takes longer than ``fetch_trial_data_timeout`` seconds
+        (see :class:`.BOAScriptOptions`), the trial is marked failed.
+
         .. code-block:: json
 
             {
@@ -246,6 +416,33 @@ class ScriptWrapper(BaseWrapper):
                 }
             }
 
+        Large arrays can be written out as binary files instead, which are much faster to read
+        than JSON text: ``.npy`` files named ``output.<metric name>.<argument name>.npy``
+        (such as ``output.MSE.y_pred.npy``), which are memory-mapped instead of being read into memory,
+        or a single ``output.npz`` or ``output.parquet`` file, with keys (or columns) named
+        ``<metric name>.<argument name>`` (see :func:`.load_arrays`). They are added to what
+        the JSON or YAML output file holds, if there is one, so a script can write the arrays
+        as binary files and anything else (such as a ``sem``) as JSON. If your ``run_model`` script writes
+        the output files (without a ``fetch_trial_data`` script), the trial can be picked up as completed
+        as soon as the first of them is there, so write them under other names and rename them once all
+        of them are written.
+
+        For a batch trial (``trial_type: BATCH_TRIAL`` in the scheduler options), every script
+        is run once for the whole batch. The trial directory has a batch manifest ``arms.json``
+        listing the name, parameters and weight of each arm, in order, and ``parameters.json`` maps
+        each arm name to its parameters. Write out the output for each arm, keyed by arm name
+
+        .. code-block:: json
+
+            {
+                "0_0": {
+                    "mean": {"a": [-0.3691, 4.6544]}
+                },
+                "0_1": {
+                    "mean": {"a": [1.2675, -0.4327]}
+                }
+            }
+
         Parameters
         ----------
         trial : Trial
@@ -259,31 +456,22 @@ class ScriptWrapper(BaseWrapper):
             A dictionary with the keys matching the keys of the metric function
                 used in the objective or None if no file is found (trial will be marked failed)
         """
-        param_names = {metric.name: metric.param_names for metric in self.config.objective.metrics}
-        kw = {"param_names": param_names} if param_names else {}
+        kw = dict(self._script_constants.param_names_kw)
         if metric_properties:
             kw["metric_properties"] = metric_properties
-        self._run_subprocess_script_cmd_if_exists(
-            trial,
-            func_names="fetch_trial_data",
-            **kw,
-        )
-        loops = 0
-        while not (data := self._read_subprocess_script_output(trial, file_names=OUTPUT_FILES)):
-            time.sleep(1.5**loops)
-            loops += 1
-            if loops > 5:
-                logger.warning(
-                    f"fetch_trial_data did not write out a file with one of the following names: {OUTPUT_FILES}"
-                )
-                self.fetch_none_ok = True
-                trial.mark_failed(unsafe=True)
-                return None
-        if data is not None:
-            trial_status_keys = [k for k in data.keys() if k.lower() == "trialstatus" or k.lower() == "trial_status"]
-            for key in trial_status_keys:
-                data.pop(key)
-            return data
+        if self.pending_fetches.pop(trial.index, None) is None:
+            # the trial wasn't marked completed by polling it through this wrapper,
+            # so the fetch script hasn't been started yet
+            self._run_subprocess_script_cmd_if_exists(trial, func_names="fetch_trial_data", block=True, **kw)
+        data = self._read_subprocess_script_output(trial, file_names=OUTPUT_FILES)
+        if data is None:
+            logger.warning(f"fetch_trial_data did not write out a file with one of the following names: {OUTPUT_FILES}")
+            trial.mark_failed(unsafe=True)  # so no data is fine (see BaseWrapper._fetch_trial_data)
+            return None
+        trial_status_keys = [k for k in data.keys() if k.lower() == "trialstatus" or k.lower() == "trial_status"]
+        for key in trial_status_keys:
+            data.pop(key)
+        return data
 
     def _run_subprocess_script_cmd_if_exists(self, trial: Trial, func_names: list[str] | str, block=False, **kwargs):
         """
@@ -303,71 +491,258 @@ class ScriptWrapper(BaseWrapper):
 
         Returns
         -------
-        bool
-            True if a script was run, False otherwise
+        list[concurrent.futures.Future]
+            Futures of the exit codes of the scripts that were run (empty if none were run)
         """
         if isinstance(func_names, str):
             func_names = [func_names]
-        ran_cmds = False
+        exit_codes = []
         for func_name in func_names:
             run_cmd = getattr(self.config.script_options, func_name)
             if run_cmd:
-                ran_cmds = True
-                # TODO BaseTrial doesn't have arm property, just arms.
-                # With issue #22, fix this to fully support Batched Trials
-                trial_dir = save_trial_data(trial, experiment_dir=self.experiment_dir, **kwargs)
-
-                parameters = object_to_json(trial.arm.parameters)
-                parameters.pop("__type", None)
-                logger.info(run_cmd)
-                if self.config_path or self.config.config_path:
-                    kw = {**asdict(JinjaTemplateVars(self.config_path or self.config.config_path)), **parameters}
-                else:
-                    kw = parameters
-                kw["trial_dir"] = trial_dir
-                logger.info(kw)
-                run_cmd = render_template(run_cmd, **kw)
-                logger.info(run_cmd)
-
-                args = split_shell_command(f"{run_cmd} {trial_dir}")
-                p = subprocess.Popen(
-                    args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.PIPE, universal_newlines=True
+                trial_dir = save_trial_data(
+                    trial, experiment_dir=self.experiment_dir, manifest=self._trial_manifest(trial), **kwargs
+                )
+
+                if self._in_server_mode(func_name):
+                    exit_code = self._get_script_server(func_name).request(
+                        func_name, trial.index, trial_dir, on_exit=partial(_mark_failed_on_error, trial)
+                    )
+                    if block:
+                        exit_code.result()
+                    exit_codes.append(exit_code)
+                    continue
+
+                args = self._render_script_cmd(trial, run_cmd, trial_dir)
+                exit_code = get_subprocess_engine().start(
+                    args,
+                    on_exit=partial(_mark_failed_on_error, trial),
+                    cpus=trial.run_metadata.get("cpus"),
+                    cwd=self._script_cwd,
                 )
                 if block:
-                    subprocess_output(p, trial)
-                t = threading.Thread(target=subprocess_output, args=(p, trial), daemon=True)
-                t.start()
-        return ran_cmds
+                    exit_code.result()
+                exit_codes.append(exit_code)
+        return exit_codes
+
+    def _render_script_cmd(self, trial: Trial, run_cmd: str, trial_dir: pathlib.Path) -> list[str]:
+        """render the jinja template variables of a script command for a trial
+        and append the trial directory to it"""
+        # a batch trial has no single set of parameters to render into the command,
+        # its script reads them from the batch manifest in the trial directory
+        parameters = {} if isinstance(trial, BatchTrial) else object_to_json(trial.arm.parameters)
+        parameters.pop("__type", None)
+        logger.info(run_cmd)
+        kw = {**self._script_constants.template_vars, **parameters}
+        kw["trial_dir"] = trial_dir
+        logger.info(kw)
+        run_cmd = render_template(run_cmd, **kw)
+        logger.info(run_cmd)
+
+        return split_shell_command(f"{run_cmd} {trial_dir}")
+
+    @property
+    def _script_cwd(self) -> pathlib.Path | None:
+        """directory the script commands are run from, passed to them instead of changing the working
+        directory of the process, since they are started from many threads at once"""
+        return self.working_dir or self.config.script_options.working_dir
+
+    @property
+    def pending_fetches(self) -> dict[int, _PendingFetch]:
+        """Trials that reported they completed, but whose data isn't ready to be fetched yet"""
+        # in case users don't subclass with super
+        if not hasattr(self, "_pending_fetches"):
+            self._pending_fetches = {}
+        return self._pending_fetches
+
+    def _trial_manifest(self, trial: Trial) -> TrialManifest:
+        """the manifest the data files of a trial are written through, so unchanged files aren't rewritten"""
+        # in case users don't subclass with super
+        if not hasattr(self, "_trial_manifests"):
+            self._trial_manifests = {}
+        trial_dir = get_trial_dir(self.experiment_dir, trial.index)
+        if trial.status.is_terminal:
+            # finished trials are only written a few more times (to fetch their data), so their
+            # manifests aren't kept around for the rest of the optimization
+            self._trial_manifests.pop(trial.index, None)
+            return TrialManifest(trial_dir)
+        manifest = self._trial_manifests.get(trial.index)
+        if manifest is None or manifest.trial_dir != trial_dir:
+            manifest = self._trial_manifests[trial.index] = TrialManifest(trial_dir)
+        return manifest
+
+    def _mark_trial_status(self, trial: Trial, data: dict):
+        """mark the trial with the trial status in data, or as completed if data has no trial status"""
+        # a failing script may have already marked it
+        if trial.status.is_terminal:
+            self.pending_fetches.pop(trial.index, None)
+            getattr(self, "_trial_manifests", {}).pop(trial.index, None)
+            return
+        trial_status = _parse_trial_status(data)
+        # you can't set a running trial to running, so we leave, which is equivalent
+        if trial_status == TrialStatus.RUNNING:
+            return
+        if trial_status == TrialStatus.COMPLETED and not self._trial_data_ready(trial):
+            # leave it running and check again on the next poll
+            return
+        trial.mark_as(trial_status)
+        if trial.status.is_terminal:
+            getattr(self, "_trial_manifests", {}).pop(trial.index, None)
+
+    def _trial_data_ready(self, trial: Trial) -> bool:
+        """
+        Whether the data of a trial that reported it completed can be fetched without waiting.
+
+        The first time this is called for a trial, the ``fetch_trial_data`` script (if any)
+        is started. The data is ready once that script exits and there is an output file
+        in the trial directory. If it isn't ready within ``fetch_trial_data_timeout``
+        seconds, the trial is marked failed.
+        """
+        fetch = self.pending_fetches.get(trial.index)
+        if fetch is None:
+            kw = dict(self._script_constants.param_names_kw)
+            if self._metric_properties:
+                kw["metric_properties"] = self._metric_properties
+            exit_codes = self._run_subprocess_script_cmd_if_exists(trial, "fetch_trial_data", **kw)
+            if self.file_watcher is not None:
+                for exit_code in exit_codes:
+                    exit_code.add_done_callback(lambda _, idx=trial.index: self.file_watcher.notify(idx))
+            fetch = self.pending_fetches[trial.index] = _PendingFetch(time.monotonic(), exit_codes)
+
+        trial_dir = get_trial_dir(self.experiment_dir, trial.index)
+        if all(exit_code.done() for exit_code in fetch.exit_codes) and _find_output_files(trial_dir, OUTPUT_FILES):
+            return True
+
+        timeout = self.config.script_options.fetch_trial_data_timeout
+        if timeout is not None and time.monotonic() - fetch.started > timeout:
+            logger.warning(
+                f"Trial {trial.index} completed, but its data was not written out to a file with one of"
+                f" the following names within {timeout} seconds: {OUTPUT_FILES}"
+            )
+            self.pending_fetches.pop(trial.index)
+            trial.mark_failed(unsafe=True)
+        return False
+
+    def _in_server_mode(self, func_name: str) -> bool:
+        server_mode = self.config.script_options.server_mode
+        if isinstance(server_mode, bool):
+            return server_mode
+        return func_name in server_mode
+
+    def _get_script_server(self, func_name: str) -> ScriptServer:
+        """The script server running the ``func_name`` script command, started the first time"""
+        with _script_servers_lock:
+            # in case users don't subclass with super
+            if not hasattr(self, "_script_servers"):
+                self._script_servers = {}
+            if func_name not in self._script_servers:
+                run_cmd = getattr(self.config.script_options, func_name)
+                run_cmd = render_template(run_cmd, **self._script_constants.template_vars)
+                logger.info(f"Starting {func_name} in server mode: {run_cmd}")
+                self._script_servers[func_name] = ScriptServer(
+                    split_shell_command(run_cmd),
+                    n_workers=self.config.script_options.server_workers,
+                    cwd=self._script_cwd,
+                )
+            return self._script_servers[func_name]
+
+    def close_script_servers(self):
+        """Stop the worker processes of script commands running in server mode
+        (they are started again if needed)"""
+        with _script_servers_lock:
+            servers, self._script_servers = getattr(self, "_script_servers", {}), {}
+        for server in servers.values():
+            server.close()
 
     def _read_subprocess_script_output(self, trial: Trial, file_names: Iterable[str] | str):
         trial_dir = get_trial_dir(self.experiment_dir, trial.index)
-        if isinstance(file_names, str):
-            file_names = [file_names]
-        for file_name in file_names:
-            output_files = trial_dir.glob(f"{file_name}.*")
-            json_output_files = [file for file in output_files if file.suffix.lower() in {".json", ".yml", ".yaml"}]
-            if len(json_output_files) > 1:
-                raise ValueError(f"{file_name} can only output one json or yaml output file")
-            elif len(json_output_files) == 1:
-                output_file = json_output_files[0]
-                if output_file.exists():
-                    return load_jsonlike(output_file)
-        return None
+        return _load_output_file(trial_dir, file_names)
+
+
+class _ScriptConstants(NamedTuple):
+    config: object
+    config_path: os.PathLike | None
+    param_names_kw: dict
+    template_vars: dict
+
 
+class _PendingFetch(NamedTuple):
+    started: float
+    exit_codes: list[concurrent.futures.Future]
 
-def subprocess_output(p: subprocess.Popen, trial: Trial):
+
+def _find_output_files(directory: pathlib.Path, file_names: Iterable[str] | str) -> list[pathlib.Path]:
     """
-    log the output of a subprocess `p` to the logger
-    and mark the trial as failed if the subprocess exits with a non-zero exit code
+    Find the output files in ``directory`` named the first of ``file_names`` (in priority order)
+    that there are any files for, listing the directory only once: at most one JSON or YAML file,
+    and any number of binary array files (see :func:`.load_arrays`). Returns [] if there are none.
     """
-    while (exit_code := p.poll()) is None:
-        for line in p.stdout:
-            logger.info(line.strip())
-        p.stdout.close()
-        for line in p.stderr:
-            logger.warning(line.strip())
-        p.stderr.close()
-        time.sleep(1)
-
+    if isinstance(file_names, str):
+        file_names = [file_names]
+    try:
+        with os.scandir(directory) as entries:
+            names = [entry.name for entry in entries]
+    except FileNotFoundError:
+        return []
+    for file_name in file_names:
+        output_files = sorted(name for name in names if is_output_file(name, [file_name]))
+        json_output_files = [name for name in output_files if pathlib.Path(name).suffix.lower() in JSONLIKE_SUFFIXES]
+        if len(json_output_files) > 1:
+            raise ValueError(f"{file_name} can only output one json or yaml output file")
+        elif output_files:
+            return [directory / name for name in output_files]
+    return []
+
+
+def _load_output_file(
+    directory: pathlib.Path, file_names: Iterable[str] | str, arrays: bool = True
+) -> dict | list | None:
+    """Load the files found by :func:`_find_output_files`, or return None if there are none.
+
+    The arrays of binary array files are added to what the JSON or YAML file (if any) holds,
+    nested by the dot separated parts of their names (see :func:`.nest_dotted_keys`).
+    Unless ``arrays``, binary array files are only checked for and not loaded.
+    """
+    output_files = _find_output_files(directory, file_names)
+    if not output_files:
+        return None
+    data = {}
+    array_files = []
+    for output_file in output_files:
+        if output_file.suffix.lower() in JSONLIKE_SUFFIXES:
+            # written out by the model, not a template
+            data = load_jsonlike(output_file, render_jinja=False)
+        else:
+            array_files.append(output_file)
+    if arrays and array_files:
+        if not isinstance(data, dict):
+            raise ValueError(f"Can't add the arrays of {array_files} to output that isn't a dict: {output_files}")
+        for array_file in array_files:
+            nest_dotted_keys(load_arrays(array_file), data)
+    return data
+
+
+def _parse_trial_status(data: dict) -> TrialStatus:
+    """the trial status in data, or completed if data has no trial status"""
+    trial_status_keys = [k for k in data.keys() if k.lower() == "trialstatus" or k.lower() == "trial_status"]
+    if not trial_status_keys:
+        return TrialStatus.COMPLETED
+    trial_status = data[trial_status_keys[0]]
+    # some languages jsonify dicts as 1 element lists sometimes
+    if isinstance(trial_status, list):
+        trial_status = trial_status[0]
+    try:
+        # convert trial_status to an enum for trial.mark_as
+        try:  # if it is an int or a str of an int this will work
+            return TrialStatus(int(trial_status))
+        # if it is a string of a trial status name ("completed" etc.), then get the TrialStatus enum version
+        except ValueError:
+            return TrialStatus[trial_status.upper()]
+    except (ValueError, KeyError, AttributeError) as e:
+        raise ValueError(f"Invalid trial status - {trial_status} - passed to `set_trial_status`") from e
+
+
+def _mark_failed_on_error(trial: Trial, exit_code: int):
+    """mark the trial as failed if its script command exits with a non-zero exit code"""
     if exit_code != 0:
         trial.mark_failed()
@@ -0,0 +1,239 @@
+"""
+########################
+Subprocess Engine
+########################
+
+A single asyncio event loop that owns every child process started by
+:class:`.ScriptWrapper`. It pumps each process's stdout and stderr into the BOA
+logger and resolves its exit code as a future, so the number of threads (and
+wake-ups) stays constant no matter how many trials are running at once.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+import subprocess
+import threading
+from typing import Callable, Optional
+
+from boa.definitions import IS_WINDOWS
+from boa.logger import get_logger
+from boa.resources import TRIAL_CPUS_ENV_VAR, pin_command_to_cpus, pin_to_cpus
+
+logger = get_logger()
+
+#: Seconds between checks of processes that closed their output but have not exited yet
+DEFAULT_POLL_INTERVAL = 0.5
+
+
+class SubprocessEngine:
+    """Start shell commands and watch them from one background event loop thread.
+
+    Parameters
+    ----------
+    poll_interval
+        Seconds between exit checks of processes that have closed their stdout and stderr
+        but have not exited yet.
+
+    Examples
+    --------
+    >>> import sys
+    >>> engine = SubprocessEngine()
+    >>> future = engine.start([sys.executable, "-c", "print('hello')"])
+    >>> future.result()
+    0
+    >>> engine.close()
+    """
+
+    def __init__(self, poll_interval: float = DEFAULT_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # futures of the processes watched by the event loop that have not resolved yet
+        self._pending: set[concurrent.futures.Future] = set()
+        self._watched: set[_WatchedProcess] = set()
+
+    def start(
+        self,
+        args: list[str],
+        on_exit: Optional[Callable[[int], None]] = None,
+        cpus: Optional[list[int]] = None,
+        **popen_kwargs,
+    ) -> concurrent.futures.Future:
+        """Start ``args`` as a child process.
+
+        Parameters
+        ----------
+        args
+            Command to run, split into a list (see :func:`.split_shell_command`)
+        on_exit
+            Called with the exit code of the process from the engine thread once the
+            process exits, before the returned future resolves.
+        cpus
+            CPU cores to pin the process to (see :mod:`boa.resources`), which are also
+            passed to it in the ``BOA_TRIAL_CPUS`` environment variable
+        **popen_kwargs
+            Extra keyword arguments for :class:`subprocess.Popen`
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to the exit code of the process
+        """
+        popen_kwargs.setdefault("stdin", subprocess.DEVNULL)
+        if cpus:
+            env = popen_kwargs.get("env") or os.environ
+            popen_kwargs["env"] = {**env, TRIAL_CPUS_ENV_VAR: ",".join(str(cpu) for cpu in cpus)}
+            # pinned by taskset before the command runs, so nothing it starts escapes the pinning
+            # (no preexec_fn, which isn't safe in a child forked from this multithreaded process)
+            args = pin_command_to_cpus(args, cpus)
+        p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **popen_kwargs)
+        # without taskset, the process can still be pinned once it has started
+        pin_to_cpus(p.pid, cpus)
+        future = concurrent.futures.Future()
+        if IS_WINDOWS:
+            # The Windows event loops can't watch pipes, so each process gets its own pump thread
+            t = threading.Thread(target=_pump_blocking, args=(p, future, on_exit), daemon=True)
+            t.start()
+        else:
+            loop = self._get_loop()
+            with self._lock:
+                self._pending.add(future)
+            future.add_done_callback(self._discard_pending)
+            loop.call_soon_threadsafe(_WatchedProcess, self, loop, p, future, on_exit)
+        return future
+
+    def close(self):
+        """Stop the engine thread. Processes that are still running are left running,
+        but their output is no longer logged, and their futures raise a :class:`RuntimeError`
+        (instead of never resolving)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+            pending, self._pending = self._pending, set()
+        # joined without the lock, as processes exiting meanwhile take it in _discard_pending
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stop_watching, loop)
+            thread.join()
+            loop.close()
+        for future in pending:
+            if not future.done():
+                future.set_exception(RuntimeError("The subprocess engine was closed before the process exited."))
+
+    def _stop_watching(self, loop: asyncio.AbstractEventLoop):
+        for watched in list(self._watched):
+            watched.stop()
+        loop.stop()
+
+    def _discard_pending(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            # the thread won't be alive in a forked child (such as a ``process`` run backend worker)
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.SelectorEventLoop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="BoaSubprocessEngine", daemon=True)
+                self._thread.start()
+            return self._loop
+
+
+class _WatchedProcess:
+    """Event loop side state of one child process"""
+
+    def __init__(
+        self,
+        engine: SubprocessEngine,
+        loop: asyncio.AbstractEventLoop,
+        p: subprocess.Popen,
+        future: concurrent.futures.Future,
+        on_exit: Optional[Callable[[int], None]],
+    ):
+        self.engine = engine
+        self.loop = loop
+        self.p = p
+        self.future = future
+        self.on_exit = on_exit
+        self.buffers = {}
+        self.streams = {}
+        engine._watched.add(self)
+        for stream, log in ((p.stdout, logger.info), (p.stderr, logger.warning)):
+            fd = stream.fileno()
+            os.set_blocking(fd, False)
+            self.buffers[fd] = b""
+            self.streams[fd] = stream
+            self.loop.add_reader(fd, self._read, stream, log)
+
+    def stop(self):
+        """Stop logging the output of the process (when the engine closes)"""
+        for fd, stream in self.streams.items():
+            self.loop.remove_reader(fd)
+            stream.close()
+        self.streams.clear()
+        self.engine._watched.discard(self)
+
+    def _read(self, stream, log):
+        fd = stream.fileno()
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        if data:
+            *lines, self.buffers[fd] = (self.buffers[fd] + data).split(b"\n")
+            for line in lines:
+                log(line.decode(errors="replace").strip())
+            return
+        # EOF
+        if self.buffers[fd]:
+            log(self.buffers.pop(fd).decode(errors="replace").strip())
+        else:
+            self.buffers.pop(fd)
+        self.loop.remove_reader(fd)
+        stream.close()
+        self.streams.pop(fd)
+        if not self.buffers:
+            self._check_exit()
+
+    def _check_exit(self):
+        exit_code = self.p.poll()
+        if exit_code is None:
+            self.loop.call_later(self.engine.poll_interval, self._check_exit)
+            return
+        self.engine._watched.discard(self)
+        _finish(self.future, exit_code, self.on_exit)
+
+
+def _pump_blocking(p: subprocess.Popen, future: concurrent.futures.Future, on_exit):
+    for stream, log in ((p.stdout, logger.info), (p.stderr, logger.warning)):
+        for line in stream:
+            log(line.decode(errors="replace").strip())
+        stream.close()
+    _finish(future, p.wait(), on_exit)
+
+
+def _finish(future: concurrent.futures.Future, exit_code: int, on_exit):
+    if on_exit is not None:
+        try:
+            on_exit(exit_code)
+        except Exception as e:
+            logger.exception(f"Error handling exit of subprocess: {e!r}")
+    future.set_result(exit_code)
+
+
+_engine: Optional[SubprocessEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_subprocess_engine() -> SubprocessEngine:
+    """Return the process wide :class:`SubprocessEngine`, creating it the first time"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SubprocessEngine()
+        return _engine
@@ -9,23 +9,29 @@ Utility tools for to ease model wrapping.
 
 from __future__ import annotations
 
+import copy
 import datetime as dt
-import json
+import hashlib
 import os
 import pathlib
 import shlex
+import threading
 from contextlib import contextmanager
 from functools import wraps
-from typing import TYPE_CHECKING, Type
+from typing import TYPE_CHECKING, Any, Type
 
+import numpy as np
+import pandas as pd
 from attrs import asdict
 from ax.core.base_trial import BaseTrial
+from ax.core.batch_trial import BatchTrial
 from ax.core.parameter import ChoiceParameter, FixedParameter, RangeParameter
 from ax.exceptions.core import AxError
 from ax.storage.json_store.encoder import object_to_json
 from ax.utils.common.docutils import copy_doc
 from ruamel.yaml import YAML
 
+from boa import json_codec
 from boa.definitions import IS_WINDOWS, PathLike, PathLike_tup
 from boa.logger import get_logger
 from boa.template import JinjaTemplateVars, render_template
@@ -47,6 +53,9 @@ PARAM_CLASSES = {
     "fixed": FixedParameter,
 }
 
+#: Name of the trial manifest file :func:`save_trial_data` writes in each trial directory
+MANIFEST_FILE = "manifest.json"
+
 
 @contextmanager
 def cd_and_cd_back(path: PathLike = None):
@@ -61,6 +70,9 @@ def cd_and_cd_back(path: PathLike = None):
         context manager (it will "cd" to this path before "cd" back to the
         original directory)
 
+    The working directory is shared by all threads of the process, so this isn't
+    for code that runs in many threads at once.
+
     Examples
     ========
     >>> starting_dir = os.getcwd()
@@ -214,7 +226,7 @@ def load_json_from_str(string: str, render_jinja: bool = True, **kwargs):
     """Load json from a string with optional jinja2 templating"""
     if render_jinja:
         string = render_template(string, **kwargs)
-    return json.loads(string)
+    return json_codec.loads(string)
 
 
 @copy_doc(load_json)
@@ -250,6 +262,61 @@ def load_jsonlike(file: PathLike, **kwargs) -> dict:
         )
 
 
+def load_arrays(file: PathLike) -> dict[str, np.ndarray]:
+    """Load the arrays of a ``.npy``, ``.npz`` or ``.parquet`` file, by name.
+
+    A ``.npz`` file holds an array for each of its keys, and a ``.parquet`` file
+    an array for each of its columns (reading it needs ``pyarrow`` or ``fastparquet``).
+    A ``.npy`` file holds one array, named by the part of the file name between the first dot
+    and the suffix (``output.rmse.y_pred.npy`` holds ``rmse.y_pred``). It is memory-mapped
+    read only instead of being read into memory.
+
+    Parameters
+    ----------
+    file
+        Path of the file to load
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+        The arrays, by name
+    """
+    file = pathlib.Path(file)
+    suffix = file.suffix.lower()
+    if suffix == ".npy":
+        _, _, name = file.name[: -len(file.suffix)].partition(".")
+        if not name:
+            raise ValueError(
+                f"Can't tell what the array of `{file}` is for."
+                " Name `.npy` files `<file name>.<metric name>.<argument name>.npy`, such as `output.rmse.y_pred.npy`."
+            )
+        return {name: np.load(file, mmap_mode="r", allow_pickle=False)}
+    elif suffix == ".npz":
+        with np.load(file, allow_pickle=False) as npz:
+            return {name: npz[name] for name in npz.files}
+    elif suffix == ".parquet":
+        df = pd.read_parquet(file)
+        return {str(column): df[column].to_numpy() for column in df.columns}
+    raise ValueError(f"Invalid array file format for file {file}. Use a `.npy`, `.npz` or `.parquet` file extension.")
+
+
+def nest_dotted_keys(flat: dict[str, Any], nested: dict = None) -> dict:
+    """Nest the values of ``flat`` by the dot separated parts of their keys,
+    into ``nested`` if given (updating it in place)
+
+    >>> nest_dotted_keys({"rmse.y_true": 1, "rmse.y_pred": 2, "mean": 3})
+    {'rmse': {'y_true': 1, 'y_pred': 2}, 'mean': 3}
+    """
+    nested = {} if nested is None else nested
+    for key, value in flat.items():
+        *parents, name = key.split(".")
+        level = nested
+        for parent in parents:
+            level = level.setdefault(parent, {})
+        level[name] = value
+    return nested
+
+
 def get_dt_now_as_str(fmt: str = "%Y%m%dT%H%M%S") -> str:
     """get the datetime as now as a str.
 
@@ -407,15 +474,37 @@ def save_trial_data(
     trial_dir: pathlib.Path = None,
     experiment_dir: PathLike = None,
     param_names: dict[str, list] = None,
+    manifest: TrialManifest = None,
     **kwargs,
 ):
     """Save trial data (trial.json, parameters.json and data.json) to
     either: supplied trial_dir or supplied experiment_dir / trial.index
+
+    For a :class:`~ax.core.batch_trial.BatchTrial`, parameters.json (and filtered_parameters.json)
+    map each arm name to the parameters of that arm, and the batch manifest arms.json
+    lists every arm of the batch in order, with its name, parameters and weight.
+
+    Files are written through the :class:`TrialManifest` of the trial directory, so only
+    files whose content changed since they were last saved are rewritten, and
+    manifest.json holds a hash of the content of each of them.
+
+    Parameters
+    ----------
+    manifest
+        Manifest of the trial directory to write the files through. Pass the same manifest
+        on every call for a trial to skip reading manifest.json back from the trial directory,
+        and to skip serializing the trial at all while its status, run metadata, arms,
+        and the other arguments are the same as the last call and the files haven't been modified.
     """
     param_names = param_names if param_names is not None else {}
     if not trial_dir:
         trial_dir = get_trial_dir(experiment_dir, trial.index)
         trial_dir.mkdir(parents=True, exist_ok=True)
+    if manifest is None or manifest.trial_dir != pathlib.Path(trial_dir):
+        manifest = TrialManifest(trial_dir)
+    inputs = _trial_data_inputs(trial, param_names, kwargs)
+    if manifest.is_current(inputs):
+        return trial_dir
     kw = {}
     for key, value in kwargs.items():
         try:
@@ -423,18 +512,23 @@ def save_trial_data(
         except (AxError, ValueError) as e:
             kw[key] = str(value)
             logger.warning(e)
-    parameters_jsn = object_to_json(trial.arm.parameters)
-    parameters_jsn.pop("__type", None)
-    filtered_parameters_jsn = {}
-    if param_names:
-        for metric, param_list in param_names.items():
-            try:
-                filtered_parameters_jsn[metric] = {param_name: parameters_jsn[param_name] for param_name in param_list}
-            except KeyError as e:
-                raise AxError(
-                    f"Parameter {metric} listed in `param_names` not found in trial parameters. "
-                    f"Available parameters are {list(parameters_jsn.keys())}"
-                ) from e
+    arms_jsn = None
+    if isinstance(trial, BatchTrial):
+        arms_jsn = [
+            {"arm_name": arm.name, "parameters": _parameters_to_json(arm.parameters), "weight": weight}
+            for arm, weight in trial.normalized_arm_weights().items()
+        ]
+        parameters_jsn = {arm["arm_name"]: arm["parameters"] for arm in arms_jsn}
+        filtered_parameters_jsn = {
+            metric: {name: _filter_parameters(params, metric, param_list) for name, params in parameters_jsn.items()}
+            for metric, param_list in param_names.items()
+        }
+        kw = {"arm_names": list(parameters_jsn), "arms": arms_jsn, **kw}
+    else:
+        parameters_jsn = _parameters_to_json(trial.arm.parameters)
+        filtered_parameters_jsn = {
+            metric: _filter_parameters(parameters_jsn, metric, param_list) for metric, param_list in param_names.items()
+        }
     trial_jsn = object_to_json(trial)
     data = {
         "parameters": parameters_jsn,
@@ -445,12 +539,200 @@ def save_trial_data(
         "param_names": param_names,
         **kw,
     }
+    files = {}
     for name, jsn in zip(
-        ["parameters", "trial", "data", "filtered_parameters"],
-        [parameters_jsn, trial_jsn, data, filtered_parameters_jsn],
+        ["parameters", "trial", "data", "filtered_parameters", "arms"],
+        [parameters_jsn, trial_jsn, data, filtered_parameters_jsn, arms_jsn],
     ):
         if jsn:
-            file_path = trial_dir / f"{name}.json"
-            with open(file_path, "w+") as file:  # pragma: no cover
-                file.write(json.dumps(jsn, indent=4))
+            files[f"{name}.json"] = jsn
+    manifest.update(files, inputs=inputs)
     return trial_dir
+
+
+def _trial_data_inputs(trial: BaseTrial, param_names: dict, kwargs: dict) -> tuple:
+    """what the files :func:`save_trial_data` writes depend on that changes over the life of a trial,
+    cheap to compare without serializing the trial"""
+    return (
+        trial.status,
+        trial.time_run_started,
+        trial.time_completed,
+        dict(trial.run_metadata),
+        # the parameters of an arm are never changed in place, only replaced
+        tuple((arm.name, id(arm._parameters)) for arm in trial.arms),
+        param_names,
+        kwargs,
+    )
+
+
+class TrialManifest:
+    """Tracks the data files :func:`save_trial_data` writes in a trial directory,
+    so each file is only rewritten when its content changes.
+
+    Files are written with compact JSON encoding, to a temporary file that is then
+    renamed over the old file, so scripts never read a partially written file.
+    After the files, ``manifest.json`` is written, which holds a hash of each file's content
+    and a hash of all of them together:
+
+    .. code-block:: none
+
+        {"hash": "9f2c...", "files": {"parameters.json": "1b7e...", "trial.json": "c04a...", ...}}
+
+    Scripts that are called for the same trial many times (such as a ``set_trial_status``
+    script) can keep the last ``hash`` they saw and skip re-reading the other files
+    while it hasn't changed.
+
+    Parameters
+    ----------
+    trial_dir
+        Trial directory the files are written to
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> manifest = TrialManifest(tempfile.mkdtemp())
+    >>> manifest.update({"parameters.json": {"x": 1}, "trial.json": {"status": "RUNNING"}})
+    ['parameters.json', 'trial.json']
+    >>> manifest.update({"parameters.json": {"x": 1}, "trial.json": {"status": "COMPLETED"}})
+    ['trial.json']
+    >>> manifest.content_hash == TrialManifest(manifest.trial_dir).content_hash
+    True
+    """
+
+    def __init__(self, trial_dir: PathLike):
+        self.trial_dir = pathlib.Path(trial_dir)
+        self._hashes: dict[str, str] | None = None
+        self._inputs = None
+        self._mtimes: dict[str, int | None] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_lock", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def hashes(self) -> dict[str, str]:
+        """Content hash of each file in the manifest"""
+        if self._hashes is None:
+            self._hashes = self._load_hashes()
+        return self._hashes
+
+    @property
+    def content_hash(self) -> str:
+        """Hash of the content of all files in the manifest"""
+        return _hash_bytes(json_codec.dumps(self.hashes, sort_keys=True))
+
+    def is_current(self, inputs) -> bool:
+        """Whether the files were last written from the same ``inputs`` (see :meth:`update`),
+        and none of them have been modified since"""
+        with self._lock:
+            if self._inputs is None:
+                return False
+            try:
+                same = bool(self._inputs == inputs)
+            except Exception:  # inputs that can't be compared, such as arrays
+                return False
+            return same and self._mtimes == self._file_mtimes()
+
+    def update(self, files: dict[str, dict | list], inputs=None) -> list[str]:
+        """Write the files whose content changed since they were last written.
+
+        Parameters
+        ----------
+        files
+            JSON serializable content of each file, by file name
+        inputs
+            What the content of the files was made from, to check with :meth:`is_current`
+            before making the files again. Copied, so later changes to it are noticed.
+
+        Returns
+        -------
+        list[str]
+            Names of the files that were written
+        """
+        encoded = {name: _dumps_compact(jsn) for name, jsn in files.items()}
+        with self._lock:
+            hashes = self.hashes
+            written = []
+            for name, content in encoded.items():
+                content_hash = _hash_bytes(content)
+                if hashes.get(name) == content_hash and (self.trial_dir / name).exists():
+                    continue
+                write_file_atomic(self.trial_dir / name, content)
+                hashes[name] = content_hash
+                written.append(name)
+            if written:
+                manifest = {"hash": self.content_hash, "files": hashes}
+                write_file_atomic(self.trial_dir / MANIFEST_FILE, _dumps_compact(manifest))
+            try:
+                self._inputs = copy.deepcopy(inputs)
+            except Exception:  # can't be copied, so always make the files again
+                self._inputs = None
+            self._mtimes = self._file_mtimes()
+        return written
+
+    def _file_mtimes(self) -> dict[str, int | None]:
+        mtimes = {}
+        for name in [*self.hashes, MANIFEST_FILE]:
+            try:
+                mtimes[name] = (self.trial_dir / name).stat().st_mtime_ns
+            except OSError:
+                mtimes[name] = None
+        return mtimes
+
+    def _load_hashes(self) -> dict[str, str]:
+        """hashes of a manifest.json written before (by another process or a manifest before a restart),
+        only trusting files that are still there"""
+        try:
+            with open(self.trial_dir / MANIFEST_FILE, "rb") as f:
+                hashes = json_codec.loads(f.read())["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return {}
+        return {name: content_hash for name, content_hash in hashes.items() if (self.trial_dir / name).exists()}
+
+
+def write_file_atomic(path: PathLike, content: bytes):
+    """Write ``content`` to a temporary file next to ``path`` and rename it to ``path``,
+    so readers only ever see the old or the new content of the file"""
+    path = pathlib.Path(path)
+    # not tempfile.mkstemp, so the file gets the same permissions a regular open would give it
+    tmp_path = path.parent / f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _dumps_compact(jsn) -> bytes:
+    return json_codec.dumps(jsn)
+
+
+def _hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def _parameters_to_json(parameters: dict) -> dict:
+    parameters_jsn = object_to_json(parameters)
+    parameters_jsn.pop("__type", None)
+    return parameters_jsn
+
+
+def _filter_parameters(parameters_jsn: dict, metric: str, param_list: list[str]) -> dict:
+    try:
+        return {param_name: parameters_jsn[param_name] for param_name in param_list}
+    except KeyError as e:
+        raise AxError(
+            f"Parameter {metric} listed in `param_names` not found in trial parameters. "
+            f"Available parameters are {list(parameters_jsn.keys())}"
+        ) from e
@@ -0,0 +1,91 @@
+import json
+import sys
+import time
+
+from ax.core.base_trial import TrialStatus
+
+from boa import (
+    ArrayJobRunner,
+    Controller,
+    JobState,
+    LocalBatchQueue,
+    ScriptWrapper,
+    load_batch_queue,
+)
+
+RUN_MODEL_SCRIPT = """
+import json
+import pathlib
+import sys
+import time
+
+trial_dir = pathlib.Path(sys.argv[-1])
+trial_index = int(trial_dir.name)
+if trial_index == 0:
+    time.sleep(5)
+elif trial_index == 2:
+    sys.exit(1)
+(trial_dir / "output.json").write_text(json.dumps({"rmse": {"y_true": [1, 2], "y_pred": [1, 3]}}))
+"""
+
+
+def wait_for_jobs(queue, job_ids, timeout=10):
+    start = time.monotonic()
+    while not all(state.is_finished for state in queue.poll(job_ids).values()):
+        assert time.monotonic() - start < timeout
+        time.sleep(0.05)
+
+
+def test_local_batch_queue_runs_n_slots_jobs_at_a_time():
+    queue = load_batch_queue("local", n_slots=2)
+    assert isinstance(queue, LocalBatchQueue)
+    job_ids = queue.submit_array([[sys.executable, "-c", "import time; time.sleep(0.5)"]] * 3)
+    states = list(queue.poll(job_ids).values())
+    assert states.count(JobState.RUNNING) == 2
+    assert states.count(JobState.PENDING) == 1
+
+    wait_for_jobs(queue, job_ids)
+    assert set(queue.poll(job_ids).values()) == {JobState.COMPLETED}
+    # jobs the queue doesn't know about are left out
+    assert queue.poll(["unknown"]) == {}
+
+
+def test_array_job_runner_only_polls_trials_with_finished_jobs(generic_config, tmp_path, monkeypatch):
+    script = tmp_path / "run_model.py"
+    script.write_text(RUN_MODEL_SCRIPT)
+    generic_config.script_options.run_model = f"{sys.executable} {script}"
+    generic_config.script_options.batch_queue = "local"
+    generic_config.script_options.batch_queue_options = {"n_slots": 3}
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    experiment = controller.experiment
+    runner = experiment.runner
+    assert isinstance(runner, ArrayJobRunner)
+
+    trials = [
+        experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment)) for _ in range(3)
+    ]
+    run_metadata = runner.run_multiple(trials)
+    array_ids = set()
+    for trial in trials:
+        trial.update_run_metadata(run_metadata[trial.index])
+        trial.mark_running(no_runner_required=True)
+        array_id, _, array_index = trial.run_metadata["job_id"].partition("_")
+        assert int(array_index) == trial.run_metadata["array_index"]
+        array_ids.add(array_id)
+    # all trials deployed together are submitted as one array job
+    assert len(array_ids) == 1
+    wait_for_jobs(runner.batch_queue, [trial.run_metadata["job_id"] for trial in trials[1:]])
+
+    polled = []
+    set_trial_statuses = controller.wrapper.set_trial_statuses
+    monkeypatch.setattr(
+        controller.wrapper, "set_trial_statuses", lambda ts: polled.extend(ts) or set_trial_statuses(ts)
+    )
+    status_dict = runner.poll_trial_status(trials)
+
+    assert polled == [trials[1]]
+    assert status_dict[TrialStatus.RUNNING] == {trials[0].index}
+    assert status_dict[TrialStatus.COMPLETED] == {trials[1].index}
+    assert status_dict[TrialStatus.FAILED] == {trials[2].index}
+    assert json.loads((controller.wrapper.experiment_dir / "000001" / "output.json").read_text())
@@ -0,0 +1,57 @@
+import json
+import sys
+import time
+
+import pytest
+
+from boa.wrappers.file_watcher import TrialFileWatcher
+from boa.wrappers.wrapper_utils import make_trial_dir
+
+FILE_NAMES = ("trial_status", "output")
+
+linux_only = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only on Linux")
+
+
+@linux_only
+def test_watcher_wakes_on_trial_files_in_new_trial_dirs(tmp_path):
+    watcher = TrialFileWatcher(tmp_path, file_names=FILE_NAMES)
+    try:
+        assert watcher.available
+        trial_dir = make_trial_dir(tmp_path, 3)
+        # files that aren't trial status or output files don't wake it
+        (trial_dir / "parameters.json").write_text("{}")
+        (trial_dir / "output.json.j2").write_text("{}")
+        assert not watcher.wait(0.2)
+
+        start = time.monotonic()
+        (trial_dir / "output.json").write_text(json.dumps({"a": 1}))
+        assert watcher.wait(5)
+        assert time.monotonic() - start < 5
+        assert list(watcher.pop_updated_trials([3])) == [3]
+        assert watcher.pop_updated_trials([3]) == {}
+    finally:
+        watcher.close()
+
+
+@linux_only
+def test_watcher_picks_up_files_written_before_it_started(tmp_path):
+    trial_dir = make_trial_dir(tmp_path, 0)
+    (trial_dir / "trial_status.json").write_text(json.dumps({"trial_status": "COMPLETED"}))
+    make_trial_dir(tmp_path, 1)
+
+    watcher = TrialFileWatcher(tmp_path, file_names=FILE_NAMES)
+    try:
+        assert list(watcher.pop_updated_trials([0, 1])) == [0]
+    finally:
+        watcher.close()
+
+
+def test_watcher_falls_back_to_sleeping_when_unavailable(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "platform", "win32")
+    watcher = TrialFileWatcher(tmp_path, file_names=FILE_NAMES)
+    assert not watcher.available
+    assert watcher.pop_updated_trials([0]) is None
+
+    start = time.monotonic()
+    assert not watcher.wait(0.1)
+    assert time.monotonic() - start >= 0.1
@@ -1,5 +1,6 @@
 from boa import BOAConfig, load_json_from_str, load_jsonlike, load_yaml_from_str
 from boa.definitions import ROOT, PathLike
+from boa.template import compile_template, render_template
 
 TEST_CONFIG_DIR = ROOT / "tests" / "test_configs"
 
@@ -41,3 +42,13 @@ def test_template_with_commented_out_vars_in_style_of_config_format():
     """
     config = load_json_from_str(json_config)
     assert config["x"] == 1
+
+
+def test_compiled_templates_are_reused():
+    template_kw = {"extensions": ["jinja2.ext.loopcontrols"]}
+    source = "{% for i in range(3) %}{% if i == 1 %}{% break %}{% endif %}{{ x }}{% endfor %}"
+    assert compile_template(source, template_kw) is compile_template(source, dict(template_kw))
+    assert render_template(source, template_kw, x=1) == "1"
+    assert render_template(source, template_kw, x=2) == "2"
+    # the caller's options are not modified
+    assert template_kw == {"extensions": ["jinja2.ext.loopcontrols"]}
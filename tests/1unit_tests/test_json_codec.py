@@ -0,0 +1,61 @@
+import json
+import math
+
+import numpy as np
+import pytest
+
+from boa.json_codec import JSONCodec, OrjsonCodec, get_json_codec, set_json_codec
+
+CODECS = [
+    JSONCodec,
+    pytest.param(OrjsonCodec, marks=pytest.mark.skipif("not __import__('importlib').util.find_spec('orjson')")),
+]
+
+
+@pytest.mark.parametrize("Codec", CODECS)
+def test_codecs_round_trip_numpy_and_non_finite_floats(Codec):
+    codec = Codec()
+    obj = {
+        "array": np.linspace(0, 1, 5),
+        "ints": np.arange(3, dtype=np.int32),
+        "scalar": np.float32(0.5),
+        "int_keys": {1: "a"},
+        "nested": [{"x": 1.5, "y": None, "z": "é"}],
+    }
+    decoded = codec.loads(codec.dumps(obj))
+    assert decoded == {
+        "array": [0.0, 0.25, 0.5, 0.75, 1.0],
+        "ints": [0, 1, 2],
+        "scalar": 0.5,
+        "int_keys": {"1": "a"},
+        "nested": [{"x": 1.5, "y": None, "z": "é"}],
+    }
+    # readable by the standard library, indented or not
+    assert json.loads(codec.dumps(obj, indent=True)) == decoded
+
+    # NaN and infinity are kept, not turned into null
+    decoded = codec.loads(codec.dumps({"mean": [float("nan")], "sem": np.array([np.inf])}))
+    assert math.isnan(decoded["mean"][0]) and decoded["sem"] == [math.inf]
+    decoded = codec.loads(codec.dumps({"mean": [float("nan"), None], "array": np.arange(2.0)}, indent=True))
+    assert math.isnan(decoded["mean"][0]) and decoded["mean"][1] is None and decoded["array"] == [0.0, 1.0]
+    # and files written by the standard library with them can be read
+    assert math.isnan(codec.loads(json.dumps({"mean": float("nan")}))["mean"])
+
+    assert codec.dumps({"b": 1, "a": 2}, sort_keys=True) == b'{"a":2,"b":1}'
+
+
+def test_json_codec_can_be_picked(monkeypatch):
+    try:
+        set_json_codec("json")
+        assert type(get_json_codec()) is JSONCodec
+
+        monkeypatch.setenv("BOA_JSON_CODEC", "json")
+        set_json_codec(None)
+        assert type(get_json_codec()) is JSONCodec
+
+        monkeypatch.setenv("BOA_JSON_CODEC", "not_a_codec")
+        set_json_codec(None)
+        with pytest.raises(ValueError):
+            get_json_codec()
+    finally:
+        set_json_codec(None)
@@ -0,0 +1,98 @@
+import time
+
+import numpy as np
+
+from boa import BaseWrapper, Controller, ModularMetric
+from boa.metric_cache import MetricCache, payload_nbytes
+
+
+class CountingFetchWrapper(BaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fetched = []
+
+    def run_model(self, trial) -> None:
+        pass
+
+    def set_trial_status(self, trial) -> None:
+        trial.mark_completed()
+
+    def fetch_trial_data(self, trial, metric_properties, metric_name, *args, **kwargs):
+        self.fetched.append(trial.index)
+        idx = trial.index + 1
+        return {
+            "Meanyyy": {"a": idx * np.array([-0.3691, 4.6544, 1.2675, -0.4327])},
+            "RMSE": {
+                "y_true": idx * np.array([1.12, 1.25, 2.54, 4.52]),
+                "y_pred": idx * np.array([1.51, 1.01, 2.21, 4.50]),
+            },
+        }
+
+
+def test_metric_cache_evicts_least_recently_used_and_expired_entries():
+    payload = {"y_true": np.zeros(1000), "y_pred": np.zeros(1000)}
+    cache = MetricCache(max_bytes=3 * payload_nbytes(payload))
+    for i in range(3):
+        cache[i] = payload
+    cache[0]
+    assert 1 in cache  # checking doesn't make it the most recently used
+    cache[3] = payload
+    assert list(cache) == [2, 0, 3]
+    assert cache.nbytes == 3 * payload_nbytes(payload)
+    assert 1 not in cache
+
+    cache = MetricCache(max_age=0.05)
+    cache[0] = payload
+    assert 0 in cache
+    time.sleep(0.1)
+    assert 0 not in cache
+    assert cache.get(0) is None and len(cache) == 0
+
+
+def test_metric_cache_persists_and_invalidates(tmp_path):
+    cache = MetricCache(max_bytes=1, path=tmp_path)
+    cache[0] = {"mean": [1.5], "sem": [float("nan")]}
+    cache[1] = {"mean": [2.5], "sem": [0.0]}
+    # evicted from memory, but read back from disk
+    assert list(cache) == [1]
+    assert cache[0]["mean"] == [1.5] and np.isnan(cache[0]["sem"][0])
+    assert MetricCache(path=tmp_path)[1] == {"mean": [2.5], "sem": [0.0]}
+
+    cache.invalidate(0)
+    assert 0 not in cache and 0 not in MetricCache(path=tmp_path)
+    cache.invalidate()
+    assert 1 not in MetricCache(path=tmp_path)
+
+
+def test_metric_cache_restores_persisted_arrays(tmp_path):
+    cache = MetricCache(path=tmp_path)
+    cache[0] = {"y_pred": np.arange(4, dtype=np.float32).reshape(2, 2), "y_true": [1.0, 2.0], "sem": 0.5}
+
+    value = MetricCache(path=tmp_path)[0]
+    assert isinstance(value["y_pred"], np.ndarray) and value["y_pred"].dtype == np.float32
+    np.testing.assert_array_equal(value["y_pred"], cache[0]["y_pred"])
+    assert value["y_true"] == [1.0, 2.0] and value["sem"] == 0.5
+
+
+def test_persisted_metric_data_is_reused_by_a_resumed_metric(moo_config, tmp_path):
+    moo_config.script_options.persist_metric_cache = True
+    controller = Controller(config=moo_config, wrapper=CountingFetchWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    experiment = controller.experiment
+    wrapper = controller.wrapper
+
+    trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+    trial.mark_running(no_runner_required=True).mark_completed()
+    metric = experiment.metrics["RMSE"]
+    df = metric.fetch_trial_data(trial).value.df
+    assert wrapper.fetched == [trial.index]
+
+    # a metric of a resumed optimization reads the data back instead of fetching it again
+    resumed = ModularMetric(metric_to_eval=metric.metric_to_eval, name="RMSE", wrapper=wrapper)
+    assert resumed.fetch_trial_data(trial).value.df["mean"].equals(df["mean"])
+    assert wrapper.fetched == [trial.index]
+
+    resumed.invalidate_cache(trial.index)
+    wrapper.invalidate_metric_cache(trial.index)
+    resumed.fetch_trial_data(trial)
+    assert wrapper.fetched == [trial.index, trial.index]
@@ -1,11 +1,16 @@
+import threading
+
 import numpy as np
+import pandas as pd
 import pytest
-from ax import MultiObjectiveOptimizationConfig, OptimizationConfig
+from ax import Data, Metric, MultiObjectiveOptimizationConfig, OptimizationConfig
+from ax.utils.common.result import Ok
 
 from boa import (
     BaseWrapper,
     BOAMetric,
     Controller,
+    ModularMetric,
     get_metric_by_class_name,
     get_metric_from_config,
     setup_sklearn_metric,
@@ -45,6 +50,29 @@ class WrapperForTestss(BaseWrapper):
                 }
 
 
+class MetricOverridesFetch(ModularMetric):
+    def fetch_trial_data(self, trial, **kwargs):
+        trial_data = super().fetch_trial_data(trial, **kwargs)
+        trial_data.value.df["source"] = "override"
+        return trial_data
+
+
+class ArmOffsetMetric(Metric):
+    """ax metric fetching every arm of a trial at once, as the ``offset`` it is given"""
+
+    def fetch_trial_data(self, trial, offset=0.0):
+        arm_names = list(trial.arms_by_name)
+        df = pd.DataFrame(
+            {"arm_name": arm_names, "metric_name": self.name, "mean": offset, "sem": 0.0, "trial_index": trial.index}
+        )
+        return Ok(Data(df=df))
+
+
+class WrapperBatchOffsets(WrapperForTestss):
+    def fetch_trial_data(self, trial, metric_properties, metric_name, *args, **kwargs):
+        return {arm_name: {"offset": float(i)} for i, arm_name in enumerate(trial.arms_by_name)}
+
+
 class WrapperPassThrough(WrapperForTestss):
     def fetch_trial_data(self, trial, metric_properties, metric_name, *args, **kwargs):
         return trial.index
@@ -201,3 +229,136 @@ def test_can_override_metric_func_kwargs():
         returns.append(metric.f(x, y))
     # All the normalized values should be different, ensuring that the kwargs are passed through
     assert len(set(returns)) == len(normalizers)
+
+
+def test_fetch_experiment_data_multi_evaluates_trials_in_one_batch(moo_config, tmp_path):
+    controller = Controller(config=moo_config, wrapper=WrapperForTestss, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    scheduler = controller.scheduler
+    experiment = controller.experiment
+    wrapper = controller.wrapper
+
+    trials = []
+    for _ in range(5):
+        trial = experiment.new_trial(generator_run=scheduler.generation_strategy.gen(experiment))
+        trial.mark_running(no_runner_required=True).mark_completed()
+        trials.append(trial)
+
+    results = ModularMetric.fetch_experiment_data_multi(experiment, list(experiment.metrics.values()), trials=trials)
+
+    assert list(results) == [trial.index for trial in trials]
+    for trial in trials:
+        for name, metric in experiment.metrics.items():
+            df = results[trial.index][name].value.df
+            kw = dict(wrapper._metric_cache[trial.index][name])
+            sem = kw.pop("sem", None)
+            assert df["mean"].iloc[0] == metric.f(**kw)
+            assert df["trial_index"].iloc[0] == trial.index
+            # the columns NoisyFunctionMetric fills in
+            assert df["n"].iloc[0] == 10000 and df["frac_nonnull"].iloc[0] == df["mean"].iloc[0]
+            if sem:
+                assert df["sem"].iloc[0] == sem
+            # cached for the next fetch of the trial
+            assert metric.fetch_trial_data(trial).value.df.equals(df)
+
+    calls = []
+
+    def mean_of_each(a):
+        calls.append(a)
+        return np.mean(a, axis=-1)
+
+    # a vectorized metric is called once, with the arrays of all trials stacked
+    vectorized = ModularMetric(metric_to_eval=mean_of_each, name="Meanyyy", wrapper=wrapper, vectorized=True)
+    vectorized_results = vectorized.fetch_trials_data(trials)
+    assert len(calls) == 1 and calls[0].shape == (len(trials), 4)
+    for trial in trials:
+        assert vectorized_results[trial.index].value.df["mean"].iloc[0] == pytest.approx(
+            results[trial.index]["Meanyyy"].value.df["mean"].iloc[0]
+        )
+
+
+def test_fetch_experiment_data_multi_uses_overridden_fetch_trial_data(moo_config, tmp_path):
+    controller = Controller(config=moo_config, wrapper=WrapperForTestss, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+    trial.mark_running(no_runner_required=True).mark_completed()
+    metric = MetricOverridesFetch(metric_to_eval=np.mean, name="Meanyyy", wrapper=controller.wrapper)
+
+    results = ModularMetric.fetch_experiment_data_multi(experiment, [metric], trials=[trial])
+
+    assert results[trial.index]["Meanyyy"].value.df["source"].iloc[0] == "override"
+
+
+def test_fetching_metrics_concurrently_fetches_each_trial_once_without_mutating_arms(moo_config, tmp_path, monkeypatch):
+    controller = Controller(config=moo_config, wrapper=WrapperForTestss, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    scheduler = controller.scheduler
+    experiment = controller.experiment
+    wrapper = controller.wrapper
+    wrapper.script_options.fetch_workers = 4
+
+    fetched = []
+    fetch_trial_data = wrapper.fetch_trial_data
+
+    def counting_fetch_trial_data(trial, *args, **kwargs):
+        fetched.append(trial.index)
+        return fetch_trial_data(trial, *args, **kwargs)
+
+    wrapper.fetch_trial_data = counting_fetch_trial_data
+
+    trials = []
+    for _ in range(8):
+        trial = experiment.new_trial(generator_run=scheduler.generation_strategy.gen(experiment))
+        trial.mark_running(no_runner_required=True).mark_completed()
+        trials.append(trial)
+    parameters = {trial.index: trial.arm.parameters for trial in trials}
+
+    evaluated_by = []
+    evaluate = ModularMetric._evaluate
+
+    def recording_evaluate(self, params, **kwargs):
+        evaluated_by.append(threading.current_thread().name)
+        return evaluate(self, params, **kwargs)
+
+    monkeypatch.setattr(ModularMetric, "_evaluate", recording_evaluate)
+
+    metrics = list(experiment.metrics.values())
+    assert all(metric.fetch_workers == 4 for metric in metrics)
+    results = ModularMetric.fetch_experiment_data_multi(experiment, metrics, trials=trials)
+
+    # the wrapper returns every metric at once, so each trial is fetched once for all of them
+    assert sorted(fetched) == sorted(parameters)
+    # and the metrics are evaluated by the same threads
+    assert len(evaluated_by) == len(trials) * len(metrics)
+    # the trials share a fixed number of fetch locks, instead of one each that is kept forever
+    n_locks = len(wrapper._fetch_locks)
+    assert wrapper._trial_fetch_lock(trials[0].index) is wrapper._trial_fetch_lock(trials[0].index + n_locks)
+    assert all(name.startswith("BoaFetch") for name in evaluated_by)
+    for trial in trials:
+        assert trial.arm.parameters == parameters[trial.index]
+        for name, metric in experiment.metrics.items():
+            kw = dict(wrapper._metric_cache[trial.index][name])
+            kw.pop("sem", None)
+            assert results[trial.index][name].value.df["mean"].iloc[0] == metric.f(**kw)
+
+
+def test_ax_metric_gets_what_the_wrapper_returned_for_each_arm_of_a_batch_trial(moo_config, tmp_path):
+    controller = Controller(config=moo_config, wrapper=WrapperBatchOffsets, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    generator_run = controller.scheduler.generation_strategy.gen(experiment, n=3)
+    trial = experiment.new_batch_trial(generator_run=generator_run)
+    trial.mark_running(no_runner_required=True).mark_completed()
+    metric = ModularMetric(metric_to_eval=ArmOffsetMetric(name="Meanyyy"), name="Meanyyy", wrapper=controller.wrapper)
+
+    df = metric.fetch_trial_data(trial).value.df
+
+    # each arm is evaluated with what the wrapper returned for it, not with none of it
+    offsets = {arm_name: float(i) for i, arm_name in enumerate(trial.arms_by_name)}
+    assert len(df) == len(offsets)
+    assert dict(zip(df["arm_name"], df["mean"])) == offsets
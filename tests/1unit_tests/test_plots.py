@@ -1,7 +1,12 @@
 import panel as pn
 import plotly.graph_objs as go
+import pytest
 
+import boa.readonly_scheduler
+import boa.runner
+from boa import ReadOnlyScheduler, WrappedJobRunner, scheduler_to_json_file
 from boa.plotting import (
+    app_view,
     plot_contours,
     plot_metrics_trace,
     plot_pareto_frontier,
@@ -25,3 +30,62 @@ def test_moo_can_create_plots(moo_main_run):
     scheduler = moo_main_run
     pareto_frontier = plot_pareto_frontier(scheduler)
     assert isinstance(pareto_frontier, pn.reactive.Reactive)
+
+
+def test_plots_from_saved_scheduler_only_refit_model_when_needed(branin_main_run, tmp_path):
+    scheduler_path = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, scheduler_path)
+    scheduler = ReadOnlyScheduler(scheduler_path)
+
+    assert scheduler.wrapper is None
+    assert len(scheduler.data.df) == len(branin_main_run.experiment.lookup_data().df)
+    assert set(scheduler.metrics) == set(branin_main_run.experiment.metrics)
+    assert scheduler.model_transitions == branin_main_run.generation_strategy.model_transitions
+    assert not scheduler.is_moo_problem
+    assert "experiment" not in scheduler.__dict__
+
+    trace = plot_metrics_trace(scheduler)
+    assert isinstance(trace, pn.reactive.Reactive)
+    app_view(scheduler)
+    assert "experiment" not in scheduler.__dict__
+    assert "model" not in scheduler.__dict__
+
+    slice = plot_slice(scheduler)
+    assert isinstance(slice, pn.reactive.Reactive)
+    assert "model" in scheduler.__dict__
+
+
+def test_saved_scheduler_can_be_decoded_again_after_a_decode_error(branin_main_run, tmp_path, monkeypatch):
+    scheduler_path = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, scheduler_path)
+    scheduler = ReadOnlyScheduler(scheduler_path)
+
+    def failing_generation_strategy_from_json(*args, **kwargs):
+        raise ValueError("Can't decode")
+
+    monkeypatch.setattr(boa.readonly_scheduler, "generation_strategy_from_json", failing_generation_strategy_from_json)
+    with pytest.raises(ValueError):
+        scheduler.generation_strategy
+    monkeypatch.undo()
+
+    assert scheduler.generation_strategy.last_generator_run is not None
+    assert len(scheduler.experiment.trials) == len(branin_main_run.experiment.trials)
+
+
+def test_saved_scheduler_is_viewed_without_starting_runner_processes(branin_main_run, tmp_path, monkeypatch):
+    scheduler_path = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, scheduler_path)
+    assert isinstance(branin_main_run.experiment.runner, WrappedJobRunner)
+
+    def no_manager(*args, **kwargs):
+        raise AssertionError("viewing a saved scheduler started a multiprocessing manager")
+
+    monkeypatch.setattr(boa.runner.multiprocessing, "Manager", no_manager)
+    scheduler = ReadOnlyScheduler(scheduler_path)
+    plot_slice(scheduler)
+
+    experiment = scheduler.experiment
+    runners = [experiment.runner, *(trial.runner for trial in experiment.trials.values())]
+    assert not any(isinstance(runner, WrappedJobRunner) for runner in runners)
+    with pytest.raises(NotImplementedError):
+        experiment.runner.run(experiment.trials[0])
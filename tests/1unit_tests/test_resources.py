@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+from ax.core.base_trial import TrialStatus
+
+from boa import Controller, ScriptWrapper
+from boa.resources import ResourcePool, TrialResources, evaluate_trial_resources
+from boa.runner import ADMITTED_KEY
+from boa.wrappers.wrapper_utils import get_trial_dir
+
+RUN_MODEL_SCRIPT = """
+import json
+import os
+import pathlib
+import sys
+
+trial_dir = pathlib.Path(sys.argv[-1])
+cpus = {
+    "env": os.environ.get("BOA_TRIAL_CPUS"),
+    "affinity": sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else None,
+}
+(trial_dir / "cpus.json").write_text(json.dumps(cpus))
+(trial_dir / "output.json").write_text(json.dumps({"rmse": {"y_true": [1, 2], "y_pred": [1, 3]}}))
+"""
+
+
+def test_resource_pool_packs_mixed_size_trials():
+    pool = ResourcePool(cpus=4)
+    assert len(pool.acquire(0, TrialResources(cpus=3))) == 3
+    assert len(pool.acquire(1, TrialResources(cpus=1))) == 1
+    assert pool.acquire(2, TrialResources(cpus=1)) is None
+
+    pool.release(1)
+    assert pool.acquire(2, TrialResources(cpus=1)) is not None
+    # more than the whole pool only runs when the pool is idle
+    assert pool.acquire(3, TrialResources(cpus=8)) is None
+    pool.release(0)
+    pool.release(2)
+    assert len(pool.acquire(3, TrialResources(cpus=8))) == 4
+
+
+def test_trial_resources_must_be_known():
+    with pytest.raises(ValueError):
+        evaluate_trial_resources({"gpus": 1}, {})
+
+
+def test_runner_admits_trials_when_resource_pool_has_room(generic_config, tmp_path):
+    script = tmp_path / "run_model.py"
+    script.write_text(RUN_MODEL_SCRIPT)
+    generic_config.script_options.run_model = f"{sys.executable} {script}"
+    generic_config.script_options.trial_resources = {"cpus": "1 + 1", "memory": 100}
+    generic_config.script_options.resource_pool = {"cpus": 3, "memory": 1000}
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    experiment = controller.experiment
+    runner = experiment.runner
+
+    trials = [
+        experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment)) for _ in range(3)
+    ]
+    run_metadata = runner.run_multiple(trials)
+    for trial in trials:
+        trial.update_run_metadata(run_metadata[trial.index])
+        trial.mark_running(no_runner_required=True)
+
+    # only the first trial fits in the pool, the others wait
+    assert len(trials[0].run_metadata["cpus"]) == 2
+    assert runner.waiting_trials == trials[1:]
+    assert [trial.run_metadata[ADMITTED_KEY] for trial in trials] == [True, False, False]
+    assert runner.poll_available_capacity() == 0
+
+    output = get_trial_dir(controller.wrapper.experiment_dir, trials[0].index) / "output.json"
+    start = time.monotonic()
+    while not output.exists():
+        assert time.monotonic() - start < 10
+        time.sleep(0.05)
+    status_dict = runner.poll_trial_status(trials)
+
+    assert status_dict[TrialStatus.COMPLETED] == {trials[0].index}
+    assert "cpus" in trials[1].run_metadata and trials[1].run_metadata[ADMITTED_KEY]
+    assert runner.waiting_trials == trials[2:]
+
+    cpus = json.loads((output.parent / "cpus.json").read_text())
+    assert cpus["env"] == ",".join(str(cpu) for cpu in trials[0].run_metadata["cpus"])
+    if hasattr(os, "sched_getaffinity"):
+        assert set(cpus["affinity"]) == set(trials[0].run_metadata["cpus"])
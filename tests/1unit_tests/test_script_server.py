@@ -0,0 +1,78 @@
+import sys
+import textwrap
+
+from boa.wrappers.script_server import ScriptServer
+
+# answers requests in reverse order of trial index, and exits on the trial with index 99
+WORKER = textwrap.dedent(
+    """
+    import json
+    import os
+    import sys
+
+    print("worker started")
+    requests = [json.loads(sys.stdin.readline()) for _ in range(2)]
+    for request in sorted(requests, key=lambda r: -r["trial_index"]):
+        if request["trial_index"] == 99:
+            sys.exit(3)
+        print(json.dumps({"id": request["id"], "exit_code": request["trial_index"]}), flush=True)
+    for line in sys.stdin:
+        request = json.loads(line)
+        print(json.dumps({"id": request["id"], "exit_code": os.getpid()}), flush=True)
+    """
+)
+
+
+def test_script_server_matches_out_of_order_responses_to_requests(tmp_path):
+    server = ScriptServer([sys.executable, "-c", WORKER])
+    try:
+        first = server.request("run_model", 1, tmp_path)
+        second = server.request("run_model", 2, tmp_path)
+        assert first.result(timeout=10) == 1
+        assert second.result(timeout=10) == 2
+        # the same worker keeps answering
+        pid = server.request("run_model", 3, tmp_path).result(timeout=10)
+        assert server.request("run_model", 4, tmp_path).result(timeout=10) == pid
+    finally:
+        server.close()
+
+
+def test_script_server_fails_requests_of_exited_worker_and_restarts_it(tmp_path):
+    exit_codes = []
+    server = ScriptServer([sys.executable, "-c", WORKER])
+    try:
+        crashed = server.request("run_model", 99, tmp_path, on_exit=exit_codes.append)
+        other = server.request("run_model", 1, tmp_path, on_exit=exit_codes.append)
+        assert crashed.result(timeout=10) == 3
+        assert other.result(timeout=10) == 3
+        assert exit_codes == [3, 3]
+
+        first = server.request("run_model", 1, tmp_path)
+        second = server.request("run_model", 2, tmp_path)
+        assert (first.result(timeout=10), second.result(timeout=10)) == (1, 2)
+    finally:
+        server.close()
+
+
+def test_script_server_fails_request_it_can_not_send(tmp_path):
+    # closes its stdin after answering the first request, but keeps running
+    worker = textwrap.dedent(
+        """
+        import json, os, sys, time
+
+        request = json.loads(sys.stdin.readline())
+        os.close(0)
+        print(json.dumps({"id": request["id"], "exit_code": 0}), flush=True)
+        time.sleep(30)
+        """
+    )
+    server = ScriptServer([sys.executable, "-c", worker])
+    try:
+        assert server.request("run_model", 1, tmp_path).result(timeout=10) == 0
+        exit_codes = []
+        future = server.request("run_model", 2, tmp_path, on_exit=exit_codes.append)
+        assert future.result(timeout=10) == 1
+        assert exit_codes == [1]
+    finally:
+        server._workers[0].process.p.kill()
+        server.close()
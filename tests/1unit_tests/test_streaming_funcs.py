@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import scipy.stats as stats
+from sklearn.metrics import mean_squared_error, r2_score
+
+from boa import (
+    BOAMetric,
+    get_metric_from_config,
+    streaming_iqr,
+    streaming_mean,
+    streaming_mean_squared_error,
+    streaming_normalized_root_mean_squared_error,
+    streaming_r2_score,
+)
+from boa.metrics.metric_funcs import normalized_root_mean_squared_error
+
+
+@pytest.fixture
+def arrays(tmp_path):
+    rng = np.random.default_rng(7)
+    y_true = rng.normal(size=(10_001, 3))
+    # many repeated values so that the quartiles fall among ties
+    y_pred = np.round(y_true + rng.normal(scale=0.3, size=y_true.shape), 1)
+    np.save(tmp_path / "y_true.npy", y_true)
+    np.save(tmp_path / "y_pred.npy", y_pred)
+    memmaps = (np.load(tmp_path / "y_true.npy", mmap_mode="r"), np.load(tmp_path / "y_pred.npy", mmap_mode="r"))
+    return y_true, y_pred, memmaps
+
+
+@pytest.mark.parametrize("columns", [0, slice(None)])
+def test_streaming_metrics_match_in_memory_metrics(arrays, columns):
+    y_true, y_pred, (true_mmap, pred_mmap) = arrays
+    y_true, y_pred = y_true[:, columns], y_pred[:, columns]
+    true_mmap, pred_mmap = true_mmap[:, columns], pred_mmap[:, columns]
+    chunked = dict(chunk_size=999)
+
+    assert np.isclose(streaming_mean(pred_mmap, **chunked), np.mean(y_pred))
+    assert np.isclose(streaming_mean_squared_error(true_mmap, pred_mmap, **chunked), mean_squared_error(y_true, y_pred))
+    assert np.isclose(
+        streaming_mean_squared_error(true_mmap, pred_mmap, squared=False, **chunked),
+        mean_squared_error(y_true, y_pred, squared=False),
+    )
+    assert np.isclose(streaming_r2_score(true_mmap, pred_mmap, **chunked), r2_score(y_true, y_pred))
+    for normalizer in ["iqr", "std", "mean", "range"]:
+        assert np.allclose(
+            streaming_normalized_root_mean_squared_error(true_mmap, pred_mmap, normalizer=normalizer, **chunked),
+            normalized_root_mean_squared_error(y_true, y_pred, normalizer=normalizer),
+        )
+
+    # the exact IQR finds the same quartiles, even when it needs several reads to narrow them down
+    assert np.isclose(streaming_iqr(pred_mmap, chunk_size=50, bins=8), stats.iqr(y_pred), rtol=1e-12)
+    approximate = streaming_iqr(pred_mmap, method="approximate", **chunked)
+    assert abs(approximate - stats.iqr(y_pred)) <= 2 * np.ptp(y_pred) / 4096
+
+
+def test_streaming_metrics_take_iterables_of_chunks(arrays):
+    y_true, y_pred, _ = arrays
+    y_true, y_pred = y_true[:, 0], y_pred[:, 0]
+
+    def chunks(a):
+        return (a[i : i + 1000] for i in range(0, len(a), 1000))
+
+    assert np.isclose(streaming_r2_score(chunks(y_true), chunks(y_pred)), r2_score(y_true, y_pred))
+    assert np.isclose(streaming_iqr(list(chunks(y_pred))), stats.iqr(y_pred), rtol=1e-12)
+    with pytest.raises(TypeError):
+        streaming_normalized_root_mean_squared_error(chunks(y_true), chunks(y_pred))
+    with pytest.raises(ValueError):
+        streaming_mean_squared_error(chunks(y_true), chunks(y_pred[:-1000]))
+
+
+def test_streaming_metrics_are_configurable(arrays):
+    y_true, y_pred, (true_mmap, pred_mmap) = arrays
+    config = BOAMetric(metric="StreamingNRMSE", metric_func_kwargs=dict(chunk_size=500, normalizer="std"))
+    metric = get_metric_from_config(config)
+    assert metric.lower_is_better
+    assert np.allclose(
+        metric.f(y_true=true_mmap, y_pred=pred_mmap),
+        normalized_root_mean_squared_error(y_true, y_pred, normalizer="std"),
+    )
+
+    metric = get_metric_from_config(BOAMetric(metric="StreamingRMSE"))
+    assert np.isclose(metric.f(true_mmap, pred_mmap), mean_squared_error(y_true, y_pred, squared=False))
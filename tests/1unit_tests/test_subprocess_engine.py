@@ -0,0 +1,66 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from boa.wrappers.subprocess_engine import SubprocessEngine
+
+
+def test_engine_resolves_exit_codes_and_calls_on_exit():
+    engine = SubprocessEngine()
+    exit_codes = []
+    futures = [
+        engine.start([sys.executable, "-c", f"import sys; print({i}); sys.exit({i % 3})"], on_exit=exit_codes.append)
+        for i in range(6)
+    ]
+    assert [future.result(timeout=60) for future in futures] == [i % 3 for i in range(6)]
+    assert sorted(exit_codes) == sorted(i % 3 for i in range(6))
+    engine.close()
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="Windows uses a pump thread per process")
+def test_engine_thread_count_does_not_grow_with_processes():
+    engine = SubprocessEngine()
+    engine.start([sys.executable, "-c", "pass"]).result(timeout=60)
+    n_threads = threading.active_count()
+
+    futures = [engine.start([sys.executable, "-c", "import time; time.sleep(.5)"]) for _ in range(20)]
+    assert threading.active_count() == n_threads
+    assert all(future.result(timeout=60) == 0 for future in futures)
+    engine.close()
+
+
+def test_engine_waits_for_process_that_closed_its_output():
+    engine = SubprocessEngine(poll_interval=0.1)
+    cmd = "import os, sys, time; os.close(1); os.close(2); time.sleep(.5); sys.exit(4)"
+    assert engine.start([sys.executable, "-c", cmd]).result(timeout=60) == 4
+    engine.close()
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="Windows uses a pump thread per process")
+def test_engine_close_fails_futures_of_running_processes():
+    engine = SubprocessEngine()
+    future = engine.start([sys.executable, "-c", "import time; time.sleep(30)"])
+    engine.close()
+    with pytest.raises(RuntimeError):
+        future.result(timeout=5)
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="Windows uses a pump thread per process")
+def test_engine_close_while_process_is_exiting():
+    engine = SubprocessEngine()
+    exiting = threading.Event()
+
+    def on_exit(exit_code):
+        # the future of the process resolves while close is waiting for the engine thread
+        exiting.set()
+        time.sleep(0.5)
+
+    future = engine.start([sys.executable, "-c", "pass"], on_exit=on_exit)
+    assert exiting.wait(timeout=60)
+    closer = threading.Thread(target=engine.close, daemon=True)
+    closer.start()
+    closer.join(timeout=30)
+    assert not closer.is_alive()
+    assert future.result(timeout=5) == 0
@@ -1,8 +1,83 @@
+import concurrent.futures
+import json
+import os
+import sys
+
+import ax.service.scheduler
+import numpy as np
 import pytest
+from ax.core.base_trial import TrialStatus
 
 from boa import BaseWrapper as BWrapper
+from boa import Controller
 from boa import ModularMetric as MMetric
+from boa import ScriptWrapper
 from boa import WrappedJobRunner as WRunner
+from boa.wrappers.wrapper_utils import make_trial_dir
+
+SET_TRIAL_STATUSES_SCRIPT = """
+import json
+import pathlib
+import sys
+
+experiment_dir = pathlib.Path(sys.argv[-1])
+running_trials = json.loads((experiment_dir / "running_trials.json").read_text())
+statuses = {t["trial_index"]: "COMPLETED" for t in running_trials if t["trial_index"] % 2 == 0}
+(experiment_dir / "trial_statuses.json").write_text(json.dumps(statuses))
+"""
+
+FETCH_TRIAL_DATA_SCRIPT = """
+import json
+import pathlib
+import sys
+import time
+
+time.sleep(0.5)
+trial_dir = pathlib.Path(sys.argv[-1])
+(trial_dir / "output.json").write_text(json.dumps({"rmse": {"y_true": [1, 2], "y_pred": [1, 3]}}))
+"""
+
+
+class WrapperRunBackend(BWrapper):
+    trial_result_attributes = ("data",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.data = {}
+
+    def run_model(self, trial) -> None:
+        self.data[trial.index] = sum(trial.arm.parameters.values())
+
+    def set_trial_status(self, trial) -> None:
+        if self.data.get(trial.index) is not None:
+            trial.mark_completed()
+
+    def fetch_trial_data(self, trial, *args, **kwargs):
+        return self.data[trial.index]
+
+
+class WrapperWaitsForTrialUpdates(WrapperRunBackend):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waits = []
+
+    def wait_for_trial_updates(self, timeout: float) -> bool:
+        self.waits.append(timeout)
+        return True
+
+    def set_trial_status(self, trial) -> None:
+        if self.waits:  # finished while the scheduler waited
+            trial.mark_completed()
+
+    def fetch_trial_data(self, trial, metric_properties, metric_name, *args, **kwargs):
+        return {"y_true": [1, 2], "y_pred": [1, 3]} if metric_name == "rmse" else {"a": [1, 2]}
+
+
+class WrapperAbandonsTrials(WrapperRunBackend):
+    def run_model(self, trial) -> None:
+        super().run_model(trial)
+        if trial.index % 2:
+            trial.mark_abandoned()
 
 
 def test_wrapper_instantiation(generic_config, tmp_path):
@@ -24,3 +99,243 @@ def test_creating_wrapper_with_same_name_as_other_wrapper_from_diff_file_raises_
 
         class WrappedJobRunner(WRunner):
             pass
+
+
+@pytest.mark.parametrize("backend", ["thread", "process", "inline"])
+def test_run_multiple_backends_bring_back_trial_results(backend, generic_config, tmp_path):
+    generic_config.script_options.run_backend = backend
+    generic_config.script_options.max_workers = 2
+    controller = Controller(config=generic_config, wrapper=WrapperRunBackend, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    trials = [
+        experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment)) for _ in range(3)
+    ]
+    run_metadata = experiment.runner.run_multiple(trials)
+
+    assert set(run_metadata) == {trial.index for trial in trials}
+    for trial in trials:
+        assert controller.wrapper.data[trial.index] == sum(trial.arm.parameters.values())
+
+
+def test_process_backend_applies_worker_statuses_after_trials_are_marked_running(generic_config, tmp_path):
+    generic_config.script_options.run_backend = "process"
+    generic_config.script_options.max_workers = 2
+    controller = Controller(config=generic_config, wrapper=WrapperAbandonsTrials, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    trials = [
+        experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment)) for _ in range(2)
+    ]
+    run_metadata = experiment.runner.run_multiple(trials)
+    # the worker statuses are left for the scheduler to apply once the trials are running
+    assert all(trial.status == TrialStatus.CANDIDATE for trial in trials)
+    for trial in trials:
+        trial.update_run_metadata(run_metadata[trial.index])
+        trial.mark_running(no_runner_required=True)
+
+    status_dict = experiment.runner.poll_trial_status(trials)
+
+    assert status_dict[TrialStatus.COMPLETED] == {trials[0].index}
+    assert status_dict[TrialStatus.ABANDONED] == {trials[1].index}
+    assert trials[1].index in experiment.trial_indices_by_status[TrialStatus.ABANDONED]
+
+
+def test_process_backend_rejects_script_wrapper(generic_config, tmp_path):
+    generic_config.script_options.run_backend = "process"
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    with pytest.raises(ValueError, match="process"):
+        controller.experiment.runner.run_backend
+
+
+def test_script_wrapper_set_trial_statuses_polls_all_trials_at_once(generic_config, tmp_path):
+    script = tmp_path / "set_trial_statuses.py"
+    script.write_text(SET_TRIAL_STATUSES_SCRIPT)
+    generic_config.script_options.set_trial_statuses = f"{sys.executable} {script}"
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    experiment_dir = controller.wrapper.experiment_dir
+    trials = []
+    for _ in range(4):
+        trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+        trial.mark_running(no_runner_required=True)
+        trial_dir = make_trial_dir(experiment_dir, trial.index)
+        (trial_dir / "output.json").write_text(json.dumps({"trial_status": "RUNNING"}))
+        trials.append(trial)
+    # trials not in the batch status file still get checked for their own status file
+    (make_trial_dir(experiment_dir, trials[1].index) / "trial_status.json").write_text(
+        json.dumps({"trial_status": "FAILED"})
+    )
+
+    status_dict = experiment.runner.poll_trial_status(trials)
+
+    assert status_dict[TrialStatus.COMPLETED] == {trials[0].index, trials[2].index}
+    assert status_dict[TrialStatus.FAILED] == {trials[1].index}
+    assert status_dict[TrialStatus.RUNNING] == {trials[3].index}
+
+
+def test_script_wrapper_runs_scripts_from_working_dir_without_changing_directory(generic_config, tmp_path, monkeypatch):
+    working_dir = tmp_path / "working_dir"
+    working_dir.mkdir()
+    (working_dir / "set_trial_statuses.py").write_text(SET_TRIAL_STATUSES_SCRIPT)
+    # relative to the working directory, not the directory the optimization was started from
+    generic_config.script_options.set_trial_statuses = f"{sys.executable} set_trial_statuses.py"
+    generic_config.script_options.working_dir = working_dir
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path / "exp")
+    controller.initialize_scheduler()
+    monkeypatch.chdir(tmp_path)
+
+    experiment = controller.experiment
+    trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+    trial.mark_running(no_runner_required=True)
+    (make_trial_dir(controller.wrapper.experiment_dir, trial.index) / "output.json").write_text(
+        json.dumps({"trial_status": "RUNNING"})
+    )
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        executor.submit(controller.wrapper.set_trial_statuses, [trial]).result()
+
+    # completed by the script
+    assert trial.status.is_completed
+    assert os.getcwd() == str(tmp_path)
+
+
+class ScriptWrapperSetsTrialStatus(ScriptWrapper):
+    def set_trial_status(self, trial):
+        trial.mark_completed()
+
+
+def test_script_wrapper_set_trial_statuses_goes_through_overridden_set_trial_status(generic_config, tmp_path):
+    controller = Controller(config=generic_config, wrapper=ScriptWrapperSetsTrialStatus, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    trials = []
+    for _ in range(2):
+        trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+        trial.mark_running(no_runner_required=True)
+        make_trial_dir(controller.wrapper.experiment_dir, trial.index)
+        trials.append(trial)
+
+    status_dict = experiment.runner.poll_trial_status(trials)
+    assert status_dict[TrialStatus.COMPLETED] == {trial.index for trial in trials}
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is only on Linux")
+def test_script_wrapper_watch_trial_files_wakes_and_polls_updated_trials(generic_config, tmp_path):
+    generic_config.script_options.watch_trial_files = True
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+
+    experiment = controller.experiment
+    trials = []
+    for _ in range(2):
+        trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+        trial.mark_running(no_runner_required=True)
+        make_trial_dir(controller.wrapper.experiment_dir, trial.index)
+        trials.append(trial)
+    assert controller.wrapper.file_watcher.available
+
+    (make_trial_dir(controller.wrapper.experiment_dir, trials[1].index) / "output.json").write_text(
+        json.dumps({"rmse": {"y_true": [1, 2], "y_pred": [1, 3]}})
+    )
+    assert controller.wrapper.wait_for_trial_updates(5)
+
+    status_dict = experiment.runner.poll_trial_status(trials)
+    assert status_dict[TrialStatus.COMPLETED] == {trials[1].index}
+    assert status_dict[TrialStatus.RUNNING] == {trials[0].index}
+    controller.wrapper.file_watcher.close()
+
+
+def test_scheduler_waits_on_wrapper_trial_updates_between_polls(generic_config, tmp_path):
+    controller = Controller(config=generic_config, wrapper=WrapperWaitsForTrialUpdates, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    scheduler = controller.scheduler
+    experiment = controller.experiment
+
+    trial = experiment.new_trial(generator_run=scheduler.generation_strategy.gen(experiment))
+    trial.mark_running(no_runner_required=True)
+    ax_sleep = ax.service.scheduler.sleep
+    scheduler.wait_for_completed_trials_and_report_results()
+
+    assert controller.wrapper.waits == [scheduler.options.init_seconds_between_polls]
+    assert trial.status.is_completed
+    # other Ax schedulers sleep as before once the wait is over
+    assert ax.service.scheduler.sleep is ax_sleep
+
+
+def _new_running_script_trials(controller, n):
+    experiment = controller.experiment
+    trials = []
+    for _ in range(n):
+        trial = experiment.new_trial(generator_run=controller.scheduler.generation_strategy.gen(experiment))
+        trial.mark_running(no_runner_required=True)
+        trial_dir = make_trial_dir(controller.wrapper.experiment_dir, trial.index)
+        (trial_dir / "trial_status.json").write_text(json.dumps({"trial_status": "COMPLETED"}))
+        trials.append(trial)
+    return trials
+
+
+def test_script_wrapper_defers_completion_until_fetched_data_is_ready(generic_config, tmp_path):
+    script = tmp_path / "fetch_trial_data.py"
+    script.write_text(FETCH_TRIAL_DATA_SCRIPT)
+    generic_config.script_options.fetch_trial_data = f"{sys.executable} {script}"
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    wrapper = controller.wrapper
+    (trial,) = _new_running_script_trials(controller, 1)
+
+    # the poll doesn't wait on the fetch script, the trial stays running until its data is written out
+    status_dict = controller.experiment.runner.poll_trial_status([trial])
+    assert status_dict[TrialStatus.RUNNING] == {trial.index}
+    for exit_code in wrapper.pending_fetches[trial.index].exit_codes:
+        exit_code.result()
+
+    status_dict = controller.experiment.runner.poll_trial_status([trial])
+    assert status_dict[TrialStatus.COMPLETED] == {trial.index}
+    data = wrapper.fetch_trial_data(trial, metric_properties={})
+    assert data == {"rmse": {"y_true": [1, 2], "y_pred": [1, 3]}}
+    assert trial.index not in wrapper.pending_fetches
+
+
+def test_script_wrapper_fails_trial_when_fetch_times_out(generic_config, tmp_path):
+    generic_config.script_options.fetch_trial_data_timeout = 0
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    (trial,) = _new_running_script_trials(controller, 1)
+
+    status_dict = controller.experiment.runner.poll_trial_status([trial])
+    assert status_dict[TrialStatus.FAILED] == {trial.index}
+
+
+def test_script_wrapper_reads_binary_array_outputs(generic_config, tmp_path):
+    controller = Controller(config=generic_config, wrapper=ScriptWrapper, experiment_dir=tmp_path)
+    controller.initialize_scheduler()
+    wrapper = controller.wrapper
+    (trial,) = _new_running_script_trials(controller, 1)
+    trial_dir = make_trial_dir(wrapper.experiment_dir, trial.index)
+
+    y_true, y_pred = np.arange(5.0), np.arange(5.0) + 1
+    np.save(trial_dir / "output.rmse.y_true.npy", y_true)
+    np.save(trial_dir / "output.rmse.y_pred.npy", y_pred)
+    (trial_dir / "output.json").write_text(json.dumps({"rmse": {"sem": 0.5}}))
+
+    status_dict = controller.experiment.runner.poll_trial_status([trial])
+    assert status_dict[TrialStatus.COMPLETED] == {trial.index}
+    data = wrapper.fetch_trial_data(trial, metric_properties={})
+    assert data["rmse"]["sem"] == 0.5
+    # memory-mapped, not read into memory
+    assert isinstance(data["rmse"]["y_pred"], np.memmap)
+    np.testing.assert_array_equal(data["rmse"]["y_true"], y_true)
+    np.testing.assert_array_equal(data["rmse"]["y_pred"], y_pred)
+
+    for path in trial_dir.glob("output.*"):
+        path.unlink()
+    np.savez(trial_dir / "output.npz", **{"rmse.y_true": y_true, "rmse.y_pred": y_pred})
+    data = wrapper.fetch_trial_data(trial, metric_properties={})
+    np.testing.assert_array_equal(data["rmse"]["y_pred"], y_pred)
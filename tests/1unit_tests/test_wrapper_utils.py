@@ -1,4 +1,18 @@
-from boa import make_experiment_dir
+import os
+import threading
+
+from ax.storage.json_store.encoder import object_to_json
+from ax.utils.testing.core_stubs import get_branin_experiment
+
+from boa import (
+    MANIFEST_FILE,
+    TrialManifest,
+    cd_and_cd_back,
+    get_trial_dir,
+    load_json,
+    make_experiment_dir,
+    save_trial_data,
+)
 
 
 def test_make_new_exp_dir_when_exp_dir_already_exists(tmp_path):
@@ -10,3 +24,75 @@ def test_make_new_exp_dir_when_exp_dir_already_exists(tmp_path):
         dirs.add(exp_dir)
         assert exp_dir.exists()
     assert len(dirs) == 10
+
+
+def test_save_trial_data_only_rewrites_changed_files(tmp_path):
+    experiment = get_branin_experiment(with_trial=True)
+    trial = experiment.trials[0]
+    manifest = TrialManifest(get_trial_dir(tmp_path, trial.index))
+
+    trial_dir = save_trial_data(trial, experiment_dir=tmp_path, manifest=manifest)
+    first_hash = load_json(trial_dir / MANIFEST_FILE)["hash"]
+    assert first_hash == manifest.content_hash
+    assert set(manifest.hashes) == {"parameters.json", "trial.json", "data.json"}
+    mtimes = {name: (trial_dir / name).stat().st_mtime_ns for name in manifest.hashes}
+
+    save_trial_data(trial, experiment_dir=tmp_path, manifest=manifest)
+    assert {name: (trial_dir / name).stat().st_mtime_ns for name in manifest.hashes} == mtimes
+    assert load_json(trial_dir / MANIFEST_FILE)["hash"] == first_hash
+
+    trial.mark_running(no_runner_required=True)
+    # a new manifest picks up where the old one left off from manifest.json
+    assert TrialManifest(trial_dir).update(
+        {"parameters.json": load_json(trial_dir / "parameters.json"), "trial.json": object_to_json(trial)}
+    ) == ["trial.json"]
+    assert load_json(trial_dir / MANIFEST_FILE)["hash"] != first_hash
+    assert not list(trial_dir.glob("*.tmp"))
+
+
+def test_save_trial_data_skips_serializing_unchanged_trials(tmp_path, monkeypatch):
+    import boa.wrappers.wrapper_utils as wrapper_utils
+
+    experiment = get_branin_experiment(with_trial=True)
+    trial = experiment.trials[0]
+    manifest = TrialManifest(get_trial_dir(tmp_path, trial.index))
+    trial_dir = save_trial_data(trial, experiment_dir=tmp_path, manifest=manifest)
+
+    calls = []
+    monkeypatch.setattr(wrapper_utils, "object_to_json", lambda obj: calls.append(obj) or object_to_json(obj))
+    save_trial_data(trial, experiment_dir=tmp_path, manifest=manifest)
+    assert calls == []
+
+    # any change to the trial or to the files written makes them again
+    trial.mark_running(no_runner_required=True)
+    save_trial_data(trial, experiment_dir=tmp_path, manifest=manifest)
+    assert load_json(trial_dir / "trial.json")["status"] == object_to_json(trial)["status"]
+    calls.clear()
+    (trial_dir / "trial.json").unlink()
+    save_trial_data(trial, experiment_dir=tmp_path, manifest=manifest)
+    assert calls and (trial_dir / "trial.json").exists()
+
+
+def test_cd_and_cd_back_without_a_path_leaves_a_thread_inside_with_a_path_alone(tmp_path):
+    starting_dir = os.getcwd()
+    entered, release = threading.Event(), threading.Event()
+
+    def enter_with_path():
+        with cd_and_cd_back(tmp_path):
+            entered.set()
+            release.wait(5)
+
+    thread = threading.Thread(target=enter_with_path)
+    try:
+        thread.start()
+        assert entered.wait(5)
+        # doesn't wait for the thread inside with a path, or change back from its directory
+        with cd_and_cd_back():
+            pass
+        assert os.getcwd() == str(tmp_path)
+        release.set()
+        thread.join(5)
+        assert os.getcwd() == starting_dir
+    finally:
+        release.set()
+        os.chdir(starting_dir)
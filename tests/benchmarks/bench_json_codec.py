@@ -0,0 +1,109 @@
+"""
+Benchmark of the JSON codecs of :mod:`boa.json_codec` on what BOA writes for a realistic experiment:
+the json serialization of an experiment with many completed trials (what scheduler snapshots
+are made of), the parameters of each trial (as in the trial data files) and a trial output
+with large arrays of model results.
+
+Reports the time to encode and decode each payload, and the size it encodes to, for every
+codec that can be loaded here::
+
+    python tests/benchmarks/bench_json_codec.py --trials 500 --parameters 20
+
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from ax import (
+    Data,
+    Experiment,
+    Metric,
+    Objective,
+    OptimizationConfig,
+    ParameterType,
+    RangeParameter,
+    SearchSpace,
+)
+from ax.modelbridge.registry import Models
+from ax.storage.json_store.encoder import object_to_json
+
+from boa.json_codec import JSON_CODECS
+
+
+def make_payloads(n_trials: int, n_parameters: int, output_size: int) -> dict:
+    search_space = SearchSpace(
+        [RangeParameter(f"x{i}", ParameterType.FLOAT, lower=0, upper=1) for i in range(n_parameters)]
+    )
+    experiment = Experiment(
+        search_space=search_space,
+        optimization_config=OptimizationConfig(Objective(Metric("rmse"), minimize=True)),
+        name="benchmark",
+    )
+    sobol = Models.SOBOL(search_space=search_space, seed=0)
+    rng = np.random.default_rng(0)
+    for _ in range(n_trials):
+        trial = experiment.new_trial(generator_run=sobol.gen(1))
+        trial.mark_running(no_runner_required=True).mark_completed()
+        df = pd.DataFrame(
+            {
+                "arm_name": [trial.arm.name],
+                "metric_name": ["rmse"],
+                "mean": [rng.random()],
+                "sem": [0.0],
+                "trial_index": [trial.index],
+            }
+        )
+        experiment.attach_data(Data(df=df))
+    return {
+        "experiment": object_to_json(experiment),
+        "trial parameters": [trial.arm.parameters for trial in experiment.trials.values()],
+        "trial output": {
+            "rmse": {"y_true": rng.random(output_size), "y_pred": rng.random(output_size)},
+        },
+    }
+
+
+def benchmark(payloads: dict, repeat: int) -> pd.DataFrame:
+    rows = []
+    for name, Codec in JSON_CODECS.items():
+        try:
+            codec = Codec()
+        except ImportError:
+            print(f"Skipping {name}, it isn't installed")
+            continue
+        for payload_name, payload in payloads.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                encoded = codec.dumps(payload)
+            encode = (time.perf_counter() - start) / repeat
+            start = time.perf_counter()
+            for _ in range(repeat):
+                codec.loads(encoded)
+            decode = (time.perf_counter() - start) / repeat
+            rows.append(
+                {
+                    "codec": name,
+                    "payload": payload_name,
+                    "encode (ms)": encode * 1000,
+                    "decode (ms)": decode * 1000,
+                    "size (KB)": len(encoded) / 1000,
+                }
+            )
+    return pd.DataFrame(rows).sort_values(["payload", "codec"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trials", type=int, default=500, help="Number of completed trials of the experiment")
+    parser.add_argument("--parameters", type=int, default=20, help="Number of parameters of the search space")
+    parser.add_argument("--output-size", type=int, default=100_000, help="Length of the arrays of the trial output")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of times each payload is encoded and decoded")
+    args = parser.parse_args()
+
+    payloads = make_payloads(args.trials, args.parameters, args.output_size)
+    print(benchmark(payloads, args.repeat).to_string(index=False, float_format="{:.2f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -241,6 +241,34 @@ def r_streamlined(tmp_path_factory, cd_to_root_and_back_session):
     yield cli_main(split_shell_command(f"--config-path {config_path} -td"), standalone_mode=False)
 
 
+@pytest.fixture(scope="session")
+def r_server_mode(tmp_path_factory, cd_to_root_and_back_session):
+    config_path = TEST_DIR / f"scripts/other_langs/r_server_mode/config.yaml"
+
+    yield cli_main(split_shell_command(f"--config-path {config_path} -td"), standalone_mode=False)
+
+
+@pytest.fixture(scope="session")
+def python_server_mode(tmp_path_factory, cd_to_root_and_back_session):
+    config_path = TEST_DIR / f"scripts/other_langs/python_server_mode/config.yaml"
+
+    yield cli_main(split_shell_command(f"--config-path {config_path} -td"), standalone_mode=False)
+
+
+@pytest.fixture(scope="session")
+def python_batch_trial(tmp_path_factory, cd_to_root_and_back_session):
+    config_path = TEST_DIR / f"scripts/other_langs/python_batch_trial/config.yaml"
+
+    yield cli_main(split_shell_command(f"--config-path {config_path} -td"), standalone_mode=False)
+
+
+@pytest.fixture(scope="session")
+def python_array_jobs(tmp_path_factory, cd_to_root_and_back_session):
+    config_path = TEST_DIR / f"scripts/other_langs/python_array_jobs/config.yaml"
+
+    yield cli_main(split_shell_command(f"--config-path {config_path} -td"), standalone_mode=False)
+
+
 @pytest.fixture(scope="session")
 def r_streamlined_botorch_modular(tmp_path_factory, cd_to_root_and_back_session):
     config_path = TEST_DIR / f"scripts/other_langs/r_package_streamlined/config_modular_botorch.yaml"
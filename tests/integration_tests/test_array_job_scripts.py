@@ -0,0 +1,22 @@
+from ax.core.base_trial import TrialStatus
+
+from boa import ArrayJobRunner, LocalBatchQueue
+
+
+def test_python_array_jobs_submit_trials_to_batch_queue(python_array_jobs):
+    scheduler = python_array_jobs
+    config = scheduler.wrapper.config
+    runner = scheduler.experiment.runner
+    assert isinstance(runner, ArrayJobRunner)
+    assert isinstance(runner.batch_queue, LocalBatchQueue)
+    assert runner.batch_queue.n_slots == config.script_options.batch_queue_options["n_slots"]
+
+    trials = scheduler.experiment.trials.values()
+    assert len(trials) == config.n_trials
+    assert all(trial.status == TrialStatus.COMPLETED for trial in trials)
+
+    job_ids = [trial.run_metadata["job_id"] for trial in trials]
+    assert len(set(job_ids)) == len(job_ids)
+    # trials deployed together share an array job
+    array_ids = {job_id.split("_")[0] for job_id in job_ids}
+    assert len(array_ids) < len(job_ids)
@@ -0,0 +1,27 @@
+import json
+
+from ax.core.base_trial import TrialStatus
+from ax.core.batch_trial import BatchTrial
+
+from boa import get_trial_dir
+
+
+def test_python_batch_trial_runs_each_batch_once(python_batch_trial):
+    scheduler = python_batch_trial
+    wrapper = scheduler.wrapper
+    config = wrapper.config
+    trials = scheduler.experiment.trials.values()
+    assert len(trials) == config.n_trials
+    assert all(isinstance(trial, BatchTrial) for trial in trials)
+    assert all(trial.status == TrialStatus.COMPLETED for trial in trials)
+
+    data = scheduler.experiment.fetch_data().df
+    for trial in trials:
+        trial_dir = get_trial_dir(wrapper.experiment_dir, trial.index)
+        arms = json.loads((trial_dir / "arms.json").read_text())
+        assert [arm["arm_name"] for arm in arms] == [arm.name for arm in trial.arms]
+        assert len(arms) == config.scheduler.batch_size
+
+        output = json.loads((trial_dir / "output.json").read_text())
+        trial_data = data[data["trial_index"] == trial.index].set_index("arm_name")["mean"]
+        assert trial_data.to_dict() == {arm_name: values["metric"] for arm_name, values in output.items()}
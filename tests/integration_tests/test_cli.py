@@ -83,6 +83,7 @@ def test_calling_command_line_test_script_doesnt_error_out_and_produces_correct_
         "r_full",
         "r_light",
         "r_streamlined",
+        "r_server_mode",
         "r_streamlined_botorch_modular",
         pytest.param(
             "r_streamlined_botorch_modular",
@@ -107,6 +108,13 @@ def test_calling_command_line_r_test_scripts(r_scripts_run, request):
         assert "param_names" in data
         assert "metric_properties" in data
 
+    if "r_server_mode" == r_scripts_run:
+        pids = {
+            (get_trial_dir(wrapper.experiment_dir, trial.index) / "worker_pid.txt").read_text().strip()
+            for trial in scheduler.experiment.trials.values()
+        }
+        assert len(pids) <= config.script_options.server_workers
+
     if r_scripts_run in ("r_streamlined", "r_streamlined_botorch_modular"):
         with cd_and_cd_back(scheduler.wrapper.config_path.parent):
 
@@ -0,0 +1,16 @@
+from ax.core.base_trial import TrialStatus
+
+from boa import get_trial_dir
+
+
+def test_python_server_mode_reuses_workers_across_trials(python_server_mode):
+    scheduler = python_server_mode
+    wrapper = scheduler.wrapper
+    config = wrapper.config
+    trials = scheduler.experiment.trials.values()
+    assert len(trials) == config.n_trials
+    assert all(trial.status == TrialStatus.COMPLETED for trial in trials)
+
+    pids = {(get_trial_dir(wrapper.experiment_dir, trial.index) / "worker_pid.txt").read_text() for trial in trials}
+    assert len(pids) <= config.script_options.server_workers
+    wrapper.close_script_servers()
@@ -2,10 +2,15 @@ import json
 import os
 import shutil
 import sys
+import threading
+import time
 
 import numpy as np
+import pandas as pd
 import pytest
-from ax import Experiment, Objective, OptimizationConfig
+from ax import Data, Experiment, Objective, OptimizationConfig
+from ax.core.base_trial import TrialStatus
+from ax.service.utils.report_utils import exp_to_df
 from ax.storage.json_store.decoder import object_from_json
 from ax.storage.json_store.encoder import object_to_json
 from ax.storage.json_store.registry import (
@@ -15,23 +20,41 @@ from ax.storage.json_store.registry import (
     CORE_ENCODER_REGISTRY,
 )
 
+import boa.checkpoint_writer
+import boa.storage
 from boa import (
     BaseWrapper,
     BOAConfig,
+    CheckpointPolicy,
     ModularMetric,
+    ReadOnlyScheduler,
     WrappedJobRunner,
     cd_and_cd_back,
+    connect_sqlite_readonly,
+    dump_scheduler_data,
     get_dictionary_from_callable,
     get_scheduler,
     instantiate_search_space_from_json,
+    is_sqlite_file,
+    journal_path,
     load_jsonlike,
+    read_snapshot,
+    recover_running_trials,
+    results_store_path,
     scheduler_from_json_file,
+    scheduler_to_df,
     scheduler_to_json_file,
     split_shell_command,
+    sqlite_path,
+    sqlite_results,
+    sqlite_trials,
+    write_snapshot,
 )
 from boa.__version__ import __version__
 from boa.cli import main as cli_main
 from boa.definitions import ROOT
+from boa.results_store import ResultsStore, read_results
+from boa.runner import ADMITTED_KEY
 
 TEST_DIR = ROOT / "tests"
 
@@ -167,6 +190,25 @@ def test_save_load_scheduler_branin(branin_main_run, tmp_path):
     assert post_num_trials > pre_num_trials
 
 
+def test_save_load_scheduler_after_metrics_fetched_trial_data(branin_main_run, tmp_path):
+    file_out = tmp_path / "scheduler.json"
+    scheduler = branin_main_run
+    data = scheduler.experiment.fetch_data()
+    assert scheduler.experiment.trials_by_status[TrialStatus.COMPLETED]
+    for metric in scheduler.experiment.metrics.values():
+        assert "trial_data_cache" not in metric.to_dict()
+
+    scheduler_to_json_file(scheduler, file_out)
+    loaded = scheduler_from_json_file(file_out)
+
+    assert set(loaded.experiment.metrics) == set(scheduler.experiment.metrics)
+    pd.testing.assert_frame_equal(
+        loaded.experiment.lookup_data().df.sort_values(["trial_index", "metric_name"], ignore_index=True),
+        data.df.sort_values(["trial_index", "metric_name"], ignore_index=True),
+        check_like=True,
+    )
+
+
 def test_can_pass_custom_wrapper_path_when_loading_scheduler(branin_main_run, tmp_path):
     file_out = tmp_path / "scheduler.json"
     scheduler = branin_main_run
@@ -263,3 +305,453 @@ def test_save_load_scheduler_with_generic_callable(generic_config, tmp_path):
         scheduler = scheduler_from_json_file(scheduler_json, wrapper=wrapper)
 
         assert "median" in scheduler.experiment.metrics
+
+
+def test_checkpoints_are_journaled_and_replayed(branin_main_run, tmp_path):
+    file_out = tmp_path / "scheduler.json"
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+
+    # the first checkpoint writes a full snapshot
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    snapshot = file_out.read_text()
+    assert "snapshot_id" in json.loads(snapshot)
+    assert journal_path(file_out).read_text() == ""
+
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True).mark_completed()
+    _attach_trial_data(scheduler.experiment, trial)
+
+    # later checkpoints only append what changed to the journal
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    assert file_out.read_text() == snapshot
+    records = journal_path(file_out).read_text().splitlines()
+    assert len(records) == 1
+    assert set(json.loads(records[0])["trials"]) == {str(trial.index)}
+    # an optimization killed while appending a record leaves it incomplete
+    with open(journal_path(file_out), "a") as f:
+        f.write(records[0][:20])
+
+    loaded = scheduler_from_json_file(file_out)
+    assert set(loaded.experiment.trials) == set(scheduler.experiment.trials)
+    assert loaded.experiment.trials[trial.index].status == trial.status
+    assert trial.index in loaded.experiment.data_by_trial
+    assert len(loaded.generation_strategy._generator_runs) == len(scheduler.generation_strategy._generator_runs)
+
+    dump_scheduler_data(loaded, scheduler_filepath=file_out, opt_filepath=opt_csv, compact=True)
+    assert json.loads(file_out.read_text())["snapshot_id"] != json.loads(snapshot)["snapshot_id"]
+    assert journal_path(file_out).read_text() == ""
+    assert opt_csv.exists()
+
+
+def test_running_trials_are_only_journaled_when_they_change(branin_main_run, tmp_path):
+    file_out = tmp_path / "scheduler.json"
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    # generated before the snapshot, as it initializes the model of the generation strategy (which is in the header)
+    generator_run = scheduler.generation_strategy.gen(scheduler.experiment)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    # the size of the snapshot is known once it is written, not the size before it
+    assert scheduler.journal.snapshot_size == len(file_out.read_bytes())
+
+    trial = scheduler.experiment.new_trial(generator_run)
+    trial.mark_running(no_runner_required=True)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    records = [json.loads(line) for line in journal_path(file_out).read_text().splitlines()]
+    assert len(records) == 1
+    assert "header" not in records[0]
+
+    trial.update_run_metadata({"job_id": 1})
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    records = [json.loads(line) for line in journal_path(file_out).read_text().splitlines()]
+    assert len(records) == 2
+    assert set(records[1]) == {"snapshot", "trials"}
+    loaded = scheduler_from_json_file(file_out)
+    assert loaded.experiment.trials[trial.index].run_metadata["job_id"] == 1
+
+
+def test_checkpoints_only_look_at_trials_that_can_have_changed(branin_main_run, tmp_path, monkeypatch):
+    file_out = tmp_path / "scheduler.json"
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    generator_run = scheduler.generation_strategy.gen(scheduler.experiment)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    finished = next(trial for trial in scheduler.experiment.trials.values() if trial.status.is_terminal)
+
+    looked_at = []
+    trial_fingerprint = boa.storage._trial_fingerprint
+
+    def counted_trial_fingerprint(trial):
+        looked_at.append(trial.index)
+        return trial_fingerprint(trial)
+
+    monkeypatch.setattr(boa.storage, "_trial_fingerprint", counted_trial_fingerprint)
+    trial = scheduler.experiment.new_trial(generator_run)
+    trial.mark_running(no_runner_required=True)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    assert looked_at == [trial.index]
+
+    # finished trials are only looked at again once they are marked as changed
+    looked_at.clear()
+    finished.update_stop_metadata({"reason": "reviewed"})
+    scheduler.journal.mark_trials_changed([finished.index])
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    assert sorted(looked_at) == sorted([trial.index, finished.index])
+    records = [json.loads(line) for line in journal_path(file_out).read_text().splitlines()]
+    assert set(records[-1]["trials"]) == {str(finished.index)}
+    assert scheduler_from_json_file(file_out).experiment.trials[finished.index].stop_metadata == {"reason": "reviewed"}
+
+
+def test_checkpoints_are_written_in_the_background(branin_main_run, tmp_path, monkeypatch):
+    file_out = tmp_path / "scheduler.json"
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    n_trials = len(scheduler.experiment.trials)
+    writes = []
+    write_file_atomic = boa.checkpoint_writer.write_file_atomic
+
+    def counted_write_file_atomic(path, content):
+        writes.append(path)
+        write_file_atomic(path, content)
+
+    monkeypatch.setattr(boa.checkpoint_writer, "write_file_atomic", counted_write_file_atomic)
+
+    writer = scheduler.journal.writer
+    release = threading.Event()
+    writer.call(release.wait)  # hold up the writer, like a slow disk would
+    for _ in range(3):
+        dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv, compact=True, wait=False)
+    # the checkpoint is of the scheduler when it was saved, not when it is written
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True)
+    assert writer.pending
+    release.set()
+    scheduler.flush_data()
+
+    assert not writer.pending
+    # the burst of snapshots was coalesced into one write of each file
+    assert sorted(writes) == sorted([file_out, journal_path(file_out), opt_csv])
+    assert len(scheduler_from_json_file(file_out).experiment.trials) == n_trials
+
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv, wait=False)
+    scheduler.flush_data()
+    assert len(scheduler_from_json_file(file_out).experiment.trials) == n_trials + 1
+
+
+def test_checkpoint_writer_keeps_appends_before_a_replace(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    writer = boa.checkpoint_writer.CheckpointWriter()
+    produced = []
+
+    def produce(content):
+        return lambda: produced.append(content) or content
+
+    release = threading.Event()
+    writer.call(release.wait)
+    writer.append(path, produce(b"0\n"))
+    writer.replace(path, produce(b""))
+    writer.append(path, produce(b"1\n"))
+    writer.replace(path, produce(b"2\n"))
+    release.set()
+    writer.flush()
+    # only the replace that was replaced again is dropped
+    assert produced == [b"0\n", b"1\n", b"2\n"]
+    assert path.read_bytes() == b"2\n"
+
+
+def test_checkpoint_writer_calls_back_replaced_writes(tmp_path):
+    path = tmp_path / "scheduler.json"
+    writer = boa.checkpoint_writer.CheckpointWriter()
+    done = []
+
+    release = threading.Event()
+    writer.call(release.wait)
+    writer.replace(path, lambda: b"0", on_done=lambda size: done.append(("first", size)))
+    writer.replace(path, lambda: b"01", on_done=lambda size: done.append(("second", size)))
+    release.set()
+    writer.flush()
+    # the replaced write is called back once the write that replaced it is written
+    assert done == [("first", 2), ("second", 2)]
+
+
+def test_failed_checkpoints_are_raised_and_written_again(branin_main_run, tmp_path, monkeypatch):
+    file_out = tmp_path / "scheduler.json"
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+
+    def failing_write_file_atomic(path, content):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(boa.checkpoint_writer, "write_file_atomic", failing_write_file_atomic)
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv, compact=True, wait=False)
+    with pytest.raises(RuntimeError):
+        scheduler.flush_data()
+    scheduler.flush_data()  # only raised once
+
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv, compact=True, wait=False)
+    with pytest.raises(RuntimeError):
+        # raised by the next checkpoint, if it isn't waited for
+        dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    assert trial.index not in scheduler_from_json_file(file_out).experiment.trials
+
+    monkeypatch.undo()
+    # what failed to be written is written again, from a full snapshot
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    assert journal_path(file_out).read_text() == ""
+    assert trial.index in scheduler_from_json_file(file_out).experiment.trials
+
+
+@pytest.mark.parametrize("name", ["scheduler.json.gz", "scheduler.json.zst"])
+def test_compressed_snapshots_load_back(branin_main_run, tmp_path, name):
+    if name.endswith(".zst"):
+        pytest.importorskip("zstandard")
+    file_out = tmp_path / name
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    assert scheduler.scheduler_filepath == file_out
+
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    # the journal next to the compressed snapshot isn't compressed
+    assert journal_path(file_out) == tmp_path / "scheduler.journal.jsonl"
+    assert len(journal_path(file_out).read_text().splitlines()) == 1
+
+    serialized, size = read_snapshot(file_out)
+    assert size > file_out.stat().st_size
+    # the experiment isn't written a second time for the generation strategy
+    assert "experiment" not in serialized["generation_strategy"]
+
+    # each trial is a line of its own, and decodes the same as the whole file in one go
+    compact = tmp_path / "scheduler.json"
+    write_snapshot(compact, serialized)
+    lines = compact.read_text().splitlines()
+    n_trials = len(serialized["experiment"]["trials"])
+    start = lines.index('"trials":{')
+    assert n_trials > 1 and lines[start + n_trials + 1].rstrip(",") == "}"
+    assert read_snapshot(compact)[0] == json.loads(compact.read_text()) == serialized
+
+    loaded = scheduler_from_json_file(file_out)
+    assert set(loaded.experiment.trials) == set(scheduler.experiment.trials)
+    assert len(loaded.generation_strategy._generator_runs) == len(scheduler.generation_strategy._generator_runs)
+
+
+def test_results_store_appends_changed_trials(branin_main_run, tmp_path):
+    pytest.importorskip("pyarrow")
+    file_out = tmp_path / "scheduler.json"
+    opt_csv = tmp_path / "optimization.csv"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    store_path = results_store_path(opt_csv)
+
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    n_rows = len(read_results(store_path, latest=False))
+    assert n_rows == len(scheduler.experiment.trials)
+
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True).mark_completed()
+    metric_name = _attach_trial_data(scheduler.experiment, trial)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv)
+    # only the new trial was written, to a new part
+    assert len(read_results(store_path, latest=False)) == n_rows + 1
+    assert len(list(store_path.glob("part-*.parquet"))) == 2
+
+    results = read_results(store_path)
+    expected = exp_to_df(scheduler.experiment)
+    assert results["trial_index"].tolist() == expected["trial_index"].tolist()
+    assert results["trial_status"].tolist() == expected["trial_status"].tolist()
+    np.testing.assert_allclose(results[metric_name], expected[metric_name])
+    for name in scheduler.experiment.search_space.parameters:
+        np.testing.assert_allclose(results[name], expected[name])
+    # the parts are plain parquet files
+    assert len(pd.concat(map(pd.read_parquet, sorted(store_path.glob("part-*.parquet"))))) == n_rows + 1
+    # the table of a saved optimization is read from the store, without decoding the experiment
+    saved = ReadOnlyScheduler(file_out)
+    pd.testing.assert_frame_equal(scheduler_to_df(saved), results)
+    assert "experiment" not in saved.__dict__
+
+    # the optimization csv is only rewritten by an incremental checkpoint when asked for
+    assert len(pd.read_csv(opt_csv)) == n_rows
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv, write_csv=True)
+    assert len(pd.read_csv(opt_csv)) == n_rows + 1
+
+    # a full snapshot rewrites the store as one part
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=opt_csv, compact=True)
+    assert [path.name for path in store_path.glob("part-*.parquet")] == ["part-000002.parquet"]
+    assert len(read_results(store_path, latest=False)) == n_rows + 1
+
+
+def test_results_store_keeps_values_that_are_not_numbers(tmp_path):
+    pytest.importorskip("pyarrow")
+    store = ResultsStore(tmp_path / "optimization.parquet")
+    store.append([{"trial_index": 0, "arm_name": "0_0", "x": 1, "flag": True}])
+    store.append([{"trial_index": 1, "arm_name": "1_0", "x": 0.5, "flag": False}])
+    assert read_results(store.path)["x"].tolist() == [1.0, 0.5]
+
+    # values of different types in the same part are written as strings
+    store.append([{"trial_index": 2, "arm_name": "2_0", "x": "low"}, {"trial_index": 3, "arm_name": "3_0", "x": 2}])
+    results = read_results(store.path)
+    assert results["x"].tolist() == [1.0, 0.5, "low", "2"]
+    assert results["flag"].tolist()[:2] == [True, False] and results["flag"][2:].isna().all()
+    assert read_results(store.path, columns=["flag"]).columns.tolist() == ["trial_index", "arm_name", "flag"]
+
+
+def test_sqlite_storage_only_writes_changes_and_loads_back(branin_main_run, tmp_path):
+    file_out = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    scheduler.wrapper.config.script_options.storage = "sqlite"
+    scheduler._journal = None
+
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=tmp_path / "optimization.csv")
+    db_path = sqlite_path(file_out)
+    assert is_sqlite_file(db_path)
+    assert not file_out.with_name("optimization.csv").exists()
+    n_trials = len(scheduler.experiment.trials)
+    assert len(sqlite_trials(db_path)) == n_trials
+
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True)
+    with connect_sqlite_readonly(db_path) as conn:
+        dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=tmp_path / "optimization.csv")
+        # other trials weren't rewritten
+        assert conn.execute("SELECT COUNT(*) FROM trials").fetchone()[0] == n_trials + 1
+    assert list(sqlite_trials(db_path, status="running")["trial_index"]) == [trial.index]
+
+    trial.mark_completed()
+    metric_name = _attach_trial_data(scheduler.experiment, trial)
+    dump_scheduler_data(scheduler, scheduler_filepath=file_out, opt_filepath=tmp_path / "optimization.csv")
+    results = sqlite_results(db_path, metric_name=metric_name)
+    assert results.query(f"trial_index == {trial.index}")["mean"].tolist() == [1.0]
+    assert set(results["trial_index"]) == set(scheduler.experiment.lookup_data().df["trial_index"])
+
+    loaded = scheduler_from_json_file(db_path)
+    assert set(loaded.experiment.trials) == set(scheduler.experiment.trials)
+    assert loaded.experiment.trials[trial.index].status == trial.status
+    assert len(loaded.generation_strategy._generator_runs) == len(scheduler.generation_strategy._generator_runs)
+
+
+def test_checkpoint_policy_skips_checkpoints_until_due(branin_main_run, tmp_path, monkeypatch):
+    file_out = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    checkpoints = []
+    monkeypatch.setattr(boa.storage, "dump_scheduler_data", lambda **kwargs: checkpoints.append(kwargs["compact"]))
+    scheduler.checkpoint_policy = CheckpointPolicy(n_trials=2, on_step_change=False)
+
+    scheduler.report_results()  # the first report is always checkpointed
+    assert checkpoints == [False]
+    for expected in ([False], [False, False]):
+        trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+        trial.mark_running(no_runner_required=True).mark_completed()
+        scheduler.report_results()
+        assert checkpoints == expected
+
+    # reports while waiting on the last trials go through the policy too
+    scheduler.report_results(force_refit=True)
+    assert checkpoints == [False, False]
+
+    # the end of the optimization is always checkpointed, with a full snapshot
+    scheduler._abort_optimization(num_preexisting_trials=0)
+    assert checkpoints == [False, False, True]
+
+
+def test_running_trials_are_recovered_concurrently(branin_main_run, tmp_path, monkeypatch):
+    file_out = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    trials = []
+    for _ in range(4):
+        trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+        trials.append(trial.mark_running(no_runner_required=True))
+
+    n_checking, most_checking = 0, 0
+    lock = threading.Lock()
+
+    def set_trial_status(trial):
+        nonlocal n_checking, most_checking
+        with lock:
+            n_checking += 1
+            most_checking = max(most_checking, n_checking)
+        time.sleep(1.5)  # checks that take longer than the recovery timeout
+        if trial is trials[0]:
+            trial.mark_completed()
+        with lock:
+            n_checking -= 1
+
+    monkeypatch.setattr(scheduler.wrapper, "set_trial_status", set_trial_status)
+    checked = recover_running_trials(scheduler, max_workers=2, timeout=1)
+    # the checks that started were waited for, the ones that didn't were cancelled
+    assert n_checking == 0 and most_checking == 2
+    assert checked == {trials[0].index: True, trials[1].index: True, trials[2].index: False, trials[3].index: False}
+    assert trials[0].status.is_completed
+    assert trials[1].status.is_failed
+    # left for the scheduler's polling
+    assert trials[2].status.is_running and trials[3].status.is_running
+
+    trial = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    trial.mark_running(no_runner_required=True)
+    monkeypatch.setattr(scheduler.wrapper, "set_trial_status", lambda trial: None)
+    recover_running_trials(scheduler, resume_running=True)
+    assert trial.status.is_running and trials[3].status.is_running
+
+    def failing_set_trial_status(trial):
+        raise OSError("Output file not readable")
+
+    # trials whose check raised are failed, even when the others are resumed
+    monkeypatch.setattr(scheduler.wrapper, "set_trial_status", failing_set_trial_status)
+    recover_running_trials(scheduler, resume_running=True)
+    assert trial.status.is_failed and trials[3].status.is_failed
+
+
+def test_trials_waiting_for_the_resource_pool_are_put_back_in_line(branin_main_run, tmp_path, monkeypatch):
+    file_out = tmp_path / "scheduler.json"
+    scheduler_to_json_file(branin_main_run, file_out)
+    scheduler = scheduler_from_json_file(file_out)
+    waiting = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    waiting.update_run_metadata({"job_id": waiting.index, ADMITTED_KEY: False})
+    waiting.mark_running(no_runner_required=True)
+    scheduler_to_json_file(scheduler, file_out)
+
+    # loading the scheduler recovers its running trials, the waiting one is left running and queued
+    scheduler = scheduler_from_json_file(file_out)
+    waiting = scheduler.experiment.trials[waiting.index]
+    assert waiting.status.is_running
+    assert scheduler.runner.waiting_trials == [waiting]
+
+    deployed = scheduler.experiment.new_trial(scheduler.generation_strategy.gen(scheduler.experiment))
+    deployed.update_run_metadata({"job_id": deployed.index, ADMITTED_KEY: True})
+    deployed.mark_running(no_runner_required=True)
+    checks = []
+    monkeypatch.setattr(scheduler.wrapper, "set_trial_status", checks.append)
+    checked = recover_running_trials(scheduler)
+    # only the deployed trial was checked (and failed, as it was still running), the waiting one isn't queued twice
+    assert checks == [deployed] and checked == {deployed.index: True}
+    assert deployed.status.is_failed and waiting.status.is_running
+    assert scheduler.runner.waiting_trials == [waiting]
+
+
+def _attach_trial_data(experiment, trial):
+    metric_name = next(iter(experiment.metrics))
+    df = pd.DataFrame(
+        {
+            "arm_name": [trial.arm.name],
+            "metric_name": [metric_name],
+            "mean": [1.0],
+            "sem": [0.0],
+            "trial_index": [trial.index],
+        }
+    )
+    experiment.attach_data(Data(df=df))
+    return metric_name
@@ -0,0 +1,17 @@
+import json
+import pathlib
+import sys
+
+import numpy as np
+from ax.utils.measurement.synthetic_functions import hartmann6
+
+
+def run_model(trial_dir):
+    parameters = json.loads((trial_dir / "parameters.json").read_text())
+    X = np.array([parameters[f"x{i}"] for i in range(6)])
+
+    (trial_dir / "output.json").write_text(json.dumps({"metric": float(hartmann6(X))}))
+
+
+if __name__ == "__main__":
+    run_model(pathlib.Path(sys.argv[-1]))
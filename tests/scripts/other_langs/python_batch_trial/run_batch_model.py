@@ -0,0 +1,23 @@
+import json
+import pathlib
+import sys
+
+import numpy as np
+from ax.utils.measurement.synthetic_functions import hartmann6
+
+
+def run_model(trial_dir):
+    # the batch manifest lists every arm of the batch trial in order
+    arms = json.loads((trial_dir / "arms.json").read_text())
+    X = np.array([[arm["parameters"][f"x{i}"] for i in range(6)] for arm in arms])
+
+    # evaluate all arms at once, one row per arm
+    Y = np.apply_along_axis(hartmann6, 1, X)
+
+    # write out the output of each arm, keyed by arm name
+    output = {arm["arm_name"]: {"metric": float(y)} for arm, y in zip(arms, Y)}
+    (trial_dir / "output.json").write_text(json.dumps(output))
+
+
+if __name__ == "__main__":
+    run_model(pathlib.Path(sys.argv[-1]))
@@ -0,0 +1,24 @@
+# In server mode, this top level code only runs once per worker,
+# not once per trial, so slow imports and set up belong here.
+import json
+import os
+
+import numpy as np
+from ax.utils.measurement.synthetic_functions import hartmann6
+
+from boa.wrappers.script_server_client import serve
+
+
+# Everything for a single trial goes in a function of the trial directory
+def run_model(trial_dir):
+    parameters = json.loads((trial_dir / "parameters.json").read_text())
+    X = np.array([parameters[f"x{i}"] for i in range(6)])
+
+    (trial_dir / "output.json").write_text(json.dumps({"metric": float(hartmann6(X))}))
+    # which worker ran this trial, for testing
+    (trial_dir / "worker_pid.txt").write_text(str(os.getpid()))
+
+
+if __name__ == "__main__":
+    # serve handles talking to BOA, whether we are in server mode or not
+    serve(run_model)